@@ -0,0 +1,116 @@
+# scripts/benchmark_context_packing.py
+'''
+TextRAG Context 구성 비교: 문서 전체 이어 붙이기(기존) vs 토큰 예산 packing
+
+OCR 코퍼스에서 질문(문서 본문의 연속된 단어 구간)을 만들고, 정답 문서 + 무작위 문서 4개를 검색 결과로 가정해서
+    - 프롬프트 토큰 수 (추정치) 평균 / p95
+    - packing 소요 시간
+    - 정답 구간 보존율 (packed context에 질문 단어가 모두 남아있는 비율)
+을 비교합니다. --llm을 주면 실제 TextRAG 호출 시간도 비교합니다 (GOOGLE_API_KEY 필요).
+
+    python scripts/benchmark_context_packing.py --queries 100 --budget 2000
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+# 프로젝트 루트 경로 설정
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.rag.context_packer import pack_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+from src.rag.prompts import TEXT_RAG_PROMPT
+
+OCR_DIR = os.path.join(project_root, "data/processed/ocr")
+DOCS_PER_QUERY = 5
+QUERY_WORDS = (5, 10)
+SEED = 42
+
+
+def load_corpus(ocr_dir: str, limit: int) -> list:
+    paths = []
+    for root, dirs, files in os.walk(ocr_dir):
+        paths.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(".json"))
+    random.Random(SEED).shuffle(paths)
+
+    docs = []
+    for path in paths[:limit]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        text = data.get("full_text") or "\n".join(line.get("text", "") for line in data.get("lines", []))
+        if len(text.split()) >= QUERY_WORDS[1]:
+            docs.append({"content": text, "lines": data.get("lines"),
+                         "metadata": {"source": os.path.basename(path).replace(".json", ".png")}})
+    return docs
+
+
+def full_prompt(query: str, docs: list) -> str:
+    # 기존 TextRAG 방식 (문서 전체)
+    context = "\n\n".join(f"문서 {i+1} (파일명: {d['metadata']['source']}):\n{d['content']}" for i, d in enumerate(docs))
+    return TEXT_RAG_PROMPT.format(context_str=context, query=query)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--llm", action="store_true", help="실제 Gemini 호출 시간 비교 (질문 10개)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(OCR_DIR, limit=max(args.queries * 2, 200))
+    if len(corpus) < DOCS_PER_QUERY:
+        print(f"❌ OCR 문서가 부족합니다: {OCR_DIR}")
+        return 1
+
+    rng = random.Random(SEED)
+    cases = []
+    for _ in range(args.queries):
+        gold = rng.choice(corpus)
+        words = gold["content"].split()
+        n = rng.randint(*QUERY_WORDS)
+        start = rng.randint(0, len(words) - n)
+        others = rng.sample([d for d in corpus if d is not gold], DOCS_PER_QUERY - 1)
+        docs = others[:]
+        docs.insert(rng.randint(0, len(docs)), gold)
+        cases.append((" ".join(words[start:start + n]), docs))
+
+    full_tokens, packed_tokens, pack_ms, kept = [], [], [], 0
+    for query, docs in cases:
+        full_tokens.append(estimate_tokens(full_prompt(query, docs)))
+        t = time.perf_counter()
+        packed = pack_context(query, docs, args.budget)
+        pack_ms.append((time.perf_counter() - t) * 1000)
+        packed_tokens.append(estimate_tokens(TEXT_RAG_PROMPT.format(context_str=packed["context"], query=query)))
+        kept += int(all(w in packed["context"] for w in query.split()))
+
+    print(f"📊 질문 {len(cases)}개, 문서 {DOCS_PER_QUERY}개씩, 예산 {args.budget} tokens")
+    print(f"   - 프롬프트 토큰 (기존): mean {np.mean(full_tokens):.0f} / p95 {np.percentile(full_tokens, 95):.0f}")
+    print(f"   - 프롬프트 토큰 (packed): mean {np.mean(packed_tokens):.0f} / p95 {np.percentile(packed_tokens, 95):.0f} "
+          f"({np.mean(full_tokens) / max(np.mean(packed_tokens), 1):.1f}x 감소)")
+    print(f"   - packing 시간: p50 {np.percentile(pack_ms, 50):.2f}ms / p95 {np.percentile(pack_ms, 95):.2f}ms")
+    print(f"   - 정답 구간 보존율: {kept / len(cases):.3f}")
+
+    if args.llm:
+        from src.rag.text_rag import TextRAG
+        rags = {"full": TextRAG(token_budget=None), "packed": TextRAG(token_budget=args.budget)}
+        for name, rag in rags.items():
+            latencies = []
+            for query, docs in cases[:10]:
+                t = time.perf_counter()
+                rag.answer(query, docs)
+                latencies.append(time.perf_counter() - t)
+            print(f"   - LLM 응답 시간 ({name}): p50 {np.percentile(latencies, 50):.2f}s / mean {np.mean(latencies):.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
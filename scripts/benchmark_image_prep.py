@@ -0,0 +1,102 @@
+# scripts/benchmark_image_prep.py
+'''
+Vision 호출 이미지 경량화 전/후 비교
+
+    - 전송 bytes (원본 파일 vs 경량화 결과)
+    - 경량화 시간 (처음 / 캐시)
+    - (--llm) Gemini 호출 end-to-end latency (원본 PIL vs 경량화 bytes)
+
+사용 예:
+    python scripts/benchmark_image_prep.py --samples 20
+    python scripts/benchmark_image_prep.py --samples 5 --llm
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+from PIL import Image
+
+# 프로젝트 루트 경로 설정
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.image_prep import PreparedImageCache, IMAGE_MAX_SIDE, IMAGE_FORMAT, IMAGE_QUALITY
+
+RAW_DIR = "data/raw"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+PROMPT = "이 문서의 종류와 핵심 내용을 한 문장으로 요약해줘."
+
+
+def sample_images(root, n, seed=0):
+    paths = [os.path.join(r, f) for r, _, files in os.walk(root) for f in files if f.lower().endswith(IMAGE_EXTS)]
+    random.Random(seed).shuffle(paths)
+    return paths[:n]
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {"mean": round(float(values.mean()), 1), "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--crop", action="store_true", help="글자 영역 잘라내기도 적용")
+    parser.add_argument("--llm", action="store_true", help="Gemini 호출 latency도 측정 (API 비용 발생)")
+    args = parser.parse_args()
+
+    paths = sample_images(args.raw_dir, args.samples)
+    if not paths:
+        print(f"❌ 이미지가 없습니다: {args.raw_dir}")
+        return
+
+    cache = PreparedImageCache(cache_dir="")      # 메모리 캐시만 (디스크 캐시 영향 제외)
+    original_kb, sent_kb, prep_ms, cached_ms = [], [], [], []
+    for path in paths:
+        prepared = cache.get(path, crop_to_text=args.crop)
+        original_kb.append(prepared["original_bytes"] / 1024)
+        sent_kb.append(prepared["bytes"] / 1024)
+        prep_ms.append(prepared["prep_ms"])
+        t = time.perf_counter()
+        cache.get(path, crop_to_text=args.crop)
+        cached_ms.append((time.perf_counter() - t) * 1000)
+
+    report = {
+        "samples": len(paths),
+        "config": {"max_side": IMAGE_MAX_SIDE, "format": IMAGE_FORMAT, "quality": IMAGE_QUALITY, "crop": args.crop},
+        "original_kb": summarize(original_kb),
+        "sent_kb": summarize(sent_kb),
+        "compression_ratio": round(sum(original_kb) / max(sum(sent_kb), 1e-9), 2),
+        "prep_ms": summarize(prep_ms),
+        "cached_prep_ms": summarize(cached_ms),
+    }
+
+    if args.llm:
+        from google.genai import types
+        from src.core.llm import GeminiClient
+        llm = GeminiClient()
+        raw_sec, prepared_sec = [], []
+        for path in paths:
+            t = time.perf_counter()
+            llm.generate([PROMPT, Image.open(path)])
+            raw_sec.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            prepared = cache.get(path, crop_to_text=args.crop)
+            llm.generate([PROMPT, types.Part.from_bytes(data=prepared["data"], mime_type=prepared["mime_type"])])
+            prepared_sec.append(time.perf_counter() - t)
+        report["llm_latency_ms"] = {
+            "original": summarize(np.asarray(raw_sec) * 1000),
+            "prepared": summarize(np.asarray(prepared_sec) * 1000),
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
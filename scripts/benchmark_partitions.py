@@ -0,0 +1,144 @@
+# scripts/benchmark_partitions.py
+'''
+라벨 필터 검색 비교: 전체 인덱스 + where 필터 vs 라벨별 파티션
+
+    - latency (p50 / p95, ms)
+    - recall@k (정답 = 해당 라벨 문서 전체에 대한 brute-force cosine Top-K)
+
+질문 벡터는 저장된 문서 임베딩에 약간의 노이즈를 더해서 만듭니다. (API 호출 없음)
+
+사용 예:
+    python scripts/benchmark_partitions.py                         # ./chroma_db 의 docs / docs__<label>
+    python scripts/benchmark_partitions.py --synthetic 50000       # 임시 DB에 가짜 데이터로 비교
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import chromadb
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ingest.bulk_loader import BulkLoader
+from src.rag.partitions import PartitionedCollections
+
+
+def build_synthetic(client, name, num_docs, dim, labels, seed=0):
+    """라벨 분포를 일부러 치우치게 만든 가짜 컬렉션 (선택도가 높은 라벨 포함)"""
+    rng = np.random.default_rng(seed)
+    weights = np.array([0.5 ** i for i in range(len(labels))])
+    weights /= weights.sum()
+    label_idx = rng.choice(len(labels), size=num_docs, p=weights)
+    centers = rng.normal(size=(len(labels), dim)).astype(np.float32)
+    vectors = centers[label_idx] * 0.5 + rng.normal(size=(num_docs, dim)).astype(np.float32)
+
+    collection = client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    partitions = PartitionedCollections(client, name)
+    loader = BulkLoader(collection, workers=4, partitions=partitions)
+    for start in range(0, num_docs, 5000):
+        end = min(start + 5000, num_docs)
+        ids = [f"doc_{i}" for i in range(start, end)]
+        metadatas = [{"label": labels[label_idx[i]]} for i in range(start, end)]
+        loader._upsert_with_retry(collection, ids, vectors[start:end], None, metadatas)
+        for label, rows in loader._group_by_label(metadatas, 0, end - start).items():
+            loader._upsert_with_retry(partitions.get_or_create(label), [ids[r] for r in rows],
+                                      vectors[start:end][rows], None, [metadatas[r] for r in rows], partition=True)
+    return collection
+
+
+def label_vectors(collection, label):
+    data = collection.get(where={"label": label}, include=["embeddings"])
+    return data["ids"], np.asarray(data["embeddings"], dtype=np.float32)
+
+
+def exact_top_k(query, ids, vectors, k):
+    sims = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+    order = np.argsort(-sims)[:k]
+    return {ids[i] for i in order}
+
+
+def percentile(values, p):
+    return round(float(np.percentile(values, p)) * 1000, 2) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="./chroma_db")
+    parser.add_argument("--collection", default="docs")
+    parser.add_argument("--queries-per-label", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--synthetic", type=int, default=0, help="가짜 문서 개수 (0이면 기존 DB 사용)")
+    parser.add_argument("--dim", type=int, default=256, help="가짜 데이터 임베딩 차원")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.synthetic:
+        tmp_dir = tempfile.mkdtemp(prefix="partition_bench_")
+        client = chromadb.PersistentClient(path=tmp_dir)
+        labels = ["invoice", "email", "letter", "memo", "form", "resume", "budget", "news article"]
+        print(f" 가짜 데이터 생성: {args.synthetic} docs, dim={args.dim}, labels={len(labels)}")
+        collection = build_synthetic(client, args.collection, args.synthetic, args.dim, labels)
+    else:
+        client = chromadb.PersistentClient(path=args.db)
+        collection = client.get_collection(args.collection)
+
+    partitions = PartitionedCollections(client, args.collection)
+    if not len(partitions):
+        print("❌ 파티션 컬렉션이 없습니다. ingest_vector.py를 PARTITION_MODE=True로 실행하세요.")
+        return
+
+    rng = np.random.default_rng(1)
+    report = {"top_k": args.top_k, "labels": {}}
+    totals = {"where": [], "partition": []}
+    recalls = {"where": [], "partition": []}
+
+    for label, partition in sorted(partitions.partitions.items()):
+        ids, vectors = label_vectors(collection, label)
+        if not ids:
+            continue
+        k = min(args.top_k, len(ids))
+        picks = rng.choice(len(ids), size=min(args.queries_per_label, len(ids)), replace=False)
+
+        stats = {"where": ([], []), "partition": ([], [])}
+        for p in picks:
+            query = vectors[p] + rng.normal(scale=0.3 * vectors[p].std(), size=vectors.shape[1]).astype(np.float32)
+            truth = exact_top_k(query, ids, vectors, k)
+
+            for mode in ("where", "partition"):
+                target, where = (collection, {"label": label}) if mode == "where" else (partition, None)
+                start = time.perf_counter()
+                result = target.query(query_embeddings=[query], n_results=k, where=where, include=[])
+                stats[mode][0].append(time.perf_counter() - start)
+                stats[mode][1].append(len(truth & set(result["ids"][0])) / k)
+
+        report["labels"][label] = {"docs": len(ids), "share": round(len(ids) / collection.count(), 4)}
+        for mode, (latencies, recall) in stats.items():
+            report["labels"][label][mode] = {
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "recall": round(float(np.mean(recall)), 4),
+            }
+            totals[mode] += latencies
+            recalls[mode] += recall
+
+    report["overall"] = {
+        mode: {
+            "p50_ms": percentile(totals[mode], 50),
+            "p95_ms": percentile(totals[mode], 95),
+            "recall": round(float(np.mean(recalls[mode])), 4) if recalls[mode] else 0.0,
+        }
+        for mode in totals
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if tmp_dir:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# scripts/benchmark_retrieval.py
+'''
+검색 품질 / 속도 벤치마크
+
+OCR 코퍼스(data/processed/ocr/<label>/<doc>.json)에서 라벨이 붙은 질문 세트를 만들고
+(문서 본문의 연속된 단어 구간 = 질문, 원본 문서 = 정답) 검색 설정별로 실행합니다.
+
+    지표: recall@k, MRR, label precision(결과 중 정답 라벨 비율), latency p50/p95/p99, QPS
+    출력: JSON (data/processed/benchmark_results.json)
+
+사용 예:
+    python scripts/benchmark_retrieval.py                                   # 전체 설정
+    python scripts/benchmark_retrieval.py --configs gemini_dense gemini_hybrid
+    python scripts/benchmark_retrieval.py --baseline data/processed/benchmark_baseline.json
+        -> baseline 대비 recall/MRR 하락 또는 p95 증가가 허용치를 넘으면 exit code 1
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import warnings
+
+import numpy as np
+from dotenv import load_dotenv
+
+warnings.filterwarnings("ignore")
+load_dotenv()
+
+# 프로젝트 루트 경로 설정
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+# 설정
+OCR_DIR = os.path.join(project_root, "data/processed/ocr")
+QUERY_SET_PATH = os.path.join(project_root, "data/processed/benchmark_queries.jsonl")
+RESULT_PATH = os.path.join(project_root, "data/processed/benchmark_results.json")
+QUERIES_PER_LABEL = 20
+QUERY_WORDS = (5, 10)          # 질문 길이 (단어 수 범위)
+K_VALUES = (1, 5, 10)
+SEED = 42
+
+# 회귀 판정 허용치 (--baseline 사용 시)
+MAX_RECALL_DROP = 0.02
+MAX_MRR_DROP = 0.02
+MAX_P95_INCREASE = 1.5         # baseline p95의 1.5배 초과 시 회귀
+
+
+# 1. 질문 세트
+def build_query_set(ocr_dir: str, per_label: int, seed: int = SEED) -> list:
+    rng = random.Random(seed)
+    by_label = {}
+    for root, dirs, files in os.walk(ocr_dir):
+        for file in sorted(files):
+            if file.endswith(".json"):
+                by_label.setdefault(os.path.basename(root), []).append(os.path.join(root, file))
+
+    queries = []
+    for label, paths in sorted(by_label.items()):
+        rng.shuffle(paths)
+        picked = 0
+        for path in paths:
+            if picked >= per_label:
+                break
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            text = data.get("full_text") or " ".join(line.get("text", "") for line in data.get("lines", []))
+            words = [w for w in text.split() if len(w) >= 2]
+            n = rng.randint(*QUERY_WORDS)
+            if len(words) < n:
+                continue
+            start = rng.randint(0, len(words) - n)
+            queries.append({
+                "query": " ".join(words[start:start + n]),
+                "doc_id": os.path.splitext(os.path.basename(path))[0],
+                "label": label,
+            })
+            picked += 1
+    return queries
+
+
+def load_query_set(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_query_set(path: str, queries: list):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for q in queries:
+            f.write(json.dumps(q, ensure_ascii=False) + "\n")
+
+
+# 2. 검색 설정 (이름 -> (엔진 생성 함수, 질문 하나 검색 함수, 배치 검색 함수 or None))
+def _hit_fields(hit):
+    # Retriever / SearchEngine 결과 형식 통일: (부모 문서 id, label)
+    metadata = hit.get("metadata") or {}
+    doc_id = metadata.get("parent_id") or hit.get("id", "")
+    return doc_id.split("#c")[0], metadata.get("label", hit.get("label"))
+
+
+def build_configs(max_k: int) -> dict:
+    def gemini():
+        from src.rag.retriever import Retriever
+        return Retriever()
+
+    def layoutlm():
+        from src.core.retriever import SearchEngine
+        return SearchEngine()
+
+    def retriever_search(**kwargs):
+        def run(engine, q, use_filter):
+            return engine.retrieve(q["query"], top_k=max_k, category=q["label"] if use_filter else None, **kwargs)
+        return run
+
+    def retriever_batch(engine, qs, use_filter):
+        return engine.retrieve_many([q["query"] for q in qs], top_k=max_k,
+                                    categories=[q["label"] for q in qs] if use_filter else None)
+
+    def layoutlm_search(engine, q, use_filter):
+        return engine.search(q["query"], top_k=max_k, filter_label=q["label"] if use_filter else None)
+
+    configs = {
+        "gemini_dense": (gemini, retriever_search(hybrid=False), None, False),
+        "gemini_hybrid": (gemini, retriever_search(hybrid=True), retriever_batch, False),
+        "gemini_mmr": (gemini, retriever_search(hybrid=True, mmr=True), None, False),
+        "gemini_filtered": (gemini, retriever_search(hybrid=True), retriever_batch, True),
+        "layoutlm": (layoutlm, layoutlm_search, None, False),
+        "layoutlm_filtered": (layoutlm, layoutlm_search, None, True),
+    }
+    return configs
+
+
+# 3. 지표
+def evaluate(results: list, queries: list, k_values=K_VALUES) -> dict:
+    recalls = {k: [] for k in k_values}
+    reciprocal_ranks, label_precisions = [], []
+    for hits, q in zip(results, queries):
+        fields = [_hit_fields(h) for h in hits]
+        ids = [doc_id for doc_id, _ in fields]
+        rank = ids.index(q["doc_id"]) + 1 if q["doc_id"] in ids else None
+        for k in k_values:
+            recalls[k].append(1.0 if rank is not None and rank <= k else 0.0)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        if fields:
+            label_precisions.append(sum(1 for _, label in fields if label == q["label"]) / len(fields))
+        else:
+            label_precisions.append(0.0)
+    metrics = {f"recall@{k}": round(float(np.mean(v)), 4) for k, v in recalls.items()}
+    metrics["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    metrics["label_precision"] = round(float(np.mean(label_precisions)), 4)
+    return metrics
+
+
+def latency_stats(latencies: list, wall_time: float) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "qps": round(len(latencies) / wall_time, 2) if wall_time > 0 else 0.0,
+    }
+
+
+def run_config(engine, search_fn, batch_fn, use_filter, queries, warmup: int = 3) -> dict:
+    # warmup (모델 로드 / 캐시 등 첫 호출 비용 제외)
+    for q in queries[:warmup]:
+        search_fn(engine, q, use_filter)
+
+    results, latencies = [], []
+    start = time.perf_counter()
+    for q in queries:
+        t = time.perf_counter()
+        results.append(search_fn(engine, q, use_filter))
+        latencies.append(time.perf_counter() - t)
+    wall = time.perf_counter() - start
+
+    report = {**evaluate(results, queries), **latency_stats(latencies, wall), "queries": len(queries)}
+
+    if batch_fn is not None:
+        t = time.perf_counter()
+        batch_results = batch_fn(engine, queries, use_filter)
+        batch_wall = time.perf_counter() - t
+        report["batch"] = {
+            "qps": round(len(queries) / batch_wall, 2) if batch_wall > 0 else 0.0,
+            "mrr": evaluate(batch_results, queries)["mrr"],
+        }
+    return report
+
+
+# 4. 회귀 비교
+def compare(report: dict, baseline: dict) -> list:
+    problems = []
+    for name, current in report["configs"].items():
+        base = baseline.get("configs", {}).get(name)
+        if not base or "error" in current or "error" in base:
+            continue
+        for k in K_VALUES:
+            key = f"recall@{k}"
+            if base[key] - current[key] > MAX_RECALL_DROP:
+                problems.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if base["mrr"] - current["mrr"] > MAX_MRR_DROP:
+            problems.append(f"{name}: mrr {base['mrr']} -> {current['mrr']}")
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * MAX_P95_INCREASE:
+            problems.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configs", nargs="*", default=None, help="실행할 설정 이름 (기본: 전체)")
+    parser.add_argument("--queries", default=QUERY_SET_PATH, help="질문 세트 JSONL (없으면 OCR 코퍼스에서 생성)")
+    parser.add_argument("--per-label", type=int, default=QUERIES_PER_LABEL)
+    parser.add_argument("--regenerate", action="store_true", help="질문 세트를 새로 생성")
+    parser.add_argument("--output", default=RESULT_PATH)
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON")
+    args = parser.parse_args()
+
+    # 1. 질문 세트 준비
+    if os.path.exists(args.queries) and not args.regenerate:
+        queries = load_query_set(args.queries)
+        print(f" 질문 세트 로드: {args.queries} ({len(queries)}개)")
+    else:
+        queries = build_query_set(OCR_DIR, args.per_label)
+        if not queries:
+            print(f"❌ 질문을 만들 OCR 문서가 없습니다: {OCR_DIR}")
+            return 1
+        save_query_set(args.queries, queries)
+        print(f" 질문 세트 생성: {args.queries} ({len(queries)}개)")
+
+    # 2. 설정별 실행 (같은 엔진은 한 번만 생성)
+    configs = build_configs(max(K_VALUES))
+    names = args.configs or list(configs)
+    engines = {}
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "num_queries": len(queries),
+              "k_values": list(K_VALUES), "configs": {}}
+
+    for name in names:
+        if name not in configs:
+            print(f"⚠️ 알 수 없는 설정: {name}")
+            continue
+        factory, search_fn, batch_fn, use_filter = configs[name]
+        print(f"\n▶ {name}")
+        try:
+            if factory not in engines:
+                engines[factory] = factory()
+            result = run_config(engines[factory], search_fn, batch_fn, use_filter, queries)
+        except Exception as e:
+            print(f"❌ {name} 실행 실패: {e}")
+            result = {"error": str(e)}
+        report["configs"][name] = result
+        print(f"   {json.dumps(result, ensure_ascii=False)}")
+
+    # 3. 저장
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ 결과 저장: {args.output}")
+
+    # 4. 회귀 검사
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(report, json.load(f))
+        if problems:
+            print("❌ 성능 회귀 발견:")
+            for p in problems:
+                print(f"   - {p}")
+            return 1
+        print("✅ baseline 대비 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
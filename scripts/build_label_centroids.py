@@ -0,0 +1,100 @@
+# scripts/build_label_centroids.py
+'''
+ChromaDB 문서 본문 (라벨별 표본) -> 질문용 임베딩 -> 라벨별 centroid (IntentRouter ROUTER_MODE=local 용)
+
+    python scripts/build_label_centroids.py
+    python scripts/build_label_centroids.py --eval     # 벤치마크 질문 세트로 정확도 / LLM fallback 비율 / 속도 확인
+'''
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import chromadb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 프로젝트 루트 경로 설정
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.local_router import LabelCentroidRouter, LABEL_CENTROIDS_PATH, LOCAL_ROUTER_THRESHOLD, SAMPLES_PER_LABEL
+from src.core.embedding import get_query_embeddings
+
+# 설정
+DB_PATH = "./chroma_db"
+COLLECTION_NAME = "docs"
+QUERY_SET_PATH = "data/processed/benchmark_queries.jsonl"   # scripts/benchmark_retrieval.py가 만든 질문 세트
+
+
+def evaluate(router: LabelCentroidRouter, query_path: str, threshold: float):
+    with open(query_path, "r", encoding="utf-8") as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    embeddings = get_query_embeddings([q["query"] for q in queries])
+
+    correct, local, local_correct, abstained, latencies = 0, 0, 0, 0, []
+    # ROUTER_MIN_SIMILARITY / ROUTER_MIN_MARGIN 조정용: 1위 라벨이 정답 / 오답일 때의 1위 유사도, 1-2위 차이
+    stats = {True: {"sim": [], "margin": []}, False: {"sim": [], "margin": []}}
+    for q, emb in zip(queries, embeddings):
+        label, confidence, margin, elapsed_ms = router.predict(emb)
+        latencies.append(elapsed_ms)
+        correct += int(label == q["label"])
+
+        similarities = router.similarities(emb)
+        best = int(np.argmax(similarities))
+        hit = router.labels[best] == q["label"]
+        stats[hit]["sim"].append(float(similarities[best]))
+        stats[hit]["margin"].append(margin)
+
+        if label is None:
+            abstained += 1
+        elif margin >= router.min_margin and confidence >= threshold:
+            local += 1
+            local_correct += int(label == q["label"])
+
+    n = len(queries)
+    print(f"   - 질문 {n}개, 전체 정확도: {correct / n:.3f}")
+    print(f"   - threshold {threshold} / 1-2위 차이 >= {router.min_margin}: 로컬 처리 {local / n:.1%} "
+          f"(정확도 {local_correct / max(local, 1):.3f}), LLM fallback {1 - (local + abstained) / n:.1%}")
+    print(f"   - 기권(전체 검색): {abstained / n:.1%} (유사도 < {router.min_similarity})")
+    for hit, name in ((True, "1위 정답"), (False, "1위 오답")):
+        if not stats[hit]["sim"]:
+            continue
+        sim_p = np.percentile(stats[hit]["sim"], [10, 50, 90])
+        margin_p = np.percentile(stats[hit]["margin"], [10, 50, 90])
+        print(f"   - {name} {len(stats[hit]['sim'])}개: 1위 유사도 p10/p50/p90 {sim_p[0]:.3f}/{sim_p[1]:.3f}/{sim_p[2]:.3f}, "
+              f"1-2위 차이 p10/p50/p90 {margin_p[0]:.4f}/{margin_p[1]:.4f}/{margin_p[2]:.4f}")
+    print(f"   - 분류 시간: p50 {np.percentile(latencies, 50):.3f}ms / p99 {np.percentile(latencies, 99):.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=LABEL_CENTROIDS_PATH)
+    parser.add_argument("--eval", action="store_true", help="질문 세트로 정확도 확인")
+    parser.add_argument("--queries", default=QUERY_SET_PATH)
+    parser.add_argument("--threshold", type=float, default=LOCAL_ROUTER_THRESHOLD)
+    parser.add_argument("--samples", type=int, default=SAMPLES_PER_LABEL, help="라벨별 표본 문서 수")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=DB_PATH)
+    collection = client.get_collection(name=COLLECTION_NAME)
+
+    print(f" Building label centroids from '{COLLECTION_NAME}' ({collection.count()} docs, 질문용 임베딩)...")
+    start = time.time()
+    router = LabelCentroidRouter.build_from_collection(collection, get_query_embeddings, samples_per_label=args.samples)
+    router.save(args.output)
+    print(f"✅ 완료: {len(router.labels)} labels -> {args.output} ({time.time() - start:.1f}초)")
+    for label, count in zip(router.labels, router.counts):
+        print(f"   - {label}: {count}")
+
+    if args.eval:
+        if not os.path.exists(args.queries):
+            print(f"⚠️ 질문 세트가 없습니다: {args.queries} (scripts/benchmark_retrieval.py 먼저 실행)")
+            return
+        evaluate(router, args.queries, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# scripts/build_vector_index.py
+'''
+임베딩 Parquet -> 메모리 맵 벡터 인덱스 (Retriever VECTOR_BACKEND=mmap 용)
+
+    python scripts/build_vector_index.py
+    VECTOR_BACKEND=mmap uvicorn src.main:app --workers 4   # worker들이 같은 파일을 mmap으로 공유
+'''
+import os
+import sys
+import time
+
+# 프로젝트 루트 경로 설정
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.vector_index import build_vector_index, MmapVectorIndex
+
+# 설정
+DATA_PATH = "data/processed/document_embeddings.parquet"
+INDEX_PATH = "./chroma_db/vector_index"
+DTYPE = "float16"        # "float16": 메모리/디스크 절반 / "float32": 원본 정밀도
+NLIST = None             # IVF list 개수 (None: 4 * sqrt(N), 0: exact 검색 전용)
+
+
+def main():
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f" 파일을 찾을 수 없습니다: {DATA_PATH}")
+
+    print(f" Building mmap vector index from '{DATA_PATH}'...")
+    start = time.time()
+    meta = build_vector_index(DATA_PATH, INDEX_PATH, dtype=DTYPE, nlist=NLIST)
+    print(f"✅ 완료: {meta['count']} vectors, dim={meta['dim']}, dtype={meta['dtype']}, "
+          f"nlist={meta['nlist']}, labels={len(meta['labels'])} ({time.time() - start:.1f}초)")
+
+    # 간단한 확인: 첫 번째 벡터로 자기 자신이 1등으로 나오는지
+    index = MmapVectorIndex.load(INDEX_PATH)
+    hit = index.search(index.vectors[0], top_k=1)[0]
+    print(f"   - self-check: {hit[0]['id'] if hit else None} == {index.ids[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@ import sys
 import os
 import json
 import warnings
-import pandas as pd
 from tqdm import tqdm
 from dotenv import load_dotenv
 
@@ -18,12 +17,27 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 from src.core.embedding import get_embedding 
+from src.utils.parquet_io import EmbeddingParquetWriter
+from src.ingest.dedup import NearDuplicateDetector
+from src.ingest.chunker import LayoutChunker, MIN_DOC_CHARS, chunk_id, bbox_to_str
+from src.utils.path_index import PathIndex
 
 # 경로 설정
 OCR_DIR = os.path.join(project_root, "data/processed/ocr")
 OUTPUT_DIR = os.path.join(project_root, "data/processed")
 # 원본 이미지 경로 (나중에 출처 보여줄 때 필요)
 RAW_DIR = os.path.join(project_root, "data/raw") 
+SAVE_PATH = os.path.join(OUTPUT_DIR, "document_embeddings.parquet")
+# 한 번에 메모리에 들고 있는 최대 문서 수 (= Parquet row group 크기)
+WRITE_BATCH_SIZE = 256
+
+# 유사 중복 제거 (None이면 비활성화) - 중복 문서는 임베딩 API를 호출하지 않음
+DEDUP_THRESHOLD = 0.9
+DEDUP_MODE = "link"   # "skip": 버림 / "link": 색인하지 않고 canonical id에 연결 기록
+DEDUP_PATH = os.path.join(OUTPUT_DIR, "dedup_signatures.npz")
+
+# 긴 문서는 레이아웃 영역(청크) 단위로 나눠서 색인 (False면 문서 전체를 벡터 하나로)
+CHUNK_MODE = True
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -40,6 +54,20 @@ def load_full_text(json_path):
         print(f" 텍스트 로드 실패: {json_path} / {e}")
         return ""
 
+def load_lines(json_path):
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("lines", [])
+    except Exception:
+        return []
+
+def _checked_embedding(text):
+    # get_embedding은 최종 실패 시 0 벡터를 돌려줌 -> 실패로 처리 (색인 / canonical 등록 안 함)
+    embedding = get_embedding(text)
+    if not any(embedding):
+        raise RuntimeError("임베딩 생성 실패")
+    return embedding
+
 def main():
     print(" Gemini 기반 임베딩 생성 시작...")
     
@@ -47,8 +75,6 @@ def main():
         print("❌ Error: .env 파일에 GOOGLE_API_KEY가 없습니다.")
         return
 
-    data_list = []
-    
     # OCR 폴더 탐색
     json_files = []
     for root, dirs, files in os.walk(OCR_DIR):
@@ -58,42 +84,89 @@ def main():
 
     print(f"   -> 총 {len(json_files)}개 문서 처리 예정")
 
-    for json_path in tqdm(json_files, desc="Processing"):
-        try:
-            file_name = os.path.splitext(os.path.basename(json_path))[0]
-            label = os.path.basename(os.path.dirname(json_path))
+    # 전체 재생성이므로 이전 서명은 불러오지 않음
+    detector = None
+    if DEDUP_THRESHOLD is not None:
+        detector = NearDuplicateDetector(threshold=DEDUP_THRESHOLD, mode=DEDUP_MODE)
+    duplicate_count = 0
+
+    chunker = LayoutChunker()
+    chunked_docs = 0
+
+    # 결과를 리스트에 쌓지 않고 배치 단위로 바로 Parquet에 기록
+    with EmbeddingParquetWriter(SAVE_PATH, batch_size=WRITE_BATCH_SIZE) as writer:
+        for json_path in tqdm(json_files, desc="Processing"):
+            try:
+                file_name = os.path.splitext(os.path.basename(json_path))[0]
+                label = os.path.basename(os.path.dirname(json_path))
+
+                text_content = load_full_text(json_path)
+                if len(text_content) < 5:
+                    continue
+
+                if detector is not None and detector.check(file_name, text_content) is not None:
+                    duplicate_count += 1
+                    continue
+
+                image_path = os.path.join(RAW_DIR, label, file_name + ".png")
+                base_record = {
+                    "label": label,
+                    "file_path": image_path, 
+                    "metadata": {
+                        "json_path": json_path
+                    }
+                }
 
-            text_content = load_full_text(json_path)
-            if len(text_content) < 5:
+                # 긴 문서: 청크마다 벡터 하나 (parent_id로 원본 문서와 연결)
+                chunks = []
+                if CHUNK_MODE and len(text_content) >= MIN_DOC_CHARS:
+                    chunks = chunker.split(load_lines(json_path))
+
+                if len(chunks) > 1:
+                    records = [{
+                        **base_record,
+                        "doc_id": chunk_id(file_name, chunk["chunk_index"]),
+                        "text": chunk["text"],
+                        "embedding": _checked_embedding(chunk["text"]),
+                        "parent_id": file_name,
+                        "chunk_index": chunk["chunk_index"],
+                        "bbox": bbox_to_str(chunk["bbox"]),
+                    } for chunk in chunks]
+                    for record in records:
+                        writer.write(record)
+                    chunked_docs += 1
+                else:
+                    embedding = _checked_embedding(text_content)
+
+                    writer.write({
+                        **base_record,
+                        "doc_id": file_name,
+                        "text": text_content,
+                        "embedding": embedding,
+                    })
+
+                # 저장까지 성공한 문서만 중복 판정의 canonical로 확정
+                if detector is not None:
+                    detector.confirm(file_name)
+
+            except Exception as e:
+                print(f"❌ Error ({file_name}): {e}")
+                if detector is not None:
+                    detector.discard(file_name)
                 continue
 
-            embedding = get_embedding(text_content)
-
-            image_path = os.path.join(RAW_DIR, label, file_name + ".png")
-            
-            data_list.append({
-                "doc_id": file_name,
-                "text": text_content,
-                "embedding": embedding,
-                "label": label,
-                "file_path": image_path, 
-                "metadata": {
-                    "json_path": json_path
-                }
-            })
-
-        except Exception as e:
-            print(f"❌ Error ({file_name}): {e}")
-            continue
-
-    if data_list:
-        df = pd.DataFrame(data_list)
-        save_path = os.path.join(OUTPUT_DIR, "document_embeddings.parquet")
-        
-        print(f"✅ 저장 완료: {save_path}")
-        print(f"   - 총 문서 수: {len(df)}") # 994개로 6개 걸러짐
-        df.to_parquet(save_path, index=False)
+    if writer.num_rows:
+        print(f"✅ 저장 완료: {SAVE_PATH}")
+        print(f"   - 총 행 수: {writer.num_rows} (청크로 분할된 문서: {chunked_docs}개)") # 994개로 6개 걸러짐
+        if detector is not None:
+            detector.save(DEDUP_PATH)
+            print(f"   - 유사 중복 제외: {duplicate_count}개 ({DEDUP_MODE})")
+
+        # 파일명 -> 경로 인덱스 갱신 (서버의 _resolve_file_path가 사용)
+        path_index = PathIndex.load_or_build()
+        print(f"   - 경로 인덱스: {len(path_index)}개 이미지 ({path_index.index_path})")
     else:
+        os.remove(SAVE_PATH)
         print(" 저장할 데이터가 없습니다.")
 
 if __name__ == "__main__":
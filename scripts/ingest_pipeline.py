@@ -0,0 +1,153 @@
+# scripts/ingest_pipeline.py
+'''
+원본 이미지(data/raw) -> 검색 가능한 ChromaDB 컬렉션까지 한 번에 처리
+
+    data/raw/**/*.png
+        ↓  [ocr]       OCRAggregator (PaddleOCR)
+        ↓  [dedup]     MinHash/LSH 유사 중복 제거
+        ↓  [classify]  DocumentClassifier (LayoutLMv3)
+        ↓  [chunk]     긴 문서는 레이아웃 영역 단위로 분할
+        ↓  [embed]     Gemini Embedding
+        ↓  [upsert]    ChromaDB 전체 + 라벨별 파티션 (+ BM25 역색인 증분 추가)
+
+각 단계는 크기가 제한된 Queue로 연결되고, 단계마다 별도의 worker pool에서 실행됩니다.
+(기존 방식: OCR JSON 생성 -> ingest.py -> ingest_vector.py 를 따로 실행)
+'''
+import os
+import sys
+import json
+import time
+import warnings
+import chromadb
+import chromadb.utils.embedding_functions as embedding_functions
+from tqdm import tqdm
+from dotenv import load_dotenv
+
+warnings.filterwarnings("ignore")
+
+load_dotenv()
+
+# 프로젝트 루트 경로 설정
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from src.ingest.pipeline import Pipeline, print_stats
+from src.ingest.dedup import NearDuplicateDetector
+from src.rag.lexical_index import BM25Index, LEXICAL_INDEX_PATH
+from src.rag.partitions import PartitionedCollections
+from src.utils.path_index import PathIndex
+from src.core.gemini_config import configure_generativeai
+from src.ingest.stages import ocr_stage, dedup_stage, classify_stage, chunk_stage, embed_stage, upsert_stage
+
+# 설정
+RAW_DIR = os.path.join(project_root, "data/raw")
+OCR_DIR = os.path.join(project_root, "data/processed/ocr")   # OCR JSON도 함께 저장 (None이면 저장 안 함)
+STATS_PATH = os.path.join(project_root, "data/processed/ingest_pipeline_stats.json")
+DB_PATH = "./chroma_db"
+COLLECTION_NAME = "docs"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+# 유사 중복 제거 설정 (DEDUP_THRESHOLD = None이면 비활성화)
+DEDUP_THRESHOLD = 0.9
+DEDUP_MODE = "link"   # "skip": 버림 / "link": 색인하지 않고 canonical id에 연결 기록
+DEDUP_PATH = os.path.join(project_root, "data/processed/dedup_signatures.npz")
+
+# Stage별 worker 수 / Queue 크기
+QUEUE_SIZE = 32
+OCR_WORKERS = 2
+CLASSIFY_WORKERS = 1
+EMBED_WORKERS = 4
+UPSERT_WORKERS = 1
+UPSERT_BATCH_SIZE = 64
+
+# 긴 문서 청크 분할 여부
+CHUNK_MODE = True
+
+# 라벨별 파티션 컬렉션(docs__<label>)에도 함께 적재
+PARTITION_MODE = True
+
+
+def iter_images(root):
+    for current_root, dirs, files in os.walk(root):
+        for file in sorted(files):
+            if file.lower().endswith(IMAGE_EXTS):
+                yield os.path.join(current_root, file)
+
+
+def main():
+    print(" 원본 이미지 -> ChromaDB 파이프라인 시작...")
+
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("❌ Error: .env 파일에 GOOGLE_API_KEY가 없습니다.")
+        return
+
+    # 1. DB 연결 (기존 컬렉션은 유지하고 upsert)
+    client = chromadb.PersistentClient(path=DB_PATH)
+    gemini_ef = embedding_functions.GoogleGenerativeAiEmbeddingFunction(
+        api_key=os.getenv("GOOGLE_API_KEY"),
+        task_type="RETRIEVAL_QUERY"
+    )
+    # 임베딩 함수가 genai.configure를 덮어쓰므로 GEMINI_BASE_URL override 다시 적용
+    configure_generativeai()
+    collection = client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        embedding_function=gemini_ef,
+        metadata={"hnsw:space": "cosine"}
+    )
+
+    # 2. 입력 이미지 목록
+    image_paths = list(iter_images(RAW_DIR))
+    print(f"   -> 총 {len(image_paths)}개 이미지 처리 예정")
+
+    # 3. 파이프라인 구성
+    stages = [ocr_stage(workers=OCR_WORKERS, save_dir=OCR_DIR)]
+
+    detector = None
+    if DEDUP_THRESHOLD is not None:
+        detector = NearDuplicateDetector(threshold=DEDUP_THRESHOLD, mode=DEDUP_MODE).load(DEDUP_PATH)
+        stages.append(dedup_stage(detector))
+
+    stages.append(classify_stage(workers=CLASSIFY_WORKERS))
+    if CHUNK_MODE:
+        stages.append(chunk_stage())
+    lexical_index = BM25Index.load_or_create(LEXICAL_INDEX_PATH)
+    partitions = PartitionedCollections(client, COLLECTION_NAME, embedding_function=gemini_ef) if PARTITION_MODE else None
+    stages += [
+        embed_stage(workers=EMBED_WORKERS),
+        upsert_stage(collection, workers=UPSERT_WORKERS, batch_size=UPSERT_BATCH_SIZE,
+                     lexical_index=lexical_index, partitions=partitions, detector=detector),
+    ]
+    pipeline = Pipeline(stages=stages, queue_size=QUEUE_SIZE)
+
+    # 4. 실행
+    start = time.time()
+    with tqdm(desc="Indexed") as pbar:
+        stats = pipeline.run(image_paths, on_result=lambda item: pbar.update(1))
+    elapsed = time.time() - start
+
+    # 5. 통계 출력 / 저장
+    print_stats(stats)
+    indexed = stats[-1]["emitted"]
+    print(f"\n✅ 완료: {indexed}개 문서(청크) 색인 ({elapsed:.1f}초, {indexed / max(elapsed, 1e-9):.2f} docs/s)")
+
+    lexical_index.save(LEXICAL_INDEX_PATH)
+    print(f"   - BM25 역색인 저장: {LEXICAL_INDEX_PATH} ({len(lexical_index)} docs)")
+
+    if detector is not None:
+        detector.save(DEDUP_PATH)
+        dedup_stats = next(s for s in stats if s["stage"] == "dedup")
+        print(f"   - 유사 중복 제외: {dedup_stats['dropped']}개 (연결 기록: {len(detector.links)}개)")
+
+    # 파일명 -> 경로 인덱스 갱신 (서버의 _resolve_file_path가 사용)
+    path_index = PathIndex.load_or_build()
+    print(f"   - 경로 인덱스: {len(path_index)}개 이미지 ({path_index.index_path})")
+
+    os.makedirs(os.path.dirname(STATS_PATH), exist_ok=True)
+    with open(STATS_PATH, "w", encoding="utf-8") as f:
+        json.dump({"elapsed_sec": round(elapsed, 3), "stages": stats}, f, indent=2, ensure_ascii=False)
+    print(f"   - Stage 통계 저장: {STATS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
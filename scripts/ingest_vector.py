@@ -1,18 +1,27 @@
 # scripts/ingest_vector.py 
 import chromadb
 import chromadb.utils.embedding_functions as embedding_functions # 추가됨
-import pandas as pd
 import os
-from tqdm import tqdm
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 프로젝트 루트 경로 설정 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ingest.bulk_loader import BulkLoader
+from src.rag.lexical_index import BM25Index, LEXICAL_INDEX_PATH
+from src.rag.partitions import PartitionedCollections
+
 # 설정 
 DB_PATH = "./chroma_db"
 DATA_PATH = "data/processed/document_embeddings.parquet"
 COLLECTION_NAME = "docs"
-BATCH_SIZE = 100 
+UPSERT_WORKERS = 4                      # 동시 upsert 스레드 수
+TARGET_BATCH_BYTES = 8 * 1024 * 1024    # upsert 1회당 목표 payload (임베딩 + 텍스트)
+MAX_RETRIES = 3                         # 배치별 재시도 횟수
+PARTITION_MODE = True                   # 라벨별 파티션 컬렉션(docs__<label>)도 함께 생성
 
 def main():
     # 1. DB 연결
@@ -32,6 +41,12 @@ def main():
     except:
         pass # 없으면 넘어감
 
+    # 라벨별 파티션도 전체 인덱스와 함께 초기화
+    partitions = PartitionedCollections(client, COLLECTION_NAME, embedding_function=gemini_ef)
+    if len(partitions):
+        partitions.drop_all()
+        print(f" 기존 '{COLLECTION_NAME}' 파티션 컬렉션 삭제 완료")
+
     # 3. 컬렉션 다시 생성 
     collection = client.create_collection(
         name=COLLECTION_NAME,
@@ -40,38 +55,29 @@ def main():
     )
     print(f" Collection '{COLLECTION_NAME}' created (with Gemini Config).")
 
-    # 4. 데이터 로드 
+    # 4. 데이터 확인 
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f" 파일을 찾을 수 없습니다: {DATA_PATH}")
     
-    print(f"Reading Parquet from '{DATA_PATH}'...")
-    df = pd.read_parquet(DATA_PATH)
-    
-    ids = df["doc_id"].astype(str).tolist()
-    embeddings = [x.tolist() for x in df["embedding"]]
-    documents = df["text"].fillna("").tolist() 
-    
-    metadatas = []
-    for _, row in df.iterrows():
-        metadatas.append({
-            "label": str(row["label"]),      
-            "file_path": str(row["file_path"])
-        })
-
-    # 5. DB 적재
-    print("Starting ingestion...")
-    for i in tqdm(range(0, len(df), BATCH_SIZE), desc="Ingesting"):
-        batch_ids = ids[i : i + BATCH_SIZE]
-        batch_embeddings = embeddings[i : i + BATCH_SIZE]
-        batch_documents = documents[i : i + BATCH_SIZE]
-        batch_metadatas = metadatas[i : i + BATCH_SIZE]
+    # 5. 대량 적재 (컬럼 단위 metadata 생성 + payload 기반 배치 + 병렬 upsert + 배치별 재시도)
+    #    컬렉션을 새로 만들었으므로 BM25 역색인도 처음부터 다시 생성
+    print(f"Bulk loading Parquet from '{DATA_PATH}'...")
+    lexical_index = BM25Index()
+    loader = BulkLoader(
+        collection,
+        workers=UPSERT_WORKERS,
+        target_batch_bytes=TARGET_BATCH_BYTES,
+        max_retries=MAX_RETRIES,
+        lexical_index=lexical_index,
+        partitions=partitions if PARTITION_MODE else None,
+    )
+    loader.load_parquet(DATA_PATH)
+    if PARTITION_MODE:
+        print(f"✅ Partitions: {sorted(partitions.partitions)}")
 
-        collection.upsert(
-            ids=batch_ids,
-            embeddings=batch_embeddings,
-            documents=batch_documents,
-            metadatas=batch_metadatas
-        )
+    # 6. BM25 역색인 저장 (Retriever가 hybrid 검색에 사용)
+    lexical_index.save(LEXICAL_INDEX_PATH)
+    print(f"✅ BM25 Index saved: {LEXICAL_INDEX_PATH} ({len(lexical_index)} docs)")
 
 
 if __name__ == "__main__":
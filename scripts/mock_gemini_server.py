@@ -0,0 +1,275 @@
+# scripts/mock_gemini_server.py
+'''
+부하 테스트용 로컬 Gemini API 대역 서버
+
+실제 Google API 없이 /chat, /search 전체 경로를 벤치마크하기 위한 mock 서버입니다.
+프로젝트가 쓰는 REST 엔드포인트만 구현합니다.
+
+    POST /v1beta/models/{model}:generateContent        (GeminiClient / AsyncGeminiClient / IntentRouter)
+    POST /v1beta/models/{model}:streamGenerateContent  (?alt=sse, AsyncGeminiClient.generate_stream)
+    POST /v1beta/models/{model}:embedContent           (get_embedding)
+    POST /v1beta/models/{model}:batchEmbedContents     (get_query_embeddings, chromadb 임베딩 함수)
+    GET  /mock/stats                                   (요청 수 / 주입한 오류 수 / 지연 통계)
+
+특징:
+    - 지연 분포 설정: "fixed:ms" / "normal:mean:std" / "lognormal:median:sigma" (ms)
+    - 오류율 설정: 일정 비율로 429 / 503 반환 (클라이언트 재시도 / hedging 검증용)
+    - 임베딩은 텍스트로부터 결정적으로 생성 (같은 텍스트 = 같은 벡터, 단어가 겹치면 cosine 유사도도 높음)
+
+사용 예:
+    python scripts/mock_gemini_server.py --port 8090 --gen-latency lognormal:800:0.4 --error-rate 0.02
+    GEMINI_BASE_URL=http://localhost:8090 GOOGLE_API_KEY=mock uvicorn src.main:app
+'''
+import os
+import sys
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+# 프로젝트 루트 경로 설정
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.lexical_index import tokenize
+
+# 기본 설정
+EMBEDDING_DIM = 3072
+LABELS = ["advertisement", "budget", "email", "file folder", "form", "handwritten", "invoice", "letter",
+          "memo", "news article", "presentation", "questionnaire", "resume", "scientific publication",
+          "scientific report", "specification"]
+# 같은 단어의 비중 vs 텍스트 고유 잡음 (잡음이 작을수록 단어가 겹치는 텍스트끼리 더 비슷해짐)
+EMBEDDING_NOISE = 0.3
+# 응답 텍스트는 청크 몇 개로 나눠서 스트리밍할지
+STREAM_CHUNKS = 8
+
+
+# 1. 지연 / 오류 주입
+class LatencyModel:
+    """
+    "fixed:50" / "normal:80:20" / "lognormal:800:0.4" (ms, lognormal은 중앙값과 sigma)
+    """
+    def __init__(self, spec: str, rng: random.Random):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self.rng = rng
+        if self.kind not in ("fixed", "normal", "lognormal"):
+            raise ValueError(f"알 수 없는 지연 분포: {spec}")
+
+    def sample_ms(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(self.params[0], self.params[1]))
+        median, sigma = self.params
+        return median * float(np.exp(self.rng.gauss(0.0, sigma)))
+
+
+class FaultInjector:
+    def __init__(self, error_rate: float, rng: random.Random):
+        self.error_rate = error_rate
+        self.rng = rng
+
+    def pick(self):
+        """None 또는 (status code, status 문자열)"""
+        if self.rng.random() >= self.error_rate:
+            return None
+        return self.rng.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+
+
+# 2. 결정적 임베딩
+def _seeded_vector(key: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def pseudo_embedding(text: str, dim: int = EMBEDDING_DIM) -> list:
+    """
+    단어별 고정 벡터의 합 + 텍스트 고유 잡음 -> L2 정규화
+    같은 텍스트는 항상 같은 벡터, 단어가 많이 겹칠수록 cosine 유사도가 높음
+    """
+    tokens = tokenize(text or "")
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        vector += _seeded_vector(f"tok:{token}", dim)
+    if tokens:
+        vector /= np.linalg.norm(vector) or 1.0
+    vector += EMBEDDING_NOISE * _seeded_vector(f"text:{text}", dim) / np.sqrt(dim)
+    vector /= np.linalg.norm(vector) or 1.0
+    return vector.tolist()
+
+
+# 3. 생성 응답 (프롬프트 종류별 그럴듯한 형식)
+def _prompt_text(body: dict) -> str:
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def mock_answer(prompt: str, response_words: int) -> str:
+    digest = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+    if "의도 분류기" in prompt:
+        # IntentRouter: 일부는 unknown, 나머지는 결정적으로 라벨 선택
+        label = "unknown" if digest % 5 == 0 else LABELS[digest % len(LABELS)]
+        return json.dumps({"label": label, "confidence": 0.9 if label != "unknown" else 0.3})
+    if "재선별기" in prompt:
+        # LLM rerank: 후보 번호 하나
+        return str(digest % 3 + 1)
+    if "요약" in prompt and "[추가 대화]" in prompt:
+        return "사용자는 문서의 주요 수치와 작성자를 확인했습니다."
+    words = [f"mock{(digest >> (i % 64)) % 1000}" for i in range(response_words)]
+    return "문서 분석 결과(mock): " + " ".join(words) + " (분석 대상: mock)"
+
+
+def _generate_response(model: str, text: str, prompt: str, finish: bool = True) -> dict:
+    response = {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "index": 0,
+        }],
+        "modelVersion": model,
+    }
+    if finish:
+        response["candidates"][0]["finishReason"] = "STOP"
+        response["usageMetadata"] = {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        }
+    return response
+
+
+def _error_body(code: int, status: str) -> dict:
+    return {"error": {"code": code, "message": f"mock injected error ({status})", "status": status}}
+
+
+# 4. 서버
+def create_app(args):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    rng = random.Random(args.seed)
+    latency = {
+        "generate": LatencyModel(args.gen_latency, rng),
+        "ttft": LatencyModel(args.ttft_latency, rng),
+        "embed": LatencyModel(args.embed_latency, rng),
+    }
+    faults = FaultInjector(args.error_rate, rng)
+    stats = defaultdict(lambda: {"requests": 0, "errors": 0, "latency_ms": []})
+
+    app = FastAPI(title="Mock Gemini API")
+
+    async def _delay(kind: str, endpoint: str):
+        ms = latency[kind].sample_ms()
+        stats[endpoint]["latency_ms"].append(ms)
+        await asyncio.sleep(ms / 1000)
+
+    def _fault(endpoint: str):
+        stats[endpoint]["requests"] += 1
+        fault = faults.pick()
+        if fault is None:
+            return None
+        stats[endpoint]["errors"] += 1
+        return JSONResponse(_error_body(*fault), status_code=fault[0])
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        error = _fault("generateContent")
+        await _delay("generate", "generateContent")
+        if error is not None:
+            return error
+        prompt = _prompt_text(await request.json())
+        return _generate_response(model, mock_answer(prompt, args.response_words), prompt)
+
+    @app.post("/v1beta/models/{model}:streamGenerateContent")
+    async def stream_generate_content(model: str, request: Request):
+        error = _fault("streamGenerateContent")
+        if error is not None:
+            await _delay("ttft", "streamGenerateContent")
+            return error
+        prompt = _prompt_text(await request.json())
+        text = mock_answer(prompt, args.response_words)
+        step = max(1, len(text) // STREAM_CHUNKS)
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        # 첫 청크까지 ttft, 나머지 시간은 청크 사이에 나눠서
+        total_ms = latency["generate"].sample_ms()
+
+        async def events():
+            await _delay("ttft", "streamGenerateContent")
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(total_ms / 1000 / len(pieces))
+                chunk = _generate_response(model, piece, prompt, finish=(i == len(pieces) - 1))
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1beta/models/{model}:embedContent")
+    async def embed_content(model: str, request: Request):
+        error = _fault("embedContent")
+        await _delay("embed", "embedContent")
+        if error is not None:
+            return error
+        body = await request.json()
+        text = " ".join(p.get("text", "") for p in body.get("content", {}).get("parts", []))
+        dim = body.get("outputDimensionality") or args.dim
+        return {"embedding": {"values": pseudo_embedding(text, dim)}}
+
+    @app.post("/v1beta/models/{model}:batchEmbedContents")
+    async def batch_embed_contents(model: str, request: Request):
+        error = _fault("batchEmbedContents")
+        await _delay("embed", "batchEmbedContents")
+        if error is not None:
+            return error
+        body = await request.json()
+        embeddings = []
+        for item in body.get("requests", []):
+            text = " ".join(p.get("text", "") for p in item.get("content", {}).get("parts", []))
+            dim = item.get("outputDimensionality") or args.dim
+            embeddings.append({"values": pseudo_embedding(text, dim)})
+        return {"embeddings": embeddings}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        report = {}
+        for endpoint, s in stats.items():
+            lat = np.asarray(s["latency_ms"]) if s["latency_ms"] else np.zeros(1)
+            report[endpoint] = {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "latency_p50_ms": round(float(np.percentile(lat, 50)), 1),
+                "latency_p95_ms": round(float(np.percentile(lat, 95)), 1),
+            }
+        return report
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--gen-latency", default="lognormal:800:0.4", help="generateContent 전체 지연 (ms)")
+    parser.add_argument("--ttft-latency", default="lognormal:300:0.3", help="스트리밍 첫 청크까지 지연 (ms)")
+    parser.add_argument("--embed-latency", default="normal:80:20", help="임베딩 요청 지연 (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429 / 503을 반환할 비율 (0~1)")
+    parser.add_argument("--response-words", type=int, default=60, help="생성 응답 길이 (단어 수)")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+    print(f"🧪 Mock Gemini API: http://{args.host}:{args.port} "
+          f"(gen={args.gen_latency}, embed={args.embed_latency}, error_rate={args.error_rate})")
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import sys
+import os
+import time
+import unittest
+
+import numpy as np
+
+# 프로젝트 루트 경로
+PROJECT_ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+'''
+질문 인코더 parity 테스트 (full vs text 모드)
+
+기존 색인은 Dummy Image + 텍스트(full 모드)로 만든 벡터이므로, text 모드를 기본값으로 바꾸려면
+같은 질문 fixture에서 ChromaDB 검색 순위가 유지되는지 먼저 확인해야 합니다.
+
+    - overlap@k:      두 모드 Top-K 문서 집합의 겹침 비율 (질문 평균)
+    - rank 상관계수:  full 모드 Top-POOL 후보에 대한 두 모드 distance의 Spearman 상관 (질문 평균)
+    - Top-1 일치율
+    - 질문당 CPU 시간 (legacy 512 padding 대비 배수)
+
+실행 (모델 파일 + chroma_db가 있어야 함, 없으면 skip):
+    python -m unittest scripts/test_query_encoder.py -v
+    python scripts/test_query_encoder.py
+'''
+
+DB_PATH = os.path.join(PROJECT_ROOT, "chroma_db")
+TOP_K = 5
+POOL = 20
+REPEAT = 3
+
+# 허용 기준 (text 모드 기본값 전환 조건)
+MIN_OVERLAP = 0.8        # 평균 overlap@TOP_K
+MIN_SPEARMAN = 0.8       # 평균 Spearman 상관 (Top-POOL 후보 기준)
+MIN_TOP1 = 0.7           # Top-1 일치율
+MIN_BATCH_COSINE = 0.999 # 배치 인코딩 vs 단건 인코딩
+MIN_SPEEDUP = 5.0        # legacy 대비 text 모드 질문당 CPU 시간
+
+# 질문 fixture (라벨별 대표 질문 + 한국어 / 짧은 / 긴 질문)
+QUERIES = [
+    "invoice total amount",
+    "총액이 얼마야?",
+    "marketing budget plan",
+    "resume python developer",
+    "scientific report results",
+    "handwritten memo",
+    "email meeting schedule",
+    "questionnaire survey form",
+    "news article",
+    "specification sheet",
+    "advertisement for cigarettes with a discount coupon",
+    "letter from the president regarding the annual meeting",
+    "presentation slides",
+    "file folder",
+    "scientific publication abstract and references",
+    "budget",
+]
+
+
+def _available():
+    try:
+        import torch  # noqa: F401
+        from src.core.model_loader import DEFAULT_MODEL_PATH
+    except ImportError:
+        return False
+    fallback = os.path.join(PROJECT_ROOT, "layoutlmv3_finetuned.pt")
+    return (os.path.exists(DEFAULT_MODEL_PATH) or os.path.exists(fallback)) and os.path.isdir(DB_PATH)
+
+
+def legacy_embedding(engine, text_query):
+    # 변경 전 구현 그대로: Dummy Image + 512 고정 padding
+    import torch
+    from PIL import Image
+
+    dummy_image = Image.new("RGB", (224, 224), color="black")
+    words = text_query.split()
+    if not words: words = ["unknown"]
+    boxes = [[0, 0, 0, 0]] * len(words)
+    encoding = engine.processor(
+        images=dummy_image, text=words, boxes=boxes, return_tensors="pt",
+        padding="max_length", truncation=True, max_length=512
+    )
+    inputs = {k: v.to(engine.device) for k, v in encoding.items()}
+    with torch.no_grad():
+        outputs = engine.model(**inputs)
+        seq_len = inputs["input_ids"].shape[1]
+        text_output = outputs.last_hidden_state[:, :seq_len, :]
+        mask = inputs["attention_mask"].unsqueeze(-1).expand(text_output.size()).float()
+        embedding = torch.sum(text_output * mask, 1) / torch.clamp(mask.sum(1), min=1e-9)
+    return embedding[0].cpu().tolist()
+
+
+def cpu_time(fn):
+    start = time.process_time()
+    for _ in range(REPEAT):
+        fn()
+    return (time.process_time() - start) / REPEAT
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+
+
+def spearman(x, y):
+    # 동점 없는 연속값(distance) 기준 Spearman = 순위끼리의 Pearson 상관
+    rx = np.argsort(np.argsort(x)).astype(np.float64)
+    ry = np.argsort(np.argsort(y)).astype(np.float64)
+    if rx.std() == 0 or ry.std() == 0:
+        return 1.0
+    return float(np.corrcoef(rx, ry)[0, 1])
+
+
+@unittest.skipUnless(_available(), "LayoutLMv3 모델 파일 또는 chroma_db가 없어 건너뜀")
+class QueryEncoderParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import torch
+        from src.core.retriever import SearchEngine
+
+        torch.set_num_threads(1)   # CPU 시간 비교를 위해 단일 스레드
+        cls.engine = SearchEngine(db_path=DB_PATH, encoder_mode="full")
+        cls.vectors = {}
+        for mode in ("full", "text"):
+            cls.engine.encoder_mode = mode
+            cls.vectors[mode] = [cls.engine._query_to_embedding(q) for q in QUERIES]
+        cls.engine.encoder_mode = "full"
+
+    def _pool(self, vec):
+        results = self.engine.collection.query(query_embeddings=[vec], n_results=POOL,
+                                               include=["embeddings"])
+        return results["ids"][0], np.asarray(results["embeddings"][0], dtype=np.float64)
+
+    def test_ranking_parity(self):
+        overlaps, correlations, top1 = [], [], 0
+        for full_vec, text_vec in zip(self.vectors["full"], self.vectors["text"]):
+            ids, embs = self._pool(full_vec)
+            text_ids, _ = self._pool(text_vec)
+
+            overlaps.append(len(set(ids[:TOP_K]) & set(text_ids[:TOP_K])) / max(min(TOP_K, len(ids)), 1))
+            top1 += int(bool(ids) and bool(text_ids) and ids[0] == text_ids[0])
+
+            # full 모드 후보 POOL개를 두 질문 벡터로 각각 점수화해서 순위 상관 비교
+            full_dist = [1.0 - cosine(full_vec, e) for e in embs]
+            text_dist = [1.0 - cosine(text_vec, e) for e in embs]
+            correlations.append(spearman(full_dist, text_dist))
+
+        n = len(QUERIES)
+        overlap, correlation, top1_rate = float(np.mean(overlaps)), float(np.mean(correlations)), top1 / n
+        print(f"\n 순위 보존 (text vs full, 질문 {n}개): overlap@{TOP_K} {overlap:.3f} | "
+              f"Spearman@{POOL} {correlation:.3f} | Top-1 {top1}/{n}")
+
+        self.assertGreaterEqual(overlap, MIN_OVERLAP, f"overlap@{TOP_K} {overlap:.3f} < {MIN_OVERLAP}")
+        self.assertGreaterEqual(correlation, MIN_SPEARMAN, f"Spearman {correlation:.3f} < {MIN_SPEARMAN}")
+        self.assertGreaterEqual(top1_rate, MIN_TOP1, f"Top-1 {top1_rate:.3f} < {MIN_TOP1}")
+
+    def test_batch_matches_single(self):
+        for mode in ("full", "text"):
+            self.engine.encoder_mode = mode
+            batch = self.engine.encode_queries(QUERIES)
+            for query, single, batched in zip(QUERIES, self.vectors[mode], batch):
+                self.assertGreaterEqual(cosine(single, batched), MIN_BATCH_COSINE, f"{mode}: {query}")
+        self.engine.encoder_mode = "full"
+
+    def test_cpu_speedup(self):
+        legacy = sum(cpu_time(lambda: legacy_embedding(self.engine, q)) for q in QUERIES)
+        timings = {}
+        for mode in ("full", "text"):
+            self.engine.encoder_mode = mode
+            timings[mode] = sum(cpu_time(lambda: self.engine._query_to_embedding(q)) for q in QUERIES)
+        self.engine.encoder_mode = "full"
+
+        n = len(QUERIES)
+        print(f"\n 질문당 CPU 시간: legacy {legacy / n * 1000:.1f} ms | "
+              + " | ".join(f"{mode} {t / n * 1000:.1f} ms ({legacy / t:.1f}x)" for mode, t in timings.items()))
+        self.assertGreaterEqual(legacy / timings["text"], MIN_SPEEDUP)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+# src/api/cursor_store.py
+'''
+검색 결과 페이지네이션용 커서 저장소
+
+첫 요청에서 넉넉히 가져온(top_k) 결과 전체를 서버 메모리에 잠깐(TTL) 보관하고,
+다음 페이지는 커서 토큰으로 바로 잘라서 반환 -> 질문 임베딩 / 인덱스 검색을 다시 하지 않음
+
+커서 형식: "<결과 key>.<offset>"
+(프로세스 메모리에 저장하므로 worker가 여러 개면 같은 worker로 가야 이어서 조회 가능)
+'''
+import time
+import secrets
+import threading
+from collections import OrderedDict
+
+CURSOR_TTL_SEC = 300
+MAX_CURSORS = 1000
+
+
+class CursorStore:
+    def __init__(self, ttl_sec: float = CURSOR_TTL_SEC, max_entries: int = MAX_CURSORS):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries = OrderedDict()      # key -> (만료 시각, 결과 리스트)
+        self._lock = threading.Lock()
+
+    def put(self, items: list) -> str:
+        key = secrets.token_urlsafe(12)
+        with self._lock:
+            self._evict()
+            self._entries[key] = (time.time() + self.ttl_sec, items)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def get(self, key: str):
+        """만료되었거나 없으면 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+
+    def _evict(self):
+        now = time.time()
+        expired = [k for k, (expires_at, _) in self._entries.items() if expires_at < now]
+        for k in expired:
+            del self._entries[k]
+
+
+def make_cursor(key: str, offset: int) -> str:
+    return f"{key}.{offset}"
+
+
+def parse_cursor(cursor: str):
+    """Returns: (key, offset) / 형식이 잘못되면 ValueError"""
+    key, _, offset = cursor.rpartition(".")
+    if not key or not offset.isdigit():
+        raise ValueError(f"잘못된 cursor 형식: {cursor}")
+    return key, int(offset)
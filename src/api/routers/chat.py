@@ -1,12 +1,19 @@
 # src/api/routers/chat.py
 import os
+import json
+import time
 import shutil 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+import asyncio
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from fastapi.responses import StreamingResponse
 from src.core.storage import S3Client 
 from src.core.router import IntentRouter
 from src.rag.multimodal_rag import MultimodalRAG
 from src.rag.upload_processor import DocumentProcessor 
+from src.rag.conversation_memory import ConversationMemory
 from src.api.schemas import ChatRequest, ChatResponse
+from src.core.llm import LLMError, LLMTimeoutError
+from src.utils.latency import get_latency_tracker
 
 router = APIRouter()
 
@@ -15,12 +22,23 @@ intent_router = IntentRouter()
 rag_system = MultimodalRAG()
 doc_processor = DocumentProcessor() # LayoutLM + OCR
 s3_client = S3Client() 
+latency_tracker = get_latency_tracker()   # /health에서 TTFT / 총 시간 p50, p95 확인
 
 # 2. 세션 저장소
 session_store = {}
 TEMP_DIR = "temp_uploads"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# 3. 라우팅 / 검색 동시 실행 설정
+#   라우터(Gemini) 응답을 기다리는 동안 필터 없는 검색을 미리 돌려두고,
+#   라벨이 정해지면 미리 가져온 후보에서 라벨만 골라냄 (부족하면 필터 검색 한 번 더)
+RAG_TOP_K = 5
+SPECULATIVE_OVERFETCH = int(os.getenv("SPECULATIVE_OVERFETCH", "4"))   # 필터 없는 검색은 top_k의 몇 배
+ROUTE_TIMEOUT = float(os.getenv("ROUTE_TIMEOUT", "8"))                # 초과 시 라우팅 포기 -> 전체 검색
+SPECULATIVE_TIMEOUT = float(os.getenv("SPECULATIVE_TIMEOUT", "5"))    # 초과 시 미리 검색 포기 -> 필터 검색
+# 채팅 검색에 MMR(다양성 선택) 사용 여부 (기본 off -> Hybrid/RRF 순위 그대로 사용)
+CHAT_MMR = os.getenv("CHAT_MMR", "off") == "on"
+
 @router.post("/upload")
 async def upload_document(session_id: str = Form(...), file: UploadFile = File(...)):
     """
@@ -37,6 +55,8 @@ async def upload_document(session_id: str = Form(...), file: UploadFile = File(.
         file_path = os.path.join(TEMP_DIR, file.filename)
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        # 같은 이름으로 다시 올린 경우 이전 답변 캐시 폐기
+        rag_system.answer_cache.invalidate(file_path)
             
         # [Step 2] AWS S3 업로드 (로컬 파일 읽어서 업로드) ☁️
         # 이미 디스크에 저장된 파일을 다시 열어서('rb') S3로 보냅니다.
@@ -51,13 +71,7 @@ async def upload_document(session_id: str = Form(...), file: UploadFile = File(.
             return {"message": "문서 분석 실패"}
 
         # [Step 4] 세션에 정보 저장
-        if session_id not in session_store:
-            session_store[session_id] = {
-                "history": [], 
-                "active_file": None, 
-                "label": None, 
-                "s3_key": None
-            }
+        _get_session(session_id)
             
         session_store[session_id]["active_file"] = file_path
         session_store[session_id]["label"] = processed_data['label']
@@ -77,65 +91,170 @@ async def upload_document(session_id: str = Form(...), file: UploadFile = File(.
             os.remove(file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _format_timings(timings: dict) -> str:
+    """{"route": 812.3, ...} -> "route=812.3;retrieve=240.1;..." (ms)"""
+    return ";".join(f"{stage}={ms}" for stage, ms in timings.items())
+
+
+async def _cancel(*tasks):
+    """끝나지 않은 작업 정리 (to_thread 작업은 스레드는 끝까지 돌지만 결과는 버림)"""
+    for task in tasks:
+        if task is not None and not task.done():
+            task.cancel()
+    await asyncio.gather(*[t for t in tasks if t is not None], return_exceptions=True)
+
+
+async def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = await asyncio.to_thread(fn, *args, **kwargs)
+    return result, _elapsed_ms(start)
+
+
+async def _timed_async(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, _elapsed_ms(start)
+
+
+async def _route_and_retrieve(query: str, timings: dict):
     """
-    [채팅]
-    1. 파일이 있으면 -> 라우터 건너뛰고, 질문에 '[문서타입]' 정보를 붙여서 보냄.
-    2. 파일이 없으면 -> 라우터 쓰고, DB 검색.
+    라우팅과 검색을 동시에 실행
+    1. 라우터 호출과 필터 없는 검색(top_k * SPECULATIVE_OVERFETCH)을 같이 시작
+    2. 라우팅 결과가 오면 미리 가져온 후보에서 해당 라벨만 남김
+    3. 라벨 후보가 top_k보다 적거나 미리 검색이 실패 / 지연되면 필터 검색으로 보충
+    Returns: (route_result, candidates)
     """
-    user_id = request.session_id
-    
+    retriever = rag_system.retriever
+
+    # 로컬 라우터는 질문 임베딩만 있으면 1ms 안에 끝나므로, 임베딩을 먼저 한 번 만들어서
+    # 라우터 / 검색이 같은 벡터를 쓰게 함 (Gemini 임베딩 중복 호출 방지, 이후 검색은 캐시 hit)
+    query_embedding = None
+    if intent_router.local_router is not None:
+        try:
+            query_embedding, timings["embed"] = await _timed(retriever.embed_query, query)
+        except Exception as e:
+            print(f"⚠️ [Embed] 질문 임베딩 실패: {e}")
+
+    route_task = asyncio.create_task(_timed_async(intent_router.aroute(query, query_embedding)))
+    search_task = asyncio.create_task(_timed(
+        retriever.retrieve, query, top_k=RAG_TOP_K * SPECULATIVE_OVERFETCH, category=None, mmr=CHAT_MMR
+    ))
+
+    try:
+        # 1. 라우팅 (지연 시 전체 검색으로 진행)
+        try:
+            route_result, timings["route"] = await asyncio.wait_for(asyncio.shield(route_task), ROUTE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⚠️ [Router] {ROUTE_TIMEOUT}s 초과 -> 전체 검색")
+            timings["route"] = ROUTE_TIMEOUT * 1000
+            route_result = {"query": query, "label": "timeout", "confidence": 0.0,
+                            "filter": None, "reason": "Router Timeout -> 전체 검색"}
+
+        # 2. 미리 돌린 검색 결과
+        start = time.perf_counter()
+        try:
+            speculative, timings["retrieve"] = await asyncio.wait_for(asyncio.shield(search_task), SPECULATIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⚠️ [Speculative] 검색 {SPECULATIVE_TIMEOUT}s 초과 -> 필터 검색")
+            speculative = None
+        timings["retrieve_wait"] = _elapsed_ms(start)
+
+        # 3. 라벨 필터 적용
+        category = route_result["filter"]
+        if speculative is None:
+            candidates = None
+        elif category is None:
+            candidates = speculative[:RAG_TOP_K]
+        else:
+            candidates = [d for d in speculative if (d.get("metadata") or {}).get("label") == category][:RAG_TOP_K]
+            print(f"⚡ [Speculative] '{category}' 후보 {len(candidates)}/{len(speculative)}개 재사용")
+
+        # 4. 부족하면 필터 검색으로 보충
+        if candidates is None or (category is not None and len(candidates) < RAG_TOP_K):
+            candidates, timings["retrieve_filtered"] = await _timed(
+                retriever.retrieve, query, top_k=RAG_TOP_K, category=category, mmr=CHAT_MMR
+            )
+        return route_result, candidates
+    finally:
+        await _cancel(route_task, search_task)
+
+
+def _get_session(user_id: str) -> dict:
     # 세션 없으면 생성
     if user_id not in session_store:
-        session_store[user_id] = {"history": [], "active_file": None, "label": None, "s3_key": None}
-    
-    session = session_store[user_id]
+        session_store[user_id] = {"memory": ConversationMemory(), "active_file": None, "label": None, "s3_key": None}
+    return session_store[user_id]
+
+
+async def _plan_query(query: str, session: dict, timings: dict):
+    """
+    업로드 파일 유무에 따라 질문 / 검색 카테고리 / 후보 결정
+    Returns: (final_query, search_category, reason_msg, candidates)
+    """
     current_file = session["active_file"]
     doc_label = session["label"]
+
+    if current_file and doc_label:
+        # [Case A] 업로드 파일 있음 (Router Skip)
+        print(f"🚀 [Direct] 업로드된 '{doc_label}' 문서 사용")
+        # 질문에 문서 정보 태우기
+        return f"(문서 유형: {doc_label}) {query}", None, f"Uploaded ({doc_label})", None
+
+    # [Case B] 파일 없음 -> 라우팅 + 검색 동시 실행
+    route_result, candidates = await _route_and_retrieve(query, timings)
+    print(f"🤖 [Router] 검색 카테고리: {route_result['filter']}")
+    return query, route_result['filter'], route_result['reason'], candidates
+
+
+def _finish_turn(session: dict, query: str, answer: str, used_file: str):
+    # [Lock] 검색으로 파일을 찾았다면 고정
+    if session["active_file"] is None and used_file:
+        session["active_file"] = used_file
+        session["label"] = "Search Result"
+        print(f"📌 [Lock] 검색된 파일로 세션 고정: {os.path.basename(used_file)}")
+
+    # 대화 메모리 업데이트 (오래된 턴 요약은 응답 후 백그라운드에서)
+    session["memory"].add_turn(query, answer)
+    session["memory"].schedule_summary()
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, response: Response):
+    """
+    [채팅]
+    1. 파일이 있으면 -> 라우터 건너뛰고, 질문에 '[문서타입]' 정보를 붙여서 보냄.
+    2. 파일이 없으면 -> 라우터와 검색을 동시에 실행하고, 라우팅 결과로 후보 필터링.
+    단계별 소요 시간(ms)은 X-Debug-Timings 헤더로 반환.
+    """
+    total_start = time.perf_counter()
+    timings = {}
+    session = _get_session(request.session_id)
+    current_file = session["active_file"]
     
     print(f"\n=== Req: {request.query} [File: {os.path.basename(current_file) if current_file else 'None'}] ===")
     
     try:
-        # [로직 분기] 업로드 파일 유무에 따라 결정
-        if current_file and doc_label:
-            # [Case A] 업로드 파일 있음 (Router Skip)
-            print(f"🚀 [Direct] 업로드된 '{doc_label}' 문서 사용")
-            
-            search_category = None
-            reason_msg = f"Uploaded ({doc_label})"
-            
-            # 질문에 문서 정보 태우기
-            final_query = f"(문서 유형: {doc_label}) {request.query}"
-
-        else:
-            # [Case B] 파일 없음 -> 검색 필요 (Router Use)
-            route_result = intent_router.route(request.query)
-            
-            search_category = route_result['filter']
-            reason_msg = route_result['reason']
-            final_query = request.query 
-            
-            print(f"🤖 [Router] 검색 카테고리: {search_category}")
+        final_query, search_category, reason_msg, candidates = await _plan_query(request.query, session, timings)
 
-
-        # RAG 실행
-        answer, used_file = rag_system.answer(
+        # RAG 실행 (검색 / Rerank는 스레드, Vision은 AsyncGeminiClient)
+        answer, used_file = await rag_system.aanswer(
             query=final_query,                
             category=search_category,         
-            history=session["history"][-6:], 
-            target_file_path=current_file     
+            history=session["memory"].messages(), 
+            target_file_path=current_file,
+            candidates=candidates,
+            timings=timings,
         )
-        
-        # [Lock] 검색으로 파일을 찾았다면 고정
-        if session["active_file"] is None and used_file:
-            session["active_file"] = used_file
-            session["label"] = "Search Result"
-            print(f"📌 [Lock] 검색된 파일로 세션 고정: {os.path.basename(used_file)}")
-
-        # 히스토리 업데이트
-        session["history"].append(f"User: {request.query}")
-        session["history"].append(f"AI: {answer}")
+        _finish_turn(session, request.query, answer, used_file)
+
+        timings["total"] = _elapsed_ms(total_start)
+        latency_tracker.record("chat_total_ms", timings["total"])
+        response.headers["X-Debug-Timings"] = _format_timings(timings)
+        print(f"⏱️ [Timings] {_format_timings(timings)}")
         
         return ChatResponse(
             response=answer,
@@ -143,9 +262,74 @@ async def chat_endpoint(request: ChatRequest):
             reason=reason_msg
         )
 
+    except LLMTimeoutError as e:
+        print(f"❌ Chat Timeout: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMError as e:
+        print(f"❌ Chat LLM Error: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         print(f"❌ Chat Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    [채팅 - 스트리밍] /chat과 같은 처리, 답변을 Server-Sent Events로 생성되는 대로 전달
+        event: meta   -> {"category", "reason", "file"}  (문서가 정해진 직후)
+        event: token  -> {"text"}                         (Gemini 청크마다)
+        event: done   -> {"ttft_ms", "timings"}           (TTFT = 요청 시작 ~ 첫 토큰)
+        event: error  -> {"detail"}
+    """
+    total_start = time.perf_counter()
+    timings = {}
+    session = _get_session(request.session_id)
+    current_file = session["active_file"]
+
+    print(f"\n=== Req (stream): {request.query} [File: {os.path.basename(current_file) if current_file else 'None'}] ===")
+
+    async def event_stream():
+        try:
+            final_query, search_category, reason_msg, candidates = await _plan_query(request.query, session, timings)
+            used_file, error = await asyncio.to_thread(
+                rag_system.resolve_target, final_query, search_category, current_file,
+                candidates=candidates, timings=timings,
+            )
+            category = session["label"] or ("Search Result" if used_file else "General")
+            yield _sse("meta", {"category": category, "reason": reason_msg,
+                                "file": os.path.basename(used_file) if used_file else None})
+
+            pieces = [error] if error else []
+            if error:
+                yield _sse("token", {"text": error})
+            else:
+                vision_start = time.perf_counter()
+                async for text in rag_system.aanswer_stream(final_query, used_file, session["memory"].messages(), timings):
+                    if not pieces:
+                        timings["ttft"] = _elapsed_ms(total_start)
+                    pieces.append(text)
+                    yield _sse("token", {"text": text})
+                timings["vision"] = _elapsed_ms(vision_start)
+
+            _finish_turn(session, request.query, "".join(pieces), used_file)
+            timings["total"] = _elapsed_ms(total_start)
+            if "ttft" in timings:
+                latency_tracker.record("chat_ttft_ms", timings["ttft"])
+            latency_tracker.record("chat_stream_total_ms", timings["total"])
+            print(f"⏱️ [Timings] {_format_timings(timings)}")
+            yield _sse("done", {"ttft_ms": timings.get("ttft"), "timings": timings})
+
+        except Exception as e:
+            print(f"❌ Chat Stream Error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
     
 
 @router.delete("/chat/session/{session_id}")
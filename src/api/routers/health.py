@@ -1,5 +1,10 @@
 from fastapi import APIRouter
 from src.core.model_loader import get_model
+from src.core.query_cache import get_query_cache
+from src.utils.image_prep import get_image_cache
+from src.utils.latency import get_latency_tracker
+from src.core.llm import get_async_llm
+from src.rag.answer_cache import get_answer_cache
 
 router = APIRouter(tags=["Health"])
 
@@ -11,8 +16,19 @@ def health_check():
         is_loaded = model is not None
     except:
         is_loaded = False
+
+    # GOOGLE_API_KEY가 없으면 LLM 클라이언트 생성이 실패 -> health 자체는 응답
+    try:
+        llm_metrics = get_async_llm().metrics()
+    except Exception as e:
+        llm_metrics = {"error": str(e)}
         
     return {
         "status": "ok", 
-        "model_loaded": is_loaded
+        "model_loaded": is_loaded,
+        "query_cache": get_query_cache().metrics(),
+        "image_cache": get_image_cache().metrics(),
+        "latency": get_latency_tracker().summary(),
+        "llm": llm_metrics,
+        "answer_cache": get_answer_cache().metrics()
     }
\ No newline at end of file
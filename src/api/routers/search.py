@@ -1,7 +1,11 @@
 # src/api/search.py
 
+import json
+import asyncio
 from fastapi import APIRouter, HTTPException
-from src.api.schemas import SearchRequest, SearchResponse, SearchResultItem
+from fastapi.responses import StreamingResponse
+from src.api.schemas import SearchRequest, SearchResponse, SearchResultItem, BatchSearchRequest, BatchSearchResponse, DocIdResolveResponse
+from src.api.cursor_store import CursorStore, make_cursor, parse_cursor
 from src.rag.retriever import Retriever  
 
 router = APIRouter()
@@ -9,6 +13,12 @@ router = APIRouter()
 print(" Loading Gemini Retriever for API...")
 retriever = Retriever() 
 
+# 페이지네이션용 결과 보관소 (TTL 동안 다음 페이지를 재검색 없이 반환)
+cursor_store = CursorStore()
+
+# NDJSON 스트리밍: 한 번에 내보내는 결과 줄 수
+STREAM_BATCH = 10
+
 @router.post("/search", response_model=SearchResponse)
 async def search_documents(request: SearchRequest):
     """
@@ -17,34 +27,141 @@ async def search_documents(request: SearchRequest):
     try:
         # 1. 검색 엔진 호출
         # category 매개변수로 전달 
-        results = retriever.retrieve(
-            query=request.query,
-            top_k=request.top_k,
-            category=request.filter_label 
-        )
+        # (임베딩 + 벡터 검색은 blocking이므로 이벤트 루프 밖에서 실행)
+        results = await asyncio.to_thread(_retrieve, request, request.top_k)
         
         # 2. 결과 변환 (Dict -> Pydantic Schema)
-        response_items = []
-        
-        if not results:
-            return SearchResponse(results=[])
-
-        for i, res in enumerate(results):
-            # ChromaDB 구조에 맞춰 데이터 추출
-            # metadata 안에 label, file_path가 들어있음
-            metadata = res.get('metadata', {})
-            
-            response_items.append(SearchResultItem(
-                rank=i + 1,
-                doc_id=res.get('id', 'unknown'), # doc_id가 없다면 unknown
-                score=res.get('distance', 0.0), # distance 값 사용
-                label=metadata.get('label', 'N/A'),
-                file_path=metadata.get('file_path', 'N/A'),
-                text=res.get('text', '')[:200] # 텍스트 미리보기 (너무 길면 자름)
-            ))
-            
-        return SearchResponse(results=response_items)
+        response = _to_response(results)
+
+        # 3. 페이지네이션: 전체 결과는 서버에 보관하고 첫 페이지만 반환
+        if request.page_size and len(response.results) > request.page_size:
+            key = cursor_store.put(response.results)
+            return _page(key, response.results, 0, request.page_size)
+
+        return response
 
     except Exception as e:
         print(f"Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/page", response_model=SearchResponse)
+def search_next_page(cursor: str, page_size: int = 10):
+    """
+    다음 페이지 조회 (POST /search의 next_cursor 사용)
+    보관된 결과에서 잘라서 반환 -> 질문 임베딩 / 인덱스 검색 없음
+    """
+    try:
+        key, offset = parse_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = cursor_store.get(key)
+    if items is None:
+        raise HTTPException(status_code=410, detail="cursor가 만료되었습니다. 다시 검색해 주세요.")
+    return _page(key, items, offset, max(1, page_size))
+
+
+@router.get("/search/resolve/{doc_id}", response_model=DocIdResolveResponse)
+async def resolve_doc_id(doc_id: str):
+    """
+    중복으로 색인에서 빠진 문서 id -> canonical 문서 id (+ 같은 내용의 다른 id 목록)
+    """
+    return DocIdResolveResponse(**retriever.resolve_doc_id(doc_id))
+
+
+@router.post("/search/stream")
+async def search_documents_stream(request: SearchRequest):
+    """
+    결과가 많을 때용 NDJSON 스트리밍 (한 줄에 SearchResultItem 하나)
+    top_k까지 한 번만 검색하고(/search와 같은 순위), 결과를 STREAM_BATCH개씩 나눠서 내보냄
+    -> 클라이언트는 전체 JSON 직렬화 / 파싱을 기다리지 않고 앞쪽 결과부터 처리
+    """
+    try:
+        results = await asyncio.to_thread(_retrieve, request, request.top_k)
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def generate():
+        for start in range(0, len(results), STREAM_BATCH):
+            lines = [json.dumps(_to_item(start + i + 1, res).model_dump(), ensure_ascii=False) + "\n"
+                     for i, res in enumerate(results[start:start + STREAM_BATCH])]
+            yield "".join(lines)
+            # 배치 사이에 이벤트 루프에 양보 (다른 요청 처리)
+            await asyncio.sleep(0)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest):
+    """
+    Batch Semantic Search Endpoint
+    질문 여러 개를 임베딩 1회 + 검색 1회(필터별)로 처리합니다.
+    """
+    if request.filter_labels is not None and len(request.filter_labels) != len(request.queries):
+        raise HTTPException(status_code=422, detail="filter_labels 길이가 queries와 다릅니다.")
+
+    try:
+        # 임베딩 + 벡터 검색은 blocking이므로 이벤트 루프 밖(thread)에서 실행
+        results = await asyncio.to_thread(
+            retriever.retrieve_many,
+            queries=request.queries,
+            top_k=request.top_k,
+            categories=request.filter_labels if request.filter_labels is not None else request.filter_label,
+            mmr=request.mmr,
+            mmr_lambda=request.mmr_lambda
+        )
+        return BatchSearchResponse(results=[_to_response(r) for r in results])
+
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _to_response(results) -> SearchResponse:
+    response_items = []
+
+    if not results:
+        return SearchResponse(results=[])
+
+    for i, res in enumerate(results):
+        response_items.append(_to_item(i + 1, res))
+
+    return SearchResponse(results=response_items)
+
+
+def _to_item(rank: int, res: dict) -> SearchResultItem:
+    # ChromaDB 구조에 맞춰 데이터 추출
+    # metadata 안에 label, file_path가 들어있음
+    metadata = res.get('metadata', {})
+
+    return SearchResultItem(
+        rank=rank,
+        doc_id=res.get('id', 'unknown'), # doc_id가 없다면 unknown
+        score=res.get('distance', 0.0), # distance 값 사용
+        label=metadata.get('label', 'N/A'),
+        file_path=metadata.get('file_path', 'N/A'),
+        text=res.get('text', '')[:200], # 텍스트 미리보기 (너무 길면 자름)
+        aliases=res.get('aliases', [])
+    )
+
+
+def _retrieve(request: SearchRequest, top_k: int) -> list:
+    return retriever.retrieve(
+        query=request.query,
+        top_k=top_k,
+        category=request.filter_label,
+        mmr=request.mmr,
+        mmr_lambda=request.mmr_lambda
+    )
+
+
+def _page(key: str, items: list, offset: int, page_size: int) -> SearchResponse:
+    end = offset + page_size
+    return SearchResponse(
+        results=items[offset:end],
+        next_cursor=make_cursor(key, end) if end < len(items) else None,
+        total=len(items)
+    )
@@ -18,6 +18,9 @@ class SearchRequest(BaseModel):
     query: str = Field(..., example="invoice from 2023", description="검색할 질문")
     top_k: int = Field(5, example=5, description="가져올 문서 개수")
     filter_label: Optional[str] = Field(None, example="invoice", description="특정 라벨(invoice, resume 등)만 필터링")
+    mmr: bool = Field(False, description="MMR로 서로 비슷한 문서를 피해서 다양하게 선택")
+    mmr_lambda: float = Field(0.5, ge=0.0, le=1.0, description="MMR 관련도 가중치 (1.0 = 관련도만, 0.0 = 다양성만)")
+    page_size: Optional[int] = Field(None, ge=1, example=10, description="페이지 크기 (지정하면 top_k개를 서버에 보관하고 next_cursor로 다음 페이지 조회)")
 
 # 검색 결과 아이템 (개별 문서)
 class SearchResultItem(BaseModel):
@@ -27,10 +30,33 @@ class SearchResultItem(BaseModel):
     label: str
     file_path: str
     text: str
+    aliases: List[str] = []   # 같은 내용이라 색인에서 빠진 중복 문서 id (ingest dedup "link" 모드)
+
+# 중복 문서 id 조회 결과
+class DocIdResolveResponse(BaseModel):
+    doc_id: str
+    canonical_id: str        # 실제 색인된 문서 id (중복이 아니면 doc_id와 같음)
+    is_duplicate: bool
+    aliases: List[str]       # canonical 문서에 연결된 중복 문서 id 목록
 
 # 최종 검색 답변 (Response)
 class SearchResponse(BaseModel):
     results: List[SearchResultItem]
+    next_cursor: Optional[str] = None   # 다음 페이지가 있을 때만 (GET /search/page?cursor=...)
+    total: Optional[int] = None         # 페이지네이션 시 보관된 전체 결과 수
+
+# 배치 검색 요청 (평가 / 내부 도구용)
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., example=["invoice from 2023", "python resume"], description="검색할 질문 목록", max_length=1000)
+    top_k: int = Field(5, example=5, description="질문별로 가져올 문서 개수")
+    filter_label: Optional[str] = Field(None, example="invoice", description="모든 질문에 같은 라벨 필터 적용")
+    filter_labels: Optional[List[Optional[str]]] = Field(None, description="질문별 라벨 필터 (queries와 같은 길이, filter_label보다 우선)")
+    mmr: bool = Field(False, description="MMR로 서로 비슷한 문서를 피해서 다양하게 선택")
+    mmr_lambda: float = Field(0.5, ge=0.0, le=1.0, description="MMR 관련도 가중치 (1.0 = 관련도만, 0.0 = 다양성만)")
+
+# 배치 검색 결과 (질문 순서대로)
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
 
 # 채팅
 class ChatRequest(BaseModel):
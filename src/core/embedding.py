@@ -3,17 +3,18 @@
 기존: LayoutLM 모델을 로드해서 이미지 넣고 추출 
 변경: 구글 Gemini에게 텍스트만 넣고 벡터 받아오는 코드로 변경.
 '''
-import os
 import time
 from typing import List
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from src.core.gemini_config import configure_generativeai
+
 # .env 파일 로드 (GOOGLE_API_KEY)
 load_dotenv()
 
-# Gemini 설정
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Gemini 설정 (GEMINI_BASE_URL이 있으면 해당 주소로)
+configure_generativeai()
 
 def get_embedding(text: str, retries: int = 3) -> List[float]:
     """
@@ -41,6 +42,30 @@ def get_embedding(text: str, retries: int = 3) -> List[float]:
     print(" 최종 실패: 임베딩 생성 불가")
     return [0.0] * 3072
 
+def get_query_embeddings(texts: List[str], batch_size: int = 100, retries: int = 3) -> List[List[float]]:
+    """
+    여러 검색 질문을 batchEmbedContents로 한 번에 벡터화 (요청 1회당 최대 batch_size개)
+    문서 저장용(get_embedding)과 달리 task_type은 retrieval_query
+    """
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        for attempt in range(retries):
+            try:
+                result = genai.embed_content(
+                    model="models/gemini-embedding-001",
+                    content=batch,
+                    task_type="retrieval_query"
+                )
+                vectors.extend(result['embedding'])
+                break
+            except Exception as e:
+                print(f" 질문 배치 임베딩 요청 실패 ({attempt+1}/{retries}): {e}")
+                if attempt == retries - 1:
+                    raise
+                time.sleep(1)
+    return vectors
+
 if __name__ == "__main__":
     vec = get_embedding("삼성전자 이번 달 청구서입니다.")
     print(f"✅ 벡터 생성 완료! 차원 수: {len(vec)}") # 3072 나와야 함
@@ -0,0 +1,42 @@
+# src/core/gemini_config.py
+'''
+Gemini API 접속 설정 (google-genai / google.generativeai 공통)
+
+GEMINI_BASE_URL을 지정하면 실제 Google API 대신 해당 주소로 요청을 보냅니다.
+    예: 로컬 mock 서버로 부하 테스트
+        python scripts/mock_gemini_server.py --port 8090
+        GEMINI_BASE_URL=http://localhost:8090 GOOGLE_API_KEY=mock uvicorn src.main:app
+'''
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "").rstrip("/")
+
+
+def genai_client_kwargs() -> dict:
+    """google-genai genai.Client(...) 인자 (base URL override 포함)"""
+    kwargs = {"api_key": os.getenv("GOOGLE_API_KEY")}
+    if GEMINI_BASE_URL:
+        from google.genai import types
+        kwargs["http_options"] = types.HttpOptions(base_url=GEMINI_BASE_URL)
+    return kwargs
+
+
+def configure_generativeai():
+    """
+    google.generativeai 전역 설정 (get_embedding / get_query_embeddings 용)
+    chromadb의 GoogleGenerativeAiEmbeddingFunction이 생성될 때 genai.configure를 다시 호출하므로
+    임베딩 함수를 만든 뒤에도 한 번 더 호출해야 base URL override가 유지됩니다.
+    """
+    import google.generativeai as genai
+
+    if GEMINI_BASE_URL:
+        # gRPC 대신 REST로 보내야 http:// 주소를 사용할 수 있음
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), transport="rest",
+                        client_options={"api_endpoint": GEMINI_BASE_URL})
+        print(f"🔧 Gemini Embedding API -> {GEMINI_BASE_URL}")
+    else:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
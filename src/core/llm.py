@@ -1,23 +1,72 @@
 # src/core/llm.py
 import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+import httpx
+import numpy as np
 from google import genai
 from dotenv import load_dotenv
 
+from src.core.gemini_config import genai_client_kwargs
+
 # 환경 변수 로드
 load_dotenv()
 
+MODEL_NAME = "gemini-2.5-flash-lite"
+# 동기 GeminiClient가 실패 시 반환하는 문구
+LLM_ERROR_MESSAGE = " AI 모델 연결에 실패했습니다."
+
+# AsyncGeminiClient 설정 (환경변수로 덮어쓰기 가능)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))          # 호출 1회 deadline (초, 재시도 포함)
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "3"))            # 첫 호출 실패 후 재시도 횟수
+LLM_BACKOFF_BASE = 0.5                                        # 재시도 대기: base * 2^n 범위에서 랜덤 (full jitter)
+LLM_BACKOFF_MAX = 8.0
+# Hedging: 응답이 최근 p95보다 늦으면 같은 요청을 하나 더 보내고 먼저 온 것 사용
+LLM_HEDGE = os.getenv("LLM_HEDGE", "off") == "on"
+HEDGE_MIN_SAMPLES = 20                                        # p95를 믿을 수 있는 최소 표본 수
+HEDGE_DEFAULT_DELAY = 2.0                                     # 표본이 부족할 때 hedge 대기 (초)
+LATENCY_WINDOW = 200
+
+# 재시도할 HTTP 상태 코드 (rate limit / 서버 오류)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Gemini 호출 실패 (재시도 후에도 실패)"""
+
+
+class LLMTimeoutError(LLMError):
+    """deadline 초과"""
+
+
+# 공유 genai.Client (프로세스당 하나 -> 내부 HTTP 연결 풀 공유)
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_genai_client() -> genai.Client:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            kwargs = genai_client_kwargs()
+            if not kwargs["api_key"]:
+                raise ValueError(" GOOGLE_API_KEY가 설정되지 않았습니다.")
+            # GEMINI_BASE_URL이 있으면 해당 주소로 (로컬 mock 서버 등)
+            _CLIENT = genai.Client(**kwargs)
+        return _CLIENT
+
+
 class GeminiClient:
     def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        
-        if not self.api_key:
-            raise ValueError(" GOOGLE_API_KEY가 설정되지 않았습니다.")
-        
-        # 1. 클라이언트 설정
-        self.client = genai.Client(api_key=self.api_key)
+        # 1. 클라이언트 설정 (프로세스 공유)
+        self.client = get_genai_client()
         
         # 2. 모델 설정
-        self.model_name = "gemini-2.5-flash-lite" 
+        self.model_name = MODEL_NAME 
         print(f"✅ GeminiClient Ready (Model: {self.model_name})")
 
     def generate(self, prompt):
@@ -30,7 +79,159 @@ class GeminiClient:
             return response.text
         except Exception as e:
             print(f"❌ Gemini API Error: {e}")
-            return " AI 모델 연결에 실패했습니다."
+            return LLM_ERROR_MESSAGE
+
+
+def _is_retryable(error: Exception) -> bool:
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    # 상태 코드가 없는 오류 = 연결 끊김 / 타임아웃 등 네트워크 오류
+    # (httpx.ConnectError / ReadTimeout 등은 OSError가 아니므로 httpx.TransportError로 따로 확인)
+    return (isinstance(error, (ConnectionError, TimeoutError, OSError, httpx.TransportError))
+            or "timeout" in type(error).__name__.lower())
+
+
+class AsyncGeminiClient:
+    """
+    비동기 Gemini 클라이언트 (client.aio 사용 -> 이벤트 루프를 막지 않음)
+    - 공유 genai.Client의 연결 풀 사용
+    - 호출마다 deadline (재시도 포함 전체 시간), 초과 시 LLMTimeoutError
+    - 재시도 가능한 오류(429 / 5xx / 네트워크)는 지수 백오프 + full jitter로 재시도, 최종 실패 시 LLMError
+    - hedge=True면 최근 p95만큼 기다려도 응답이 없을 때 같은 요청을 하나 더 보내고 먼저 끝난 쪽 사용
+    """
+    def __init__(self, model_name: str = MODEL_NAME, timeout: float = LLM_TIMEOUT,
+                 retries: int = LLM_RETRIES, hedge: bool = LLM_HEDGE):
+        self.client = get_genai_client()
+        self.model_name = model_name
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"calls": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0}
+
+    def hedge_delay(self) -> float:
+        """최근 성공 호출 latency의 p95 (표본이 적으면 기본값)"""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return float(np.percentile(list(self._latencies), 95))
+
+    async def _call(self, contents):
+        start = time.perf_counter()
+        response = await self.client.aio.models.generate_content(model=self.model_name, contents=contents)
+        self._latencies.append(time.perf_counter() - start)
+        return response.text
+
+    async def _call_hedged(self, contents):
+        # 바깥 deadline(wait_for)이 어느 시점에 취소하더라도 finally에서 남은 요청을 모두 취소
+        pending = set()
+        error = None
+        try:
+            first = asyncio.create_task(self._call(contents))
+            pending = {first}
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done:
+                return first.result()
+
+            # p95 초과 -> 두 번째 요청 발사, 먼저 성공한 쪽 사용
+            self.stats["hedged"] += 1
+            second = asyncio.create_task(self._call(contents))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _generate_with_retry(self, contents, hedge: bool):
+        attempts = 1 + max(0, self.retries)   # 첫 호출 + 재시도 retries회
+        for attempt in range(attempts):
+            try:
+                if hedge:
+                    return await self._call_hedged(contents)
+                return await self._call(contents)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt == attempts - 1 or not _is_retryable(e):
+                    raise LLMError(f"Gemini 호출 실패: {e}") from e
+                self.stats["retries"] += 1
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                print(f"⚠️ Gemini 재시도 ({attempt + 1}/{attempts - 1}, {delay:.2f}s 후): {e}")
+                await asyncio.sleep(delay)
+
+    async def generate(self, prompt, timeout: float = None, hedge: bool = None) -> str:
+        """
+        timeout: 이번 호출의 deadline (초, 기본 LLM_TIMEOUT)
+        hedge: 이번 호출의 hedging 여부 (기본 LLM_HEDGE)
+        """
+        self.stats["calls"] += 1
+        hedge = self.hedge if hedge is None else hedge
+        try:
+            return await asyncio.wait_for(self._generate_with_retry(prompt, hedge), timeout or self.timeout)
+        except asyncio.TimeoutError as e:
+            self.stats["timeouts"] += 1
+            raise LLMTimeoutError(f"Gemini 응답 시간 초과 ({timeout or self.timeout}s)") from e
+        except LLMError:
+            self.stats["errors"] += 1
+            raise
+
+    async def generate_stream(self, prompt, first_token_timeout: float = None):
+        """
+        토큰(청크)이 생성되는 대로 yield. 첫 청크까지 first_token_timeout(기본 LLM_TIMEOUT) 초과 시 LLMTimeoutError
+        (스트림은 중간부터 다시 보낼 수 없으므로 재시도 / hedging 없음)
+        """
+        self.stats["calls"] += 1
+        timeout = first_token_timeout or self.timeout
+        try:
+            stream = await asyncio.wait_for(
+                self.client.aio.models.generate_content_stream(model=self.model_name, contents=prompt), timeout
+            )
+            iterator = stream.__aiter__()
+            first = await asyncio.wait_for(iterator.__anext__(), timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError as e:
+            self.stats["timeouts"] += 1
+            raise LLMTimeoutError(f"Gemini 첫 응답 시간 초과 ({timeout}s)") from e
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise LLMError(f"Gemini 스트림 호출 실패: {e}") from e
+
+        if first.text:
+            yield first.text
+        try:
+            async for chunk in iterator:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise LLMError(f"Gemini 스트림 중단: {e}") from e
+
+    def metrics(self) -> dict:
+        return {**self.stats, "hedge_delay_s": round(self.hedge_delay(), 3), "samples": len(self._latencies)}
+
+
+# 싱글톤 (라우터 / RAG가 같은 통계 / 연결 풀 공유)
+_ASYNC_CLIENT = None
+_ASYNC_CLIENT_LOCK = threading.Lock()
+
+
+def get_async_llm() -> AsyncGeminiClient:
+    global _ASYNC_CLIENT
+    with _ASYNC_CLIENT_LOCK:
+        if _ASYNC_CLIENT is None:
+            _ASYNC_CLIENT = AsyncGeminiClient()
+            print(f"✅ AsyncGeminiClient Ready (Model: {MODEL_NAME}, timeout={LLM_TIMEOUT}s, hedge={LLM_HEDGE})")
+        return _ASYNC_CLIENT
+
 
 if __name__ == "__main__":
     client = GeminiClient()
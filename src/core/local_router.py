@@ -0,0 +1,160 @@
+# src/core/local_router.py
+'''
+로컬 의도 분류기 (라벨 centroid)
+
+기존: 질문마다 17개 카테고리 설명이 들어간 긴 프롬프트로 Gemini 호출 -> 라벨 / confidence만 받아옴 (수백 ms ~ 수 초)
+변경:
+    1. ChromaDB 문서를 라벨별로 표본 추출 -> 본문을 질문용 임베딩(retrieval_query)으로 다시 벡터화
+       -> 라벨별 centroid(평균 벡터) 계산 -> npz로 저장
+       (저장된 문서 벡터는 retrieval_document 공간이라 질문 벡터와 직접 비교하면 편향됨)
+    2. 질문 임베딩(검색용과 같은 벡터, 질문 임베딩 캐시 공유)과 centroid의 cosine 유사도 -> softmax로 confidence
+    3. 기권(unknown): 1위 유사도가 ROUTER_MIN_SIMILARITY 미만이면 (어느 라벨과도 멀면)
+       라벨 없음 -> 호출 측에서 필터 없이 전체 검색
+    4. 1위-2위 차이가 ROUTER_MIN_MARGIN 미만(애매함)이거나 confidence가 LOCAL_ROUTER_THRESHOLD 미만이면
+       호출 측(IntentRouter)에서 기존 LLM 분류로 fallback
+    분류 자체는 (라벨 16개 x 3072) 행렬곱 한 번 -> 네트워크 없이 1ms 미만
+'''
+import os
+import json
+import time
+
+import numpy as np
+
+LABEL_CENTROIDS_PATH = os.getenv("LABEL_CENTROIDS_PATH", "./chroma_db/label_centroids.npz")
+# softmax 온도 (cosine 유사도 차이가 작아서 낮은 온도로 날카롭게)
+ROUTER_TEMPERATURE = float(os.getenv("ROUTER_TEMPERATURE", "0.02"))
+# 이 값 미만이면 LLM으로 fallback
+LOCAL_ROUTER_THRESHOLD = float(os.getenv("LOCAL_ROUTER_THRESHOLD", "0.6"))
+# 기권 기준: 1위 centroid와의 cosine 유사도 하한 (미만이면 필터 없이 전체 검색)
+# LLM fallback 기준: 1위-2위 유사도 차이 하한
+# 두 값 모두 데이터로 튜닝한 값이 아닌 시작값:
+#   - 0.55: 질문 임베딩과 centroid의 cosine은 무관한 질문도 0.5 안팎이 나오므로 그보다 조금 위
+#   - 0.01: 온도 0.02에서 차이 0.01이면 1위/2위 확률 비가 e^0.5 ≈ 1.65 -> 1위 확률이 최대 ~0.62로
+#           LOCAL_ROUTER_THRESHOLD(0.6) 근처라, 사실상 confidence 기준과 같은 선에서 LLM으로 넘김
+#   scripts/build_label_centroids.py --eval 이 정답 / 오답별 유사도 / 차이 분포를 출력하므로 그걸 보고 조정
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.55"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.01"))
+# Chroma에서 문서를 읽어올 때 페이지 크기
+BUILD_BATCH_SIZE = 5000
+# 라벨별로 질문용 임베딩을 다시 만들 문서 수 / 문서당 최대 글자 수
+SAMPLES_PER_LABEL = int(os.getenv("ROUTER_SAMPLES_PER_LABEL", "300"))
+SAMPLE_MAX_CHARS = 2000
+# centroid를 만든 임베딩 공간 (질문 임베딩과 같아야 함)
+EMBEDDING_SPACE = "retrieval_query"
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+class LabelCentroidRouter:
+    """
+    Args:
+        labels: 라벨 목록
+        centroids: (라벨 수, dim) L2 정규화된 centroid
+        counts: 라벨별 문서(청크) 수
+    """
+    def __init__(self, labels, centroids, counts=None, temperature: float = ROUTER_TEMPERATURE,
+                 min_similarity: float = ROUTER_MIN_SIMILARITY, min_margin: float = ROUTER_MIN_MARGIN):
+        self.labels = list(labels)
+        self.centroids = _normalize(np.asarray(centroids, dtype=np.float32))
+        self.counts = list(counts) if counts is not None else [0] * len(self.labels)
+        self.temperature = temperature
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+
+    # 1. 생성 / 저장 / 로드
+    @classmethod
+    def build_from_collection(cls, collection, embed_fn, batch_size: int = BUILD_BATCH_SIZE,
+                              samples_per_label: int = SAMPLES_PER_LABEL):
+        """
+        컬렉션을 페이지 단위로 읽어서 라벨별로 문서 본문을 최대 samples_per_label개 모음
+        -> embed_fn(질문용 임베딩, 예: get_query_embeddings)으로 벡터화 -> 라벨별 (정규화된 벡터의) 평균
+        counts는 라벨별 전체 문서(청크) 수
+        """
+        samples, counts = {}, {}
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            page = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            for text, metadata in zip(page["documents"] or [], page["metadatas"] or []):
+                label = (metadata or {}).get("label") or ""
+                if not label:
+                    continue
+                counts[label] = counts.get(label, 0) + 1
+                texts = samples.setdefault(label, [])
+                if text and text.strip() and len(texts) < samples_per_label:
+                    texts.append(text[:SAMPLE_MAX_CHARS])
+            print(f"   문서 표본 수집: {min(offset + batch_size, total)}/{total}")
+
+        labels = sorted(label for label in samples if samples[label])
+        if not labels:
+            raise ValueError("라벨이 있는 문서가 없습니다.")
+        centroids = []
+        for label in labels:
+            vectors = _normalize(np.asarray(embed_fn(samples[label]), dtype=np.float32))
+            centroids.append(vectors.mean(axis=0))
+            print(f"   centroid 계산: {label} ({len(samples[label])}개 표본)")
+        return cls(labels, np.stack(centroids), [counts[label] for label in labels])
+
+    def save(self, path: str = LABEL_CENTROIDS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, labels=np.array(json.dumps(self.labels)),
+                 counts=np.asarray(self.counts, dtype=np.int64), space=np.array(EMBEDDING_SPACE))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = LABEL_CENTROIDS_PATH):
+        with np.load(path) as data:
+            # space가 없는 파일 = 문서 임베딩(retrieval_document)으로 만든 이전 버전
+            space = str(data["space"]) if "space" in data.files else "retrieval_document"
+            if space != EMBEDDING_SPACE:
+                raise ValueError(f"centroid 임베딩 공간({space})이 질문 임베딩({EMBEDDING_SPACE})과 다릅니다. "
+                                 f"scripts/build_label_centroids.py로 다시 생성하세요.")
+            return cls(json.loads(str(data["labels"])), data["centroids"], data["counts"].tolist())
+
+    @classmethod
+    def load_or_none(cls, path: str = LABEL_CENTROIDS_PATH):
+        """파일이 없거나 읽기 실패 시 None (LLM 분류만 사용)"""
+        if not os.path.exists(path):
+            print(f"⚠️ 라벨 centroid 없음 ({path}) -> LLM 라우터 사용 (scripts/build_label_centroids.py로 생성)")
+            return None
+        try:
+            router = cls.load(path)
+            print(f"✅ Local Router Loaded ({len(router.labels)} labels)")
+            return router
+        except Exception as e:
+            print(f"⚠️ 라벨 centroid 로드 실패 (LLM 라우터 사용): {e}")
+            return None
+
+    # 2. 분류
+    def similarities(self, query_embedding) -> np.ndarray:
+        """라벨별 cosine 유사도"""
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        return self.centroids @ query
+
+    def scores(self, query_embedding) -> np.ndarray:
+        """라벨별 확률 (cosine 유사도 softmax)"""
+        return self._softmax(self.similarities(query_embedding))
+
+    def _softmax(self, similarities):
+        logits = similarities / self.temperature
+        logits -= logits.max()
+        probs = np.exp(logits)
+        return probs / probs.sum()
+
+    def predict(self, query_embedding):
+        """
+        Returns: (label, confidence, 1위-2위 유사도 차이, 소요 시간 ms)
+        어느 라벨과도 충분히 가깝지 않으면 label = None (기권 -> 필터 없이 전체 검색)
+        1위 / 2위가 비슷한지(margin < min_margin)는 호출 측에서 판단 (-> LLM 분류)
+        """
+        start = time.perf_counter()
+        similarities = self.similarities(query_embedding)
+        probs = self._softmax(similarities)
+        order = np.argsort(-similarities)
+        best = int(order[0])
+        margin = float(similarities[best] - similarities[order[1]]) if len(order) > 1 else float("inf")
+        label = self.labels[best] if similarities[best] >= self.min_similarity else None
+        return label, float(probs[best]), margin, (time.perf_counter() - start) * 1000
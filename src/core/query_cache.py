@@ -0,0 +1,216 @@
+# src/core/query_cache.py
+'''
+질문 임베딩 캐시 (Retriever / SearchEngine 공용)
+
+같은 질문(또는 공백/전각 문자만 다른 질문)이 다시 들어오면
+Gemini API 호출이나 LayoutLMv3 forward를 다시 하지 않고 저장된 벡터를 재사용합니다.
+
+    1. 질문 정규화: NFKC + 앞뒤 공백 제거 + 연속 공백 하나로
+    2. 메모리 LRU (OrderedDict) + TTL + 최대 개수 제한
+    3. (선택) sqlite 파일에 저장 -> 서버 재시작 후에도 재사용
+    4. hit / miss 통계 (health API에서 확인)
+
+키는 "namespace + 정규화된 질문"이라서 임베딩 모델이 다르면 서로 섞이지 않습니다.
+'''
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# 기본 설정 (환경변수로 덮어쓰기 가능)
+DEFAULT_MAX_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+DEFAULT_TTL_SEC = float(os.getenv("QUERY_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_DB_PATH = os.getenv("QUERY_CACHE_PATH", "./chroma_db/query_cache.sqlite")   # ""이면 메모리만 사용
+
+# sqlite 저장 몇 번마다 만료 / 개수 초과 항목을 정리할지
+DISK_PRUNE_EVERY = 100
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Args:
+        max_size: 메모리에 유지할 최대 항목 수 (넘으면 가장 오래 안 쓴 것부터 제거)
+        ttl_sec: 이 시간이 지난 항목은 만료 (None이면 만료 없음)
+        db_path: sqlite 파일 경로 (None이면 메모리만 사용)
+        max_disk_size: sqlite에 유지할 최대 항목 수
+    """
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl_sec: float = DEFAULT_TTL_SEC,
+                 db_path: str = None, max_disk_size: int = None):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.max_disk_size = max_disk_size or max_size * 10
+
+        self._memory = OrderedDict()      # key -> (created_at, np.ndarray)
+        self._lock = threading.Lock()     # 메모리 LRU / 통계
+        self._db_lock = threading.Lock()  # sqlite 연결 (디스크 I/O 중에도 메모리 캐시 조회는 막지 않음)
+        self._disk_puts = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "key TEXT PRIMARY KEY, created_at REAL, embedding BLOB)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ 질문 캐시 DB 열기 실패 (메모리 캐시만 사용): {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(namespace: str, query: str) -> str:
+        return f"{namespace}\x1f{normalize_query(query)}"
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_sec is not None and time.time() - created_at > self.ttl_sec
+
+    # 1. 조회 / 저장
+    def get(self, namespace: str, query: str):
+        key = self.make_key(namespace, query)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+        # sqlite 조회는 메모리 lock 밖에서
+        entry = self._disk_get(key)
+        with self._lock:
+            if entry is not None:
+                self._memory_put(key, entry)
+                self.stats["disk_hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, namespace: str, query: str, embedding):
+        key = self.make_key(namespace, query)
+        entry = (time.time(), np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            self._memory_put(key, entry)
+        self._disk_put(key, entry)
+
+    def get_or_compute(self, namespace: str, query: str, compute_fn):
+        """
+        캐시에 있으면 바로 반환, 없으면 compute_fn(정규화된 질문)으로 계산 후 저장합니다.
+        (캐시 키와 실제 임베딩 입력이 같도록 정규화된 질문으로 계산)
+        """
+        cached = self.get(namespace, query)
+        if cached is not None:
+            return cached
+        embedding = np.asarray(compute_fn(normalize_query(query)), dtype=np.float32)
+        self.put(namespace, query, embedding)
+        return embedding
+
+    def _memory_put(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # 2. sqlite 저장소
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT created_at, embedding FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[0]):
+                    self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+        except Exception as e:
+            print(f"⚠️ 질문 캐시 조회 실패: {e}")
+            return None
+        if row is None:
+            return None
+        if self._expired(row[0]):
+            with self._lock:
+                self.stats["expired"] += 1
+            return None
+        return row[0], np.frombuffer(row[1], dtype=np.float32)
+
+    def _disk_put(self, key, entry):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, created_at, embedding) VALUES (?, ?, ?)",
+                    (key, entry[0], entry[1].tobytes()),
+                )
+                # 저장 DISK_PRUNE_EVERY번마다 한 번만 오래된 항목 정리 (매번 COUNT 하지 않도록)
+                self._disk_puts += 1
+                if self._disk_puts % DISK_PRUNE_EVERY == 0:
+                    self._prune_disk()
+                self._db.commit()
+        except Exception as e:
+            print(f"⚠️ 질문 캐시 저장 실패: {e}")
+
+    def _prune_disk(self):
+        # _db_lock 안에서 호출
+        if self.ttl_sec is not None:
+            self._db.execute("DELETE FROM query_embeddings WHERE created_at < ?", (time.time() - self.ttl_sec,))
+        count = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        if count > self.max_disk_size:
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE key IN ("
+                "SELECT key FROM query_embeddings ORDER BY created_at LIMIT ?)",
+                (count - self.max_disk_size,),
+            )
+
+    # 3. 통계
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["disk_hits"]
+            total = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._memory),
+                "max_size": self.max_size,
+                "persistent": self._db is not None,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+
+# 싱글톤 인스턴스 (Retriever / SearchEngine가 같은 캐시를 공유)
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = QueryEmbeddingCache(db_path=DEFAULT_DB_PATH or None)
+        return _CACHE
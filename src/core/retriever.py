@@ -4,24 +4,38 @@ import torch
 import chromadb
 import os
 from PIL import Image
-from src.core.model_loader import get_model
+from src.core.model_loader import get_model, DEFAULT_MODEL_PATH
+from src.core.query_cache import get_query_cache
+from src.rag.partitions import PartitionedCollections
 
 '''질문: "총액이 얼마야?"
         ↓
-   _query_to_embedding() → 768차원 벡터
+   _query_to_embedding() → 768차원 벡터 (기본 full 모드, text 모드는 이미지 없이 질문 길이만큼만 인코딩)
         ↓  
    search() → ChromaDB에서 Top-K 문서 검색
         ↓
    결과: [{"rank":1, "id":"doc_0001", "score":0.12, "label":"invoice", ...}]
 '''
 
+# 질문 인코더 모드
+#   "full": 기존처럼 검은 Dummy Image까지 함께 통과 (padding만 동적으로, 기본값 - 색인 벡터와 같은 방식)
+#   "text": 이미지 없이 텍스트만 LayoutLMv3에 통과 (빠름, opt-in)
+#           scripts/test_query_encoder.py의 순위 parity 기준을 통과한 색인에서만 사용
+QUERY_ENCODER_MODE = os.getenv("QUERY_ENCODER_MODE", "full")
+QUERY_BATCH_SIZE = 32
+
 class SearchEngine:
-    def __init__(self, db_path="./chroma_db", collection_name="docs"):
+    def __init__(self, db_path="./chroma_db", collection_name="docs", encoder_mode=QUERY_ENCODER_MODE):
         print(f" Initializing Search Engine...")
+        if encoder_mode not in ("text", "full"):
+            raise ValueError(f"지원하지 않는 encoder_mode: {encoder_mode} (text / full)")
+        self.encoder_mode = encoder_mode
         
         # 1. DB 연결
         self.client = chromadb.PersistentClient(path=db_path)
         self.collection = self.client.get_collection(collection_name)
+        # 라벨별 파티션 (있으면 필터 검색은 파티션에서)
+        self.partitions = PartitionedCollections(self.client, collection_name)
         
         # 2. 모델 로드 & 디바이스 설정 (MPS 지원 추가)
         if torch.cuda.is_available():
@@ -35,59 +49,90 @@ class SearchEngine:
         self.model.to(self.device)
         self.model.eval()
         
-        print(f" Search Engine Ready (Device: {self.device})")
+        # 3. 질문 임베딩 캐시 (Retriever와 공유, 모델 파일 / 인코더 모드별로 키 분리)
+        self.query_cache = get_query_cache()
+        self.cache_namespace = f"layoutlmv3:{os.path.basename(DEFAULT_MODEL_PATH)}:{self.encoder_mode}"
+
+        print(f" Search Engine Ready (Device: {self.device}, Query Encoder: {self.encoder_mode})")
 
     def _query_to_embedding(self, text_query):
         """
         텍스트 쿼리 -> 벡터 변환
         """
-        # 1. Dummy Image
-        dummy_image = Image.new("RGB", (224, 224), color="black")
-        
-        # 2. Text -> Words
-        words = text_query.split()
-        if not words: words = ["unknown"]
-        
-        # 3. Dummy BBox
-        boxes = [[0, 0, 0, 0]] * len(words)
-
-        # 4. 인코딩
-        encoding = self.processor(
-            images=dummy_image,
-            text=words,
-            boxes=boxes,
-            return_tensors="pt",
-            padding="max_length",
-            truncation=True,
-            max_length=512
-        )
-        
+        return self.encode_queries([text_query])[0]
+
+    def encode_queries(self, queries, batch_size=QUERY_BATCH_SIZE):
+        """
+        여러 질문을 한 번에 벡터로 변환 (batch_size개씩 묶어서 forward)
+        Returns: [[768 floats], ...]
+        """
+        vectors = []
+        for start in range(0, len(queries), batch_size):
+            vectors.extend(self._encode_batch(queries[start:start + batch_size]))
+        return vectors
+
+    def _encode_batch(self, queries):
+        # 1. Text -> Words / Dummy BBox
+        batch_words = []
+        for query in queries:
+            words = query.split()
+            if not words: words = ["unknown"]
+            batch_words.append(words)
+        batch_boxes = [[[0, 0, 0, 0]] * len(words) for words in batch_words]
+
+        # 2. 인코딩 (가장 긴 질문 길이에 맞춰 padding)
+        if self.encoder_mode == "text":
+            # 이미지 없이 tokenizer만 사용 -> visual patch embedding 생략
+            encoding = self.processor.tokenizer(
+                text=batch_words,
+                boxes=batch_boxes,
+                return_tensors="pt",
+                padding="longest",
+                truncation=True,
+                max_length=512
+            )
+        else:
+            # 기존 방식 (Dummy Image 포함), padding만 동적으로
+            dummy_images = [Image.new("RGB", (224, 224), color="black")] * len(queries)
+            encoding = self.processor(
+                images=dummy_images,
+                text=batch_words,
+                boxes=batch_boxes,
+                return_tensors="pt",
+                padding="longest",
+                truncation=True,
+                max_length=512
+            )
+
         inputs = {k: v.to(self.device) for k, v in encoding.items()}
-        
-        # 5. 추론 및 Mean Pooling
+
+        # 3. 추론 및 Mean Pooling
         with torch.no_grad():
             outputs = self.model(**inputs)
-    
+
             # 모델 출력(Text + Image)에서 텍스트 길이만큼만 슬라이싱
-            # inputs["input_ids"]의 길이(512)를 기준으로 자름
-            seq_len = inputs["input_ids"].shape[1] 
-            text_output = outputs.last_hidden_state[:, :seq_len, :] # (1, 512, 768)
-            
-            # 마스크 확장 및 연산
+            # (text 모드는 출력 자체가 텍스트 위치뿐)
+            seq_len = inputs["input_ids"].shape[1]
+            text_output = outputs.last_hidden_state[:, :seq_len, :] # (B, seq_len, 768)
+
+            # 마스크 확장 및 연산 (padding 위치는 평균에서 제외)
             mask = inputs["attention_mask"].unsqueeze(-1).expand(text_output.size()).float()
-            
+
             sum_embeddings = torch.sum(text_output * mask, 1)
             sum_mask = torch.clamp(mask.sum(1), min=1e-9)
-            embedding = sum_embeddings / sum_mask
-            
-        return embedding[0].cpu().tolist()
+            embeddings = sum_embeddings / sum_mask
+
+        return embeddings.cpu().tolist()
 
     # ChromaDB가 "질문 벡터와 가장 비슷한 문서들"을 찾아줌
     def search(self, query, top_k=5, filter_label=None):
-        query_vec = self._query_to_embedding(query)
-        where_condition = {"label": filter_label} if filter_label else None
+        # 같은 질문이면 forward 생략
+        query_vec = self.query_cache.get_or_compute(
+            self.cache_namespace, query, self._query_to_embedding
+        ).tolist()
+        collection, where_condition = self.partitions.route(filter_label, self.collection)
         
-        results = self.collection.query(
+        results = collection.query(
             query_embeddings=[query_vec],
             n_results=top_k,
             where=where_condition
@@ -1,20 +1,89 @@
 # src/core/router.py
+import os
 import json
 import re
-from src.core.llm import GeminiClient
+import asyncio
+from src.core.llm import GeminiClient, get_async_llm
+from src.core.local_router import LabelCentroidRouter, LOCAL_ROUTER_THRESHOLD
+from src.core.query_cache import get_query_cache
+from src.core.embedding import get_query_embeddings
+
+# 라우팅 방식
+#   "local": 라벨 centroid로 먼저 분류, confidence가 낮을 때만 Gemini (기본값)
+#   "llm":   항상 Gemini로 분류 (기존 방식)
+ROUTER_MODE = os.getenv("ROUTER_MODE", "local")
+# LLM 분류 deadline (초과 시 필터 없이 전체 검색)
+ROUTER_LLM_TIMEOUT = float(os.getenv("ROUTER_LLM_TIMEOUT", "5"))
 
 class IntentRouter:
     def __init__(self):
         self.client = GeminiClient()
+        self.async_client = get_async_llm()
         # 헷갈릴 때는 과감하게 포기 
         self.threshold = 0.5 
+        # 로컬 분류기 (centroid 파일이 없으면 None -> LLM만 사용)
+        self.local_router = LabelCentroidRouter.load_or_none() if ROUTER_MODE == "local" else None
+        self.local_threshold = LOCAL_ROUTER_THRESHOLD
 
     def _clean_json_text(self, text: str) -> str:
         text = re.sub(r"```json", "", text)
         text = re.sub(r"```", "", text)
         return text.strip()
 
-    def route(self, query: str):
+    def route(self, query: str, query_embedding=None):
+        """
+        query_embedding: 검색에 쓸 질문 임베딩을 이미 계산했으면 넘김 (없으면 질문 임베딩 캐시에서 조회 / 생성)
+        """
+        if self.local_router is not None:
+            result = self._route_local(query, query_embedding)
+            if result is not None:
+                return result
+        return self._route_llm(query)
+
+    def _embed_query(self, query: str):
+        # Retriever와 같은 namespace -> 검색 시 같은 질문 임베딩을 재사용
+        from src.rag.retriever import QUERY_CACHE_NAMESPACE
+        return get_query_cache().get_or_compute(
+            QUERY_CACHE_NAMESPACE, query, lambda text: get_query_embeddings([text])[0]
+        )
+
+    def _route_local(self, query: str, query_embedding=None):
+        """라벨 centroid 분류. 1위 / 2위가 애매하거나 confidence가 낮거나 실패하면 None (-> LLM 분류)"""
+        try:
+            if query_embedding is None:
+                query_embedding = self._embed_query(query)
+            label, confidence, margin, elapsed_ms = self.local_router.predict(query_embedding)
+        except Exception as e:
+            print(f"⚠️ Local Router Error (LLM 사용): {e}")
+            return None
+
+        # 기권: 어느 라벨과도 멀면 -> 필터 없이 전체 검색 (LLM 호출 없이)
+        if label is None:
+            return {
+                "query": query,
+                "label": "unknown",
+                "confidence": round(confidence, 4),
+                "filter": None,
+                "reason": f"포괄적 질문 또는 의도 불명 -> 전체 검색 (local, {elapsed_ms:.2f}ms)"
+            }
+
+        if margin < self.local_router.min_margin:
+            print(f"🔄 [Router] 로컬 분류 1-2위 차이 부족 ({label}, margin {margin:.4f}) -> LLM 분류")
+            return None
+
+        if confidence < self.local_threshold:
+            print(f"🔄 [Router] 로컬 분류 확신 부족 ({label}, {confidence:.2f}) -> LLM 분류")
+            return None
+
+        return {
+            "query": query,
+            "label": label,
+            "confidence": round(confidence, 4),
+            "filter": label,
+            "reason": f"카테고리 감지됨 (local: {label}, {confidence:.2f}, {elapsed_ms:.2f}ms)"
+        }
+
+    def _build_prompt(self, query: str) -> str:
         # RVL-CDIP 데이터셋의 16개 카테고리 정의
         prompt = f"""
         당신은 문서 검색 시스템의 '의도 분류기(Intent Classifier)'입니다.
@@ -57,9 +126,36 @@ class IntentRouter:
             "confidence": 0.0 ~ 1.0
         }}
         """
+        return prompt
 
+    def _route_llm(self, query: str):
+        try:
+            raw_response = self.client.generate(self._build_prompt(query))
+            return self._parse_response(query, raw_response)
+        except Exception as e:
+            print(f"⚠️ Router Error: {e}")
+            return {"query": query, "label": "error", "confidence": 0.0, "filter": None, "reason": "System Error"}
+
+    async def aroute(self, query: str, query_embedding=None):
+        """route의 비동기 버전 (LLM 분류는 AsyncGeminiClient, deadline 초과 / 실패 시 전체 검색)"""
+        if self.local_router is not None:
+            if query_embedding is None:
+                result = await asyncio.to_thread(self._route_local, query)
+            else:
+                result = self._route_local(query, query_embedding)
+            if result is not None:
+                return result
+
+        try:
+            raw_response = await self.async_client.generate(self._build_prompt(query), timeout=ROUTER_LLM_TIMEOUT)
+            return self._parse_response(query, raw_response)
+        except Exception as e:
+            print(f"⚠️ Router Error: {e}")
+            return {"query": query, "label": "error", "confidence": 0.0, "filter": None, "reason": "System Error"}
+
+    def _parse_response(self, query: str, raw_response: str):
+        """LLM 응답(JSON) -> 라우팅 결과 (파싱 실패 시 전체 검색)"""
         try:
-            raw_response = self.client.generate(prompt)
             cleaned_response = self._clean_json_text(raw_response)
             result = json.loads(cleaned_response)
             
@@ -83,5 +179,5 @@ class IntentRouter:
             }
 
         except Exception as e:
-            print(f"⚠️ Router Error: {e}")
+            print(f"⚠️ Router Parse Error: {e}")
             return {"query": query, "label": "error", "confidence": 0.0, "filter": None, "reason": "System Error"}
\ No newline at end of file
@@ -57,6 +57,21 @@ def get_active_session():
         save_state()
     return active_id
 
+def iter_sse(response):
+    """Server-Sent Events 응답을 (event, data dict)로 순회"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 #  4. 사이드바 (채팅방 관리 및 업로드) 
 with st.sidebar:
     st.title("🗂️ 채팅방 목록")
@@ -176,42 +191,52 @@ if prompt := st.chat_input("질문을 입력하세요..."):
     with st.chat_message("user"):
         st.write(prompt)
 
-    # 백엔드 통신
+    # 백엔드 통신 (/chat/stream: 답변을 생성되는 대로 표시)
     with st.chat_message("assistant"):
-        with st.spinner("답변 생성 중..."):
-            try:
-                payload = {
-                    "session_id": active_id, 
-                    "query": prompt
-                }
-                
-                # API 호출 (환경변수 적용된 URL 사용)
-                response = requests.post(f"{API_BASE_URL}/chat", json=payload)
-
-                if response.status_code == 200:
-                    res_json = response.json()
-                    answer = res_json.get("response", "응답 없음")
-                    doc_category = res_json.get("category", "General")
-                    
-                    # 제목 업데이트 (첫 질문일 때)
-                    if len(current_chat["messages"]) == 1:
-                        new_title = prompt[:15] + "..." if len(prompt) > 15 else prompt
-                        current_chat["title"] = new_title
-                        st.session_state.chat_sessions[active_id]["title"] = new_title
-
-                    # 답변 출력
-                    if doc_category:
-                        st.caption(f"🧠 Context: {doc_category}")
-                        
-                    st.write(answer)
-                    
-                    current_chat["messages"].append({"role": "assistant", "content": answer})
-                    save_state()
-                    
-                else:
-                    st.error(f"Server Error: {response.text}")
+        try:
+            payload = {
+                "session_id": active_id, 
+                "query": prompt
+            }
             
-            except requests.exceptions.ConnectionError:
-                st.error(f"🚨 연결 실패: {API_BASE_URL}에 접속할 수 없습니다.")
-            except Exception as e:
-                st.error(f"Connection Error: {e}")
\ No newline at end of file
+            # API 호출 (환경변수 적용된 URL 사용)
+            response = requests.post(f"{API_BASE_URL}/chat/stream", json=payload, stream=True)
+
+            if response.status_code == 200:
+                meta, done = {}, {}
+                placeholder = st.empty()
+                placeholder.caption("⏳ 문서 검색 중...")
+
+                def token_stream():
+                    # 문서가 정해지면(meta) 카테고리 표시, token마다 텍스트 전달
+                    for event, data in iter_sse(response):
+                        if event == "meta":
+                            meta.update(data)
+                            placeholder.caption(f"🧠 Context: {data.get('category') or 'General'}")
+                        elif event == "token":
+                            yield data.get("text", "")
+                        elif event == "done":
+                            done.update(data)
+                        elif event == "error":
+                            raise RuntimeError(data.get("detail"))
+
+                answer = st.write_stream(token_stream()) or "응답 없음"
+                if done.get("ttft_ms") is not None:
+                    st.caption(f"⚡ 첫 응답 {done['ttft_ms'] / 1000:.2f}s / 전체 {done['timings']['total'] / 1000:.2f}s")
+                
+                # 제목 업데이트 (첫 질문일 때)
+                if len(current_chat["messages"]) == 1:
+                    new_title = prompt[:15] + "..." if len(prompt) > 15 else prompt
+                    current_chat["title"] = new_title
+                    st.session_state.chat_sessions[active_id]["title"] = new_title
+
+                current_chat["messages"].append({"role": "assistant", "content": answer})
+                save_state()
+                
+            else:
+                st.error(f"Server Error: {response.text}")
+        
+        except requests.exceptions.ConnectionError:
+            st.error(f"🚨 연결 실패: {API_BASE_URL}에 접속할 수 없습니다.")
+        except Exception as e:
+            st.error(f"Connection Error: {e}")
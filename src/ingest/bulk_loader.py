@@ -0,0 +1,221 @@
+# src/ingest/bulk_loader.py
+'''
+Parquet -> ChromaDB 대량 적재기 (재색인용)
+
+기존 ingest_vector.py: df.iterrows()로 metadata 생성 + 100개씩 순차 upsert
+변경:
+    1. metadata를 컬럼 단위로 한 번에 생성 (행 단위 루프 X)
+    2. 배치 크기를 payload 크기(임베딩 + 텍스트 바이트)에 맞춰 자동 조절
+    3. 여러 worker 스레드가 동시에 upsert (진행 중인 배치 수는 제한 -> 메모리 상한 유지)
+    4. 배치 단위 재시도 (지수 백오프 + jitter), 최종 실패 배치는 id 목록으로 보고
+    5. (선택) 같은 데이터로 BM25 역색인도 함께 증분 생성
+    6. (선택) 라벨별 파티션 컬렉션에도 함께 적재
+'''
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow.compute as pc
+from tqdm import tqdm
+
+from src.utils.parquet_io import iter_record_batches, embeddings_to_numpy, count_rows, column_names
+from src.rag.lexical_index import COMMIT_EVERY
+
+BASE_COLUMNS = ["doc_id", "text", "embedding", "label", "file_path"]
+OPTIONAL_METADATA_COLUMNS = ["parent_id", "chunk_index", "bbox"]
+
+
+def build_metadatas(batch, metadata_columns: list) -> list:
+    """
+    RecordBatch의 컬럼들로 Chroma metadata 리스트를 만듭니다.
+    컬럼별로 to_pylist()를 한 번씩만 호출하고, null 값은 키 자체를 생략합니다. (Chroma는 None 불가)
+    """
+    columns = {}
+    for name in metadata_columns:
+        array = batch.column(name)
+        if name in ("label", "file_path"):
+            array = pc.cast(pc.fill_null(array, ""), "string")
+        columns[name] = array.to_pylist()
+
+    names = list(columns)
+    return [
+        {k: v for k, v in zip(names, values) if v is not None}
+        for values in zip(*columns.values())
+    ]
+
+
+def split_by_payload(row_bytes: np.ndarray, target_bytes: int, max_rows: int) -> list:
+    """
+    행별 바이트 크기를 보고 배치 경계를 정합니다. (배치당 약 target_bytes, 최대 max_rows행)
+    Returns: [(start, end), ...]
+    """
+    bounds = []
+    start, n = 0, len(row_bytes)
+    cumsum = np.cumsum(row_bytes)
+    while start < n:
+        offset = cumsum[start - 1] if start > 0 else 0
+        end = int(np.searchsorted(cumsum, offset + target_bytes, side="right"))
+        end = max(end, start + 1)              # 한 행이 target보다 커도 최소 1행
+        end = min(end, start + max_rows, n)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+class BulkLoader:
+    """
+    Args:
+        collection: Chroma 컬렉션
+        workers: 동시 upsert 스레드 수
+        target_batch_bytes: upsert 1회당 목표 payload 크기
+        max_batch_size: upsert 1회당 최대 행 수 (None이면 Chroma client 한도 사용)
+        max_retries: 배치별 재시도 횟수
+        lexical_index: (선택) BM25Index - 적재하면서 텍스트를 함께 색인
+        partitions: (선택) PartitionedCollections - 라벨별 파티션에도 같은 행을 upsert
+    """
+    def __init__(self, collection, workers: int = 4, target_batch_bytes: int = 8 * 1024 * 1024,
+                 max_batch_size: int = None, max_retries: int = 3, read_batch_size: int = 2048,
+                 lexical_index=None, partitions=None):
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.partitions = partitions
+        self.workers = workers
+        self.target_batch_bytes = target_batch_bytes
+        self.max_batch_size = max_batch_size or self._client_max_batch_size(collection)
+        self.max_retries = max_retries
+        self.read_batch_size = read_batch_size
+
+        self.loaded = 0
+        self.retries = 0
+        self.failed_ids = []             # 메인 컬렉션 적재 실패 행
+        self.partition_failed_ids = []   # 라벨 파티션 복사본 적재 실패 행 (메인 컬렉션에는 있음)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _client_max_batch_size(collection, default: int = 5000) -> int:
+        try:
+            return int(collection._client.get_max_batch_size())
+        except Exception:
+            return default
+
+    def load_parquet(self, path: str) -> dict:
+        available = column_names(path)
+        metadata_columns = ["label", "file_path"] + [c for c in OPTIONAL_METADATA_COLUMNS if c in available]
+        columns = BASE_COLUMNS + [c for c in metadata_columns if c not in BASE_COLUMNS]
+
+        total = count_rows(path)
+        # 진행 중(큐 포함)인 배치 수 제한 -> peak 메모리 = 대략 workers * 2 배치
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+        start = time.time()
+        batches = 0
+
+        with tqdm(total=total, desc="Ingesting", unit="rows") as pbar, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def done(future, size):
+                in_flight.release()
+                pbar.update(size)
+
+            for record_batch in iter_record_batches(path, columns=columns, batch_size=self.read_batch_size):
+                # 1. 컬럼 단위 변환
+                ids = pc.cast(record_batch.column("doc_id"), "string").to_pylist()
+                embeddings = embeddings_to_numpy(record_batch)
+                text_array = pc.fill_null(record_batch.column("text"), "")
+                documents = text_array.to_pylist()
+                metadatas = build_metadatas(record_batch, metadata_columns)
+
+                if self.lexical_index is not None:
+                    for doc_id, text, metadata in zip(ids, documents, metadatas):
+                        self.lexical_index.add(doc_id, text, metadata.get("label"))
+                    if self.lexical_index.pending >= COMMIT_EVERY:
+                        self.lexical_index.commit()
+
+                # 2. payload 크기 기반 배치 분할
+                text_bytes = pc.binary_length(text_array).to_numpy(zero_copy_only=False)
+                row_bytes = text_bytes + embeddings.shape[1] * 4
+                for lo, hi in split_by_payload(row_bytes, self.target_batch_bytes, self.max_batch_size):
+                    in_flight.acquire()
+                    future = executor.submit(
+                        self._upsert_with_retry, self.collection,
+                        ids[lo:hi], embeddings[lo:hi], documents[lo:hi], metadatas[lo:hi],
+                    )
+                    future.add_done_callback(lambda f, size=hi - lo: done(f, size))
+                    batches += 1
+
+                    # 3. 라벨별 파티션 (진행률에는 전체 인덱스 기준만 반영)
+                    if self.partitions is not None:
+                        for label, rows in self._group_by_label(metadatas, lo, hi).items():
+                            in_flight.acquire()
+                            future = executor.submit(
+                                self._upsert_with_retry, self.partitions.get_or_create(label),
+                                [ids[r] for r in rows], embeddings[rows],
+                                [documents[r] for r in rows], [metadatas[r] for r in rows],
+                                True,
+                            )
+                            future.add_done_callback(lambda f: in_flight.release())
+
+        if self.lexical_index is not None:
+            self.lexical_index.commit()
+
+        elapsed = time.time() - start
+        report = {
+            "rows": total,
+            "loaded": self.loaded,
+            "failed": len(self.failed_ids),
+            "partition_failed": len(self.partition_failed_ids),
+            "batches": batches,
+            "retries": self.retries,
+            "elapsed_sec": round(elapsed, 2),
+            "rows_per_sec": round(self.loaded / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        print(f"✅ 적재 완료: {report['loaded']}/{total} rows, {batches} batches, "
+              f"{report['rows_per_sec']} rows/s, 재시도 {self.retries}회")
+        if self.failed_ids:
+            print(f"❌ 최종 실패: {len(self.failed_ids)} rows (예: {self.failed_ids[:5]})")
+        if self.partition_failed_ids:
+            print(f"❌ 파티션 적재 실패: {len(self.partition_failed_ids)} rows (예: {self.partition_failed_ids[:5]}) "
+                  f"-> 전체 컬렉션에는 있음, 라벨 필터 검색에서만 누락")
+        return report
+
+    @staticmethod
+    def _group_by_label(metadatas, lo, hi) -> dict:
+        groups = {}
+        for r in range(lo, hi):
+            label = metadatas[r].get("label")
+            if label:
+                groups.setdefault(label, []).append(r)
+        return groups
+
+    def _upsert_with_retry(self, collection, ids, embeddings, documents, metadatas, partition=False):
+        """partition=True면 라벨 파티션 복사본 (loaded에 세지 않고, 실패는 partition_failed_ids에 기록)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                # 메인 컬렉션: 라벨이 바뀐 재적재 문서는 이전 라벨 파티션에서 삭제
+                old_labels = {}
+                if not partition and self.partitions is not None:
+                    old_labels = self.partitions.current_labels(collection, ids)
+                collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas,
+                )
+                if old_labels:
+                    self.partitions.delete_relabeled(old_labels, {doc_id: (m or {}).get("label")
+                                                                  for doc_id, m in zip(ids, metadatas)})
+                if not partition:
+                    with self._lock:
+                        self.loaded += len(ids)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"❌ 배치 적재 실패 [{collection.name}] ({ids[0]} 외 {len(ids) - 1}개): {e}")
+                    with self._lock:
+                        (self.partition_failed_ids if partition else self.failed_ids).extend(ids)
+                    return
+                with self._lock:
+                    self.retries += 1
+                # 지수 백오프 + jitter
+                time.sleep(min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random()))
@@ -0,0 +1,161 @@
+# src/ingest/chunker.py
+'''
+레이아웃 기반 문서 청킹 (긴 문서를 영역 단위로 분할)
+
+긴 보고서의 full_text 전체를 벡터 하나로 만들면 의미가 뭉개지고 임베딩 입력 한도도 넘을 수 있음
+-> OCR 라인의 bbox와 읽기 순서를 이용해 문단/영역 단위로 자름
+
+    1. 라인은 이미 읽기 순서(좌상 -> 우하)로 정렬되어 있음 (OCRAggregator)
+    2. 세로 간격이 평소 줄 높이보다 크게 벌어지면 새 영역 시작
+    3. 영역이 max_chars를 넘으면 강제로 분할, min_chars보다 작으면 이웃 영역과 병합
+'''
+import statistics
+
+# 이보다 짧은 문서는 청킹하지 않고 통째로 색인
+MIN_DOC_CHARS = 2000
+
+
+def _line_fields(line):
+    # OCRLine 객체 / JSON dict 모두 지원
+    if isinstance(line, dict):
+        return line.get("text", ""), line.get("bbox") or line.get("box")
+    return line.text, line.bbox
+
+
+def _union_bbox(boxes):
+    return [
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ]
+
+
+class LayoutChunker:
+    """
+    Args:
+        max_chars: 청크 하나의 최대 글자 수
+        min_chars: 이보다 작은 청크는 이웃과 병합
+        gap_ratio: 줄 간격이 (중앙값 줄 높이 x gap_ratio)보다 크면 영역 분리
+    """
+    def __init__(self, max_chars: int = 1500, min_chars: int = 200, gap_ratio: float = 1.5):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self.gap_ratio = gap_ratio
+
+    def split(self, lines) -> list:
+        """
+        Returns:
+            [{"chunk_index": 0, "text": "...", "bbox": [x1, y1, x2, y2], "line_start": 0, "line_end": 12}, ...]
+        """
+        items = []
+        for line in lines:
+            text, bbox = _line_fields(line)
+            if text and text.strip() and bbox and len(bbox) == 4:
+                items.append((text.strip(), [int(v) for v in bbox]))
+        if not items:
+            return []
+
+        heights = [max(1, b[3] - b[1]) for _, b in items]
+        gap_limit = statistics.median(heights) * self.gap_ratio
+
+        # 1. 세로 간격 / 글자 수 기준으로 영역 나누기
+        regions = []
+        current, current_len, prev_bbox = [], 0, None
+        for idx, (text, bbox) in enumerate(items):
+            new_region = False
+            if prev_bbox is not None:
+                gap = bbox[1] - prev_bbox[3]
+                # 다음 단(column)으로 넘어가면서 위로 올라가는 경우도 영역 분리
+                if gap > gap_limit or bbox[1] < prev_bbox[1] - gap_limit:
+                    new_region = True
+            if current and current_len + len(text) + 1 > self.max_chars:
+                new_region = True
+
+            if new_region and current:
+                regions.append(current)
+                current, current_len = [], 0
+
+            current.append((idx, text, bbox))
+            current_len += len(text) + 1
+            prev_bbox = bbox
+        if current:
+            regions.append(current)
+
+        # 2. 너무 작은 영역은 이웃과 병합
+        merged = []
+        for region in regions:
+            region_len = sum(len(t) + 1 for _, t, _ in region)
+            if merged:
+                prev_len = sum(len(t) + 1 for _, t, _ in merged[-1])
+                small = region_len < self.min_chars or prev_len < self.min_chars
+                if small and prev_len + region_len <= self.max_chars:
+                    merged[-1] = merged[-1] + region
+                    continue
+            merged.append(region)
+
+        # 3. 결과 조립
+        chunks = []
+        for chunk_index, region in enumerate(merged):
+            chunks.append({
+                "chunk_index": chunk_index,
+                "text": "\n".join(t for _, t, _ in region),
+                "bbox": _union_bbox([b for _, _, b in region]),
+                "line_start": region[0][0],
+                "line_end": region[-1][0],
+            })
+        return chunks
+
+
+def chunk_id(doc_id: str, chunk_index: int) -> str:
+    return f"{doc_id}#c{chunk_index}"
+
+
+def bbox_to_str(bbox) -> str:
+    # Chroma metadata는 스칼라 값만 허용하므로 문자열로 저장
+    return ",".join(str(int(v)) for v in bbox)
+
+
+def aggregate_chunk_hits(hits: list, top_k: int) -> list:
+    """
+    청크 단위 검색 결과를 부모 문서 단위로 묶습니다.
+    - 문서 순서 = 입력 순서에서 처음 등장한 위치 (distance 순이든 RRF 순이든 호출 측 순위 유지)
+    - 문서 distance = 매칭된 청크 중 가장 작은 distance (RRF 순서면 첫 청크가 가장 가깝다는 보장이 없음)
+    - text = 매칭된 청크들을 문서 내 순서대로 이어붙인 것
+    - chunks = 매칭된 청크 목록 (bbox 포함, 하이라이트용)
+
+    hits: [{"id", "text", "metadata", "distance"}, ...] (순위 순)
+    """
+    docs = {}
+    for hit in hits:
+        metadata = hit.get("metadata") or {}
+        parent_id = metadata.get("parent_id", hit["id"])
+
+        if parent_id not in docs:
+            if len(docs) >= top_k:
+                continue
+            docs[parent_id] = {
+                "id": parent_id,
+                "metadata": dict(metadata),
+                "distance": hit["distance"],
+                "chunks": [],
+            }
+
+        doc = docs[parent_id]
+        doc["distance"] = min(doc["distance"], hit["distance"])
+        doc["chunks"].append({
+            "id": hit["id"],
+            "chunk_index": metadata.get("chunk_index", -1),
+            "bbox": metadata.get("bbox"),
+            "distance": hit["distance"],
+            "text": hit["text"],
+        })
+
+    results = []
+    for doc in docs.values():
+        ordered = sorted(doc["chunks"], key=lambda c: c["chunk_index"])
+        doc["text"] = "\n...\n".join(c["text"] for c in ordered)
+        for c in doc["chunks"]:
+            c.pop("text")
+        results.append(doc)
+    return results
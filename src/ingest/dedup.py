@@ -0,0 +1,277 @@
+# src/ingest/dedup.py
+'''
+MinHash + LSH 기반 유사 중복 문서 탐지
+
+RVL-CDIP나 실제 업로드 문서에는 거의 똑같은 양식(청구서 템플릿 등)이 많음
+-> 중복 문서를 임베딩/저장하지 않으면 API 비용, 인덱스 크기가 줄고 검색 top-k 자리도 확보됨
+
+    OCR full_text -> 문자 n-gram shingle -> MinHash 서명(num_perm) -> LSH band 버킷
+    같은 버킷에 걸린 후보만 서명으로 Jaccard 추정 -> threshold 이상이면 중복
+
+새 문서는 check() 시점에 임시(pending)로 등록되고, 실제로 색인(임베딩 + 저장)에 성공하면 confirm(),
+실패하면 discard() -> 색인되지 않은 doc id가 canonical로 저장되지 않음 (save 시 미확정 등록은 버림)
+'''
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# 서명 계산 시 한 번에 처리할 shingle 수 (임시 행렬 = num_perm x SHINGLE_BLOCK x 8 bytes, 128 x 4096 -> 4MB)
+SHINGLE_BLOCK = 4096
+
+MODE_SKIP = "skip"   # 중복 문서는 버림
+MODE_LINK = "link"   # 중복 문서는 색인하지 않고 canonical doc id에 연결만 기록
+
+# ingest 스크립트가 서명 / 연결을 저장하는 기본 위치 (검색 쪽에서 연결을 읽을 때 사용)
+DEDUP_PATH = os.getenv("DEDUP_PATH", "./data/processed/dedup_signatures.npz")
+
+
+def links_path(signature_path: str) -> str:
+    """서명 파일(.npz) 옆의 중복 연결 파일 경로"""
+    return os.path.splitext(signature_path)[0] + "_links.json"
+
+
+def _optimal_bands(threshold: float, num_perm: int, min_recall: float = 0.99):
+    """
+    b * r = num_perm 조합 중에서, 유사도가 threshold인 문서쌍이 후보로 걸릴 확률
+    1 - (1 - s^r)^b 가 min_recall 이상인 가장 큰 r (후보 수가 가장 적은 조합)
+    후보는 서명으로 다시 검증하므로 false positive보다 false negative를 줄이는 쪽으로 선택합니다.
+    """
+    best = (num_perm, 1)
+    for r in range(1, num_perm + 1):
+        if num_perm % r:
+            continue
+        b = num_perm // r
+        if 1.0 - (1.0 - threshold ** r) ** b >= min_recall:
+            best = (b, r)
+    return best
+
+
+class NearDuplicateDetector:
+    """
+    Args:
+        threshold: 이 값 이상의 (추정) Jaccard 유사도면 중복으로 판단
+        num_perm: MinHash 서명 길이
+        shingle_size: 문자 n-gram 크기 (OCR 오탈자에 강하도록 단어 대신 문자 단위 사용)
+        mode: "skip" 또는 "link"
+        seed: 해시 파라미터 시드 (저장/로드 시 동일해야 함)
+    """
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5,
+                 mode: str = MODE_SKIP, seed: int = 42):
+        if mode not in (MODE_SKIP, MODE_LINK):
+            raise ValueError(f"지원하지 않는 mode: {mode}")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.mode = mode
+        self.seed = seed
+        self.bands, self.rows = _optimal_bands(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [dict() for _ in range(self.bands)]
+        self._ids = []
+        self._signatures = []
+        self._pending = set()   # 등록됐지만 아직 색인 성공이 확인되지 않은 idx
+        self._dead = set()      # 색인 실패로 버린 idx (버킷에는 남아 있지만 후보에서 제외)
+        self._index_of = {}     # doc id -> idx
+        self.links = {}   # 중복 doc id -> canonical doc id
+        self._lock = threading.Lock()
+
+    # 1. 서명 계산
+    def _shingles(self, text: str) -> np.ndarray:
+        text = re.sub(r"\s+", " ", text.lower()).strip()
+        k = self.shingle_size
+        if len(text) <= k:
+            grams = {text}
+        else:
+            grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self._shingles(text)
+        # (num_perm, SHINGLE_BLOCK) 블록 단위로 계산 후 최소값 누적 (a < 2^31, x < 2^32 이라 uint64 overflow 없음)
+        # 긴 문서도 (num_perm, n_shingles) 전체 행렬을 만들지 않음
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), SHINGLE_BLOCK):
+            block = hashes[start:start + SHINGLE_BLOCK]
+            permuted = (np.outer(self._a, block) + self._b[:, None]) % _MERSENNE_PRIME
+            np.minimum(signature, (permuted & _MAX_HASH).min(axis=1), out=signature)
+        return signature
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    # 2. 중복 판정 + 등록
+    def check(self, doc_id: str, text: str):
+        """
+        중복이면 canonical doc id를, 새 문서면 None을 반환합니다.
+        새 문서는 임시로 등록됨 (이후 중복 판정에는 바로 사용) -> 색인 성공 시 confirm, 실패 시 discard
+        """
+        signature = self.signature(text)
+
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self._buckets[band].get(key, ()))
+
+            # LSH 후보 중 실제 추정 유사도가 threshold 이상인 가장 비슷한 문서
+            best_idx, best_sim = None, 0.0
+            for idx in candidates - self._dead:
+                sim = float(np.mean(self._signatures[idx] == signature))
+                if sim >= self.threshold and sim > best_sim:
+                    best_idx, best_sim = idx, sim
+
+            if best_idx is not None:
+                canonical = self._ids[best_idx]
+                # 같은 문서를 다시 색인하는 경우는 중복이 아님
+                if canonical == doc_id:
+                    return None
+                if self.mode == MODE_LINK:
+                    self.links[doc_id] = canonical
+                return canonical
+
+            self._pending.add(self._register(doc_id, signature))
+            return None
+
+    def _register(self, doc_id, signature) -> int:
+        idx = len(self._ids)
+        self._ids.append(doc_id)
+        self._signatures.append(signature)
+        self._index_of[doc_id] = idx
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(idx)
+        return idx
+
+    def confirm(self, doc_id: str):
+        """색인(임베딩 + 저장) 성공 -> canonical로 확정"""
+        with self._lock:
+            idx = self._index_of.get(doc_id)
+            if idx is not None:
+                self._pending.discard(idx)
+
+    def discard(self, doc_id: str):
+        """색인 실패 -> 등록 취소, 이 문서를 가리키던 중복 연결도 제거 (없는 doc id로 연결되지 않도록)"""
+        with self._lock:
+            self._discard(doc_id)
+
+    def _discard(self, doc_id):
+        idx = self._index_of.pop(doc_id, None)
+        if idx is None:
+            return
+        self._pending.discard(idx)
+        self._dead.add(idx)
+        orphans = [d for d, c in self.links.items() if c == doc_id]
+        for duplicate in orphans:
+            del self.links[duplicate]
+        if orphans:
+            print(f"⚠️ [Dedup] canonical 색인 실패 -> 중복 연결 {len(orphans)}개 제거: {doc_id}")
+
+    # 3. 저장 / 로드 (증분 색인 시 이전 문서들과도 비교하기 위함)
+    def save(self, path: str):
+        """
+        확정된 등록만 저장 (끝까지 confirm되지 않은 등록 = 색인 실패로 보고 버림)
+        연결 파일은 항상 다시 씀 -> 전체 재색인 후 이전 실행의 연결이 남지 않음
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            for idx in list(self._pending):
+                self._discard(self._ids[idx])
+            live = [idx for idx in range(len(self._ids)) if idx not in self._dead]
+            signatures = (np.stack([self._signatures[idx] for idx in live]) if live
+                          else np.zeros((0, self.num_perm), dtype=np.uint64))
+            np.savez_compressed(
+                path,
+                ids=np.array([self._ids[idx] for idx in live], dtype=str),
+                signatures=signatures,
+                config=np.array([self.num_perm, self.shingle_size, self.seed], dtype=np.int64),
+            )
+            links = dict(self.links)
+        tmp_path = links_path(path) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(links, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, links_path(path))
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return self
+        data = np.load(path)
+        num_perm, shingle_size, seed = data["config"].tolist()
+        if (num_perm, shingle_size, seed) != (self.num_perm, self.shingle_size, self.seed):
+            print(f"⚠️ [Dedup] 설정이 달라 기존 서명을 무시합니다: {path}")
+            return self
+
+        with self._lock:
+            for doc_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                self._register(doc_id, signature)
+
+        if os.path.exists(links_path(path)):
+            with open(links_path(path), "r", encoding="utf-8") as f:
+                self.links.update(json.load(f))
+        print(f"📂 [Dedup] 기존 서명 {len(self._ids)}개 로드")
+        return self
+
+    def __len__(self):
+        return len(self._ids) - len(self._dead)
+
+
+class DuplicateLinks:
+    """
+    "link" 모드로 기록된 중복 연결을 검색 / 메타데이터 조회 쪽에서 사용
+        - canonical(doc_id): 중복 doc id -> 색인된 canonical doc id
+        - aliases(doc_id): canonical doc id -> 같은 내용의 중복 doc id 목록
+        - annotate(docs): 검색 결과에 "aliases" 추가
+    """
+    def __init__(self, links: dict = None):
+        self.links = dict(links or {})
+        self._aliases = {}
+        for duplicate in self.links:
+            self._aliases.setdefault(self.canonical(duplicate), []).append(duplicate)
+        for duplicates in self._aliases.values():
+            duplicates.sort()
+
+    @classmethod
+    def load(cls, signature_path: str = DEDUP_PATH):
+        path = links_path(signature_path)
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                links = cls(json.load(f))
+            print(f"📂 [Dedup] 중복 연결 {len(links)}개 로드")
+            return links
+        except Exception as e:
+            print(f"⚠️ [Dedup] 중복 연결 로드 실패 (무시): {e}")
+            return cls()
+
+    def canonical(self, doc_id: str) -> str:
+        # 증분 색인으로 연결이 이어진 경우(a -> b -> c)까지 따라감
+        seen = set()
+        while doc_id in self.links and doc_id not in seen:
+            seen.add(doc_id)
+            doc_id = self.links[doc_id]
+        return doc_id
+
+    def aliases(self, doc_id: str) -> list:
+        return list(self._aliases.get(doc_id, ()))
+
+    def annotate(self, docs: list) -> list:
+        if not self.links:
+            return docs
+        for doc in docs:
+            aliases = self.aliases(doc.get("id"))
+            if aliases:
+                doc["aliases"] = aliases
+        return docs
+
+    def __len__(self):
+        return len(self.links)
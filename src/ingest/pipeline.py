@@ -0,0 +1,213 @@
+# src/ingest/pipeline.py
+'''
+Bounded Queue 기반 다단계 파이프라인
+    [source] -> Queue -> [stage 1 workers] -> Queue -> [stage 2 workers] -> ...
+
+- 각 Stage는 자신만의 worker pool(스레드)을 가짐
+- Stage 사이의 Queue는 크기가 제한되어 있어서, 뒤 단계가 느리면 앞 단계가 자동으로 멈춤 (backpressure)
+- Stage별 처리량 / 대기 시간 통계를 수집
+'''
+import queue
+import threading
+import time
+
+_SENTINEL = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0      # 입력 아이템 수
+        self.emitted = 0        # 다음 단계로 넘긴 아이템 수
+        self.dropped = 0        # None 반환 (필터링)
+        self.failed = 0         # 예외 발생
+        self.busy_sec = 0.0     # 실제 작업 시간 (worker 합계)
+        self.starved_sec = 0.0  # 입력 Queue가 비어서 기다린 시간
+        self.blocked_sec = 0.0  # 출력 Queue가 가득 차서 기다린 시간 (backpressure)
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add(self, **kwargs):
+        with self._lock:
+            for key, value in kwargs.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def summary(self) -> dict:
+        wall = (self.finished_at or time.time()) - (self.started_at or time.time())
+        worker_sec = max(wall * self.workers, 1e-9)
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "wall_sec": round(wall, 3),
+            "throughput_per_sec": round(self.processed / wall, 2) if wall > 0 else 0.0,
+            # worker 시간 중 비율 (busy + starved + blocked ≈ 1.0)
+            "busy_ratio": round(self.busy_sec / worker_sec, 3),
+            "starved_ratio": round(self.starved_sec / worker_sec, 3),
+            "backpressure_ratio": round(self.blocked_sec / worker_sec, 3),
+        }
+
+
+class Stage:
+    """
+    파이프라인 한 단계.
+
+    Args:
+        name: 단계 이름 (통계 출력용)
+        setup: worker마다 한 번 호출되어 처리 함수를 반환하는 팩토리.
+               모델처럼 스레드 간 공유가 불안전한 자원은 여기서 worker별로 생성합니다.
+               처리 함수는 item(batch_size > 1이면 item 리스트)을 받아
+               다음 단계로 넘길 결과(또는 None, 여러 개면 리스트)를 반환합니다.
+        workers: worker 스레드 수
+        batch_size: 1보다 크면 아이템을 모아서 리스트로 전달 (결과도 리스트로 반환)
+        batch_timeout: 배치가 다 차지 않아도 이 시간이 지나면 처리
+    """
+    def __init__(self, name, setup, workers: int = 1, batch_size: int = 1, batch_timeout: float = 0.5):
+        self.name = name
+        self.setup = setup
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.stats = StageStats(name, workers)
+
+
+class Pipeline:
+    def __init__(self, stages: list, queue_size: int = 32):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_stats = StageStats("source", 1)
+        self._errors = []
+
+    def run(self, items, on_result=None) -> list:
+        """
+        items를 파이프라인에 흘려보내고 모든 Stage가 끝날 때까지 기다립니다.
+        마지막 Stage의 결과는 on_result 콜백으로 전달됩니다.
+        Returns: Stage별 통계 summary 리스트
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+
+        for idx, stage in enumerate(self.stages):
+            stage.stats.started_at = time.time()
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            next_workers = self.stages[idx + 1].workers if idx + 1 < len(self.stages) else 1
+
+            for w in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[idx], queues[idx + 1], remaining, lock, next_workers),
+                    name=f"{stage.name}-{w}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        # 마지막 Queue 소비 (결과 수집)
+        collector = threading.Thread(target=self._collect, args=(queues[-1], on_result), daemon=True)
+        collector.start()
+
+        # Source: 첫 Queue에 아이템 투입 (Queue가 가득 차면 여기서 대기 = backpressure)
+        self.source_stats.started_at = time.time()
+        for item in items:
+            t0 = time.perf_counter()
+            queues[0].put(item)
+            self.source_stats.add(processed=1, emitted=1, blocked_sec=time.perf_counter() - t0)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_SENTINEL)
+        self.source_stats.finished_at = time.time()
+
+        for t in threads:
+            t.join()
+        collector.join()
+
+        if self._errors:
+            print(f"⚠️ 파이프라인 처리 중 {len(self._errors)}건 오류 (첫 오류: {self._errors[0]})")
+
+        return [self.source_stats.summary()] + [stage.stats.summary() for stage in self.stages]
+
+    def _worker(self, stage, in_q, out_q, remaining, lock, next_workers):
+        stats = stage.stats
+        try:
+            handler = stage.setup()
+        except Exception as e:
+            self._errors.append(f"[{stage.name}] setup 실패: {e}")
+            handler = None
+
+        done = False
+        while not done:
+            # 1. 입력 수집 (batch_size만큼 또는 timeout까지)
+            batch = []
+            t0 = time.perf_counter()
+            while len(batch) < stage.batch_size:
+                timeout = stage.batch_timeout if batch else None
+                try:
+                    item = in_q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _SENTINEL:
+                    done = True
+                    break
+                batch.append(item)
+            stats.add(starved_sec=time.perf_counter() - t0)
+
+            if not batch:
+                continue
+            if handler is None:
+                stats.add(processed=len(batch), failed=len(batch))
+                continue
+
+            # 2. 처리
+            t0 = time.perf_counter()
+            try:
+                result = handler(batch if stage.batch_size > 1 else batch[0])
+            except Exception as e:
+                self._errors.append(f"[{stage.name}] {e}")
+                stats.add(processed=len(batch), failed=len(batch), busy_sec=time.perf_counter() - t0)
+                continue
+            stats.add(processed=len(batch), busy_sec=time.perf_counter() - t0)
+
+            # 3. 출력 (다음 Queue가 가득 차 있으면 대기)
+            # 리스트를 반환하면 여러 아이템으로 펼침 (배치 처리 / 청크 분할)
+            outputs = result if isinstance(result, list) else [result]
+            outputs = [o for o in (outputs or []) if o is not None]
+            stats.add(emitted=len(outputs), dropped=max(0, len(batch) - len(outputs)))
+
+            t0 = time.perf_counter()
+            for out in outputs:
+                out_q.put(out)
+            stats.add(blocked_sec=time.perf_counter() - t0)
+
+        # 이 Stage의 마지막 worker가 다음 Stage에 종료 신호 전달
+        with lock:
+            remaining[0] -= 1
+            is_last = remaining[0] == 0
+        if is_last:
+            stats.finished_at = time.time()
+            for _ in range(next_workers):
+                out_q.put(_SENTINEL)
+
+    def _collect(self, out_q, on_result):
+        while True:
+            item = out_q.get()
+            if item is _SENTINEL:
+                return
+            if on_result:
+                try:
+                    on_result(item)
+                except Exception as e:
+                    self._errors.append(f"[collect] {e}")
+
+
+def print_stats(stats: list):
+    print("\n📊 Stage 통계")
+    print(f"   {'stage':<10} {'workers':>7} {'in':>7} {'out':>7} {'fail':>5} "
+          f"{'items/s':>8} {'busy':>6} {'starved':>8} {'backpres':>9}")
+    for s in stats:
+        print(f"   {s['stage']:<10} {s['workers']:>7} {s['processed']:>7} {s['emitted']:>7} {s['failed']:>5} "
+              f"{s['throughput_per_sec']:>8} {s['busy_ratio']:>6} {s['starved_ratio']:>8} {s['backpressure_ratio']:>9}")
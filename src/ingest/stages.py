@@ -0,0 +1,188 @@
+# src/ingest/stages.py
+'''
+원본 이미지 -> 검색 가능한 컬렉션까지의 Stage 정의
+    ocr -> dedup -> classify -> chunk -> embed -> upsert
+
+각 함수는 Stage.setup 팩토리를 반환합니다. (worker마다 모델을 따로 로드)
+'''
+import os
+
+from src.ingest.pipeline import Stage
+from src.ingest.chunker import LayoutChunker, MIN_DOC_CHARS, chunk_id, bbox_to_str
+
+MIN_TEXT_LENGTH = 5
+
+
+def ocr_stage(workers: int = 2, save_dir: str = None) -> Stage:
+    """
+    이미지 경로 -> OCRResult
+    save_dir가 주어지면 기존 ingest.py가 읽을 수 있도록 OCR JSON도 저장합니다. (save_dir/<폴더 라벨>/<파일명>.json)
+    """
+    def setup():
+        from ocr_service.aggregator import OCRAggregator
+        aggregator = OCRAggregator()
+
+        def handle(image_path):
+            dir_label = os.path.basename(os.path.dirname(image_path))
+            ocr_result = aggregator.run(image_path)
+
+            json_path = None
+            if save_dir:
+                out_dir = os.path.join(save_dir, dir_label)
+                aggregator.save_to_json(ocr_result, out_dir)
+                json_path = os.path.join(out_dir, os.path.splitext(ocr_result.metadata.file_name)[0] + ".json")
+
+            if len(ocr_result.full_text.strip()) < MIN_TEXT_LENGTH:
+                return None
+
+            return {
+                "doc_id": os.path.splitext(os.path.basename(image_path))[0],
+                "file_path": image_path,
+                "dir_label": dir_label,
+                "json_path": json_path,
+                "ocr": ocr_result,
+                "text": ocr_result.full_text,
+            }
+        return handle
+
+    return Stage("ocr", setup, workers=workers)
+
+
+def dedup_stage(detector) -> Stage:
+    """
+    OCR 텍스트 기준 유사 중복 제거 (분류/임베딩 전에 걸러서 비용 절감)
+    detector가 lock으로 보호되므로 worker는 1개면 충분합니다.
+    새 문서는 임시 등록 -> upsert_stage(detector=...)가 저장 성공 후 확정
+    """
+    def setup():
+        def handle(item):
+            canonical = detector.check(item["doc_id"], item["text"])
+            if canonical is not None:
+                return None
+            return item
+        return handle
+
+    return Stage("dedup", setup, workers=1)
+
+
+def classify_stage(workers: int = 1, model_path: str = "models/layoutlmv3_finetuned.pt") -> Stage:
+    """
+    LayoutLMv3 분류기로 라벨 부여
+    분류 실패 시 폴더 이름을 라벨로 사용합니다.
+    """
+    def setup():
+        from src.core.classifier import DocumentClassifier
+        classifier = DocumentClassifier(model_path=model_path)
+
+        def handle(item):
+            result = classifier.predict(item["file_path"], item["ocr"])
+            if result["label"] == "error":
+                item["label"] = item["dir_label"]
+                item["label_confidence"] = 0.0
+            else:
+                item["label"] = result["label"]
+                item["label_confidence"] = result["confidence"]
+            return item
+        return handle
+
+    return Stage("classify", setup, workers=workers)
+
+
+def chunk_stage(chunker: LayoutChunker = None, min_doc_chars: int = MIN_DOC_CHARS) -> Stage:
+    """
+    긴 문서를 레이아웃 영역 단위 청크로 분할 (아이템 1개 -> 여러 개)
+    청크는 parent_id / chunk_index / bbox를 가지고, 짧은 문서는 그대로 통과합니다.
+    """
+    chunker = chunker or LayoutChunker()
+
+    def setup():
+        def handle(item):
+            if len(item["text"]) < min_doc_chars:
+                return item
+
+            chunks = chunker.split(item["ocr"].lines)
+            if len(chunks) <= 1:
+                return item
+
+            return [
+                {
+                    **item,
+                    "doc_id": chunk_id(item["doc_id"], chunk["chunk_index"]),
+                    "text": chunk["text"],
+                    "parent_id": item["doc_id"],
+                    "chunk_index": chunk["chunk_index"],
+                    "bbox": bbox_to_str(chunk["bbox"]),
+                }
+                for chunk in chunks
+            ]
+        return handle
+
+    return Stage("chunk", setup, workers=1)
+
+
+def embed_stage(workers: int = 4) -> Stage:
+    """
+    Gemini 임베딩 (네트워크 I/O 위주라 worker를 여러 개 두는 것이 유리)
+    """
+    def setup():
+        from src.core.embedding import get_embedding
+
+        def handle(item):
+            item["embedding"] = get_embedding(item["text"])
+            # 이후 단계에서는 OCR 객체가 필요 없으므로 메모리 해제
+            item.pop("ocr", None)
+            return item
+        return handle
+
+    return Stage("embed", setup, workers=workers)
+
+
+def _metadata(item) -> dict:
+    metadata = {"label": str(item["label"]), "file_path": str(item["file_path"])}
+    for key in ("parent_id", "chunk_index", "bbox"):
+        if item.get(key) is not None:
+            metadata[key] = item[key]
+    return metadata
+
+
+def upsert_stage(collection, workers: int = 2, batch_size: int = 64, lexical_index=None, partitions=None,
+                 detector=None) -> Stage:
+    """
+    Chroma 컬렉션에 배치 단위 upsert
+    lexical_index가 주어지면 같은 텍스트로 BM25 역색인에도 추가합니다. (commit은 호출 측에서)
+    partitions(PartitionedCollections)가 주어지면 라벨별 파티션에도 upsert 합니다.
+    detector(NearDuplicateDetector)가 주어지면 저장에 성공한 문서를 canonical로 확정합니다.
+    """
+    def _upsert(target, items):
+        target.upsert(
+            ids=[item["doc_id"] for item in items],
+            embeddings=[item["embedding"] for item in items],
+            documents=[item["text"] for item in items],
+            metadatas=[_metadata(item) for item in items],
+        )
+
+    def setup():
+        def handle(items):
+            # 라벨이 바뀐 재적재 문서는 이전 라벨 파티션에서 지워야 하므로 upsert 전에 현재 라벨 확인
+            old_labels = partitions.current_labels(collection, [item["doc_id"] for item in items]) \
+                if partitions is not None else {}
+            _upsert(collection, items)
+            if partitions is not None:
+                partitions.delete_relabeled(old_labels, {item["doc_id"]: item.get("label") for item in items})
+                groups = {}
+                for item in items:
+                    if item.get("label"):
+                        groups.setdefault(item["label"], []).append(item)
+                for label, group in groups.items():
+                    _upsert(partitions.get_or_create(label), group)
+            for item in items:
+                if lexical_index is not None:
+                    lexical_index.add(item["doc_id"], item["text"], item["label"])
+                if detector is not None:
+                    detector.confirm(item.get("parent_id") or item["doc_id"])
+                item.pop("embedding", None)
+            return items
+        return handle
+
+    return Stage("upsert", setup, workers=workers, batch_size=batch_size)
+
@@ -0,0 +1,226 @@
+# src/rag/answer_cache.py
+'''
+문서별 의미 기반 답변 캐시
+
+기존: 같은 문서에 같은 질문("이 청구서 총액이 얼마야?")이 와도 매번 검색 -> Rerank -> 이미지 + Vision LLM 호출
+변경:
+    1. 키 = (답변에 사용한 문서 경로, 정규화된 질문 임베딩)
+    2. 같은 문서의 이전 질문들과 cosine 유사도가 ANSWER_CACHE_THRESHOLD 이상이면 저장된 답변 재사용
+    3. 문서 버전 = 이미지 내용 hash + OCR JSON 내용 hash
+       -> 재수집 / 재OCR / 재업로드로 내용이 바뀌면 그 문서의 캐시 전체 폐기
+       (mtime을 보존하는 복사(cp -p, rsync -a)도 내용이 다르면 감지, hash는 파일 stat이 같으면 재사용)
+    4. TTL + 전체 항목 수 제한 (오래된 것부터 삭제)
+    5. 캐시 대상이 아닌 질문(이전 대화 있음 / 업로드 파일)은 조회 / 저장 모두 생략 (cacheable)
+'''
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.image_prep import ocr_json_path
+
+# 설정 (환경변수로 덮어쓰기 가능)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "on") != "off"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+# 질문 임베딩 cosine 유사도 기준 (높을수록 보수적: 거의 같은 질문만 재사용)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# 캐시하지 않을 디렉토리 (업로드 파일은 업로드마다 캐시가 폐기되므로 hit이 날 수 없음), 쉼표로 구분
+ANSWER_CACHE_EXCLUDE_DIRS = [d for d in os.getenv("ANSWER_CACHE_EXCLUDE_DIRS", "temp_uploads").split(",") if d]
+
+# 파일 경로 -> (stat 키, 내용 hash). stat이 같으면 다시 읽지 않음
+_HASHES = {}
+_HASH_LOCK = threading.Lock()
+
+
+def _content_hash(path: str):
+    """
+    파일 내용 sha1. 파일이 없으면 None
+    inode / 크기 / mtime / ctime이 모두 같으면 이전 결과 재사용 (내용을 바꾸면 ctime은 항상 바뀜)
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stat_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+    with _HASH_LOCK:
+        cached = _HASHES.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    with _HASH_LOCK:
+        _HASHES[path] = (stat_key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _fingerprint(path: str):
+    """문서 버전 (이미지 내용 hash, OCR JSON 내용 hash). 이미지가 없으면 None"""
+    image_hash = _content_hash(path)
+    if image_hash is None:
+        return None
+    json_path = ocr_json_path(path)
+    return (image_hash, _content_hash(json_path) if json_path else None)
+
+
+class SemanticAnswerCache:
+    """
+    Args:
+        max_entries: 전체 답변 수 상한 (LRU)
+        ttl_sec: 답변 유효 시간
+        threshold: 재사용할 최소 질문 유사도
+    """
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_sec: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.threshold = threshold
+        self._docs = {}               # 문서 경로 -> {"fingerprint", "keys": [entry key]}
+        self._entries = OrderedDict() # entry key -> {"doc", "embedding", "query", "answer", "created_at"}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "skipped": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _drop_doc(self, doc_path):
+        doc = self._docs.pop(doc_path, None)
+        if doc:
+            for key in doc["keys"]:
+                self._entries.pop(key, None)
+
+    def _check_doc(self, doc_path, fingerprint):
+        """문서 버전이 바뀌었으면 해당 문서 캐시 폐기 (lock 안에서 호출)"""
+        doc = self._docs.get(doc_path)
+        if doc is not None and doc["fingerprint"] != fingerprint:
+            self._drop_doc(doc_path)
+            self.stats["invalidations"] += 1
+            print(f"🔄 [AnswerCache] 문서 변경 감지 -> 캐시 폐기: {os.path.basename(doc_path)}")
+
+    def cacheable(self, doc_path: str, history=None) -> bool:
+        """이전 대화가 있으면 답변이 문맥에 따라 달라지고, 업로드 파일은 hit이 날 수 없으므로 제외"""
+        if history:
+            return False
+        doc_path = os.path.abspath(doc_path)
+        return not any(doc_path.startswith(os.path.abspath(d) + os.sep) for d in ANSWER_CACHE_EXCLUDE_DIRS)
+
+    def has_entries(self, doc_path: str) -> bool:
+        """이 문서로 저장된 답변이 있는지 (없으면 질문 임베딩 없이 miss 확정)"""
+        with self._lock:
+            doc = self._docs.get(os.path.abspath(doc_path))
+            return bool(doc and doc["keys"])
+
+    def get(self, doc_path: str, query_embedding):
+        """
+        Returns: (답변, 유사도) 또는 (None, 최고 유사도)
+        """
+        doc_path = os.path.abspath(doc_path)
+        query = self._normalize(query_embedding)
+        fingerprint = _fingerprint(doc_path)   # 파일 hash는 lock 밖에서
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            self._check_doc(doc_path, fingerprint)
+            doc = self._docs.get(doc_path)
+
+            best_key, best_sim = None, 0.0
+            if doc:
+                # 만료된 항목 정리 후 남은 질문들과 유사도 비교
+                keys = [k for k in doc["keys"] if now - self._entries[k]["created_at"] <= self.ttl_sec]
+                for k in set(doc["keys"]) - set(keys):
+                    self._entries.pop(k, None)
+                doc["keys"] = keys
+                if keys:
+                    sims = np.stack([self._entries[k]["embedding"] for k in keys]) @ query
+                    idx = int(np.argmax(sims))
+                    best_key, best_sim = keys[idx], float(sims[idx])
+
+            if best_key is not None and best_sim >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.stats["hits"] += 1
+                return self._entries[best_key]["answer"], best_sim
+            self.stats["misses"] += 1
+            return None, best_sim
+
+    def put(self, doc_path: str, query_embedding, query: str, answer: str):
+        doc_path = os.path.abspath(doc_path)
+        fingerprint = _fingerprint(doc_path)
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._check_doc(doc_path, fingerprint)
+            doc = self._docs.setdefault(doc_path, {"fingerprint": fingerprint, "keys": []})
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {
+                "doc": doc_path,
+                "embedding": self._normalize(query_embedding),
+                "query": query,
+                "answer": answer,
+                "created_at": time.time(),
+            }
+            doc["keys"].append(key)
+
+            # 전체 항목 수 제한 (가장 오래 안 쓴 것부터)
+            while len(self._entries) > self.max_entries:
+                old_key, old = self._entries.popitem(last=False)
+                old_doc = self._docs.get(old["doc"])
+                if old_doc:
+                    old_doc["keys"].remove(old_key)
+                    if not old_doc["keys"]:
+                        del self._docs[old["doc"]]
+                self.stats["evictions"] += 1
+
+    def invalidate(self, doc_path: str):
+        """문서 재업로드 / 재수집 시 명시적으로 폐기"""
+        doc_path = os.path.abspath(doc_path)
+        with self._lock:
+            if doc_path in self._docs:
+                self._drop_doc(doc_path)
+                self.stats["invalidations"] += 1
+
+    def record_skip(self):
+        with self._lock:
+            self.stats["skipped"] += 1
+
+    def record_miss(self):
+        """질문 임베딩 없이 miss로 확정된 조회 (저장된 답변 없음)"""
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["misses"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["documents"] = len(self._docs)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 싱글톤
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = SemanticAnswerCache()
+        return _CACHE
@@ -0,0 +1,207 @@
+# src/rag/context_packer.py
+'''
+토큰 예산 기반 Context 구성 (TextRAG용)
+
+기존: 검색된 문서의 content 전체를 그대로 이어 붙여 프롬프트에 넣음 -> 긴 보고서면 프롬프트 크기 / 비용 / 지연이 급증
+변경:
+    1. 문서를 passage(OCR 줄 몇 개 묶음)로 나눔 (PASSAGE_TOKENS보다 긴 줄은 단어 / 글자 단위로 다시 자름)
+    2. 질문과의 lexical overlap(BM25식 점수, 한글은 글자 bigram까지 사용)으로 passage 점수 계산 (로컬, 네트워크 없음)
+    3. 다른 passage와 거의 같은 내용(중복 양식 문구 등)은 제외
+    4. 점수 순으로 CONTEXT_TOKEN_BUDGET까지 채움 (문서마다 최소 1개는 우선 포함 -> 출처 유지)
+       문서별 최고점 passage가 남은 예산의 균등 몫보다 길면 잘라서 포함 (문서 / 머리말이 빠지지 않도록)
+    5. 문서별로 원래 순서대로 다시 정렬해서 "문서 i (파일명: ...)" 형식으로 출력
+'''
+import os
+import re
+import math
+from collections import Counter
+
+from src.rag.lexical_index import tokenize
+
+# 설정 (환경변수로 덮어쓰기 가능)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+PASSAGE_TOKENS = 120            # passage 하나의 대략적인 최대 토큰 수
+DEDUPE_JACCARD = 0.8            # 토큰 집합 Jaccard가 이 이상이면 중복으로 판단
+BM25_K1, BM25_B = 1.2, 0.75
+# 질문과 겹치는 단어가 없을 때 앞부분 passage를 조금 우선 (문서 제목 / 요약이 보통 앞에 있음)
+POSITION_PRIOR = 0.05
+# 잘라서라도 넣을 때 본문에 최소한 남길 토큰 수 (이보다 적게 남으면 해당 문서 생략)
+MIN_TRUNCATED_TOKENS = 8
+
+_HANGUL_RE = re.compile(r"[가-힣]")
+_SEPARATOR = " ... "
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 대략적인 토큰 수 (영문/숫자 약 4글자, 한글 약 1.5글자당 1토큰)"""
+    hangul = len(_HANGUL_RE.findall(text))
+    return int(math.ceil(hangul / 1.5 + (len(text) - hangul) / 4))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """estimate_tokens 기준 max_tokens 이하가 되는 가장 긴 앞부분 (가능하면 단어 경계에서 자름)"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    if space > lo // 2:
+        cut = cut[:space]
+    return cut.rstrip()
+
+
+def _split_unit(unit: str, max_tokens: int) -> list:
+    """max_tokens보다 긴 줄을 단어 단위로 묶어서 나눔 (단어 하나가 더 길면 글자 단위로 자름)"""
+    if estimate_tokens(unit) <= max_tokens:
+        return [unit]
+    pieces = []
+    rest = unit
+    while rest:
+        piece = truncate_to_tokens(rest, max_tokens)
+        if not piece:
+            # 앞부분이 공백뿐인 경우 등 -> 글자 단위로라도 진행
+            piece = rest[:max(1, max_tokens)]
+        pieces.append(piece)
+        rest = rest[len(piece):].lstrip()
+    return pieces
+
+
+def _features(text: str) -> list:
+    """단어 토큰 + 한글 단어의 글자 bigram (조사가 붙어도 '예산은' / '예산' 이 겹치도록)"""
+    features = []
+    for token in tokenize(text):
+        features.append(token)
+        if _HANGUL_RE.search(token) and len(token) > 2:
+            features.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return features
+
+
+def split_passages(doc: dict, max_tokens: int = PASSAGE_TOKENS) -> list:
+    """
+    OCR 줄(lines)이 있으면 줄 단위, 없으면 content의 줄바꿈 / 문장 단위로 나눈 뒤 max_tokens까지 묶음
+    Returns: [passage 문자열]
+    """
+    lines = doc.get("lines")
+    if lines:
+        units = [line.get("text", "") if isinstance(line, dict) else str(line) for line in lines]
+    else:
+        content = doc.get("content") or doc.get("text") or ""
+        units = re.split(r"\n+|(?<=[.!?。])\s+", content)
+    units = [piece for u in units if u and u.strip() for piece in _split_unit(u.strip(), max_tokens)]
+
+    passages, current = [], []
+    for unit in units:
+        if current and estimate_tokens(" ".join(current + [unit])) > max_tokens:
+            passages.append(" ".join(current))
+            current = []
+        current.append(unit)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _source(doc: dict) -> str:
+    metadata = doc.get("metadata") or {}
+    return metadata.get("source") or metadata.get("filename") or os.path.basename(metadata.get("file_path", "")) or "Unknown"
+
+
+def _header(doc_idx: int, doc: dict) -> str:
+    return f"문서 {doc_idx + 1} (파일명: {_source(doc)}):\n"
+
+
+def pack_context(query: str, docs: list, budget: int = CONTEXT_TOKEN_BUDGET) -> dict:
+    """
+    Returns: {"context": 프롬프트에 넣을 문자열, "original_tokens", "packed_tokens",
+              "passages": 선택된 passage 수, "total_passages", "dropped_duplicates"}
+    """
+    # 1. passage 분할
+    passages = []   # (doc_idx, 위치, 텍스트, features)
+    original_tokens = 0
+    for doc_idx, doc in enumerate(docs):
+        for pos, text in enumerate(split_passages(doc)):
+            original_tokens += estimate_tokens(text)
+            passages.append((doc_idx, pos, text, _features(text)))
+
+    # 2. BM25식 점수 (idf는 이번 후보 passage 집합 기준)
+    query_terms = set(_features(query))
+    n = len(passages) or 1
+    avg_len = sum(len(p[3]) for p in passages) / n or 1.0
+    df = Counter(term for p in passages for term in set(p[3]) & query_terms)
+    scores = []
+    for doc_idx, pos, text, features in passages:
+        tf = Counter(f for f in features if f in query_terms)
+        score = 0.0
+        for term, freq in tf.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * (1 - BM25_B + BM25_B * len(features) / avg_len))
+        score += POSITION_PRIOR / (1 + pos)
+        scores.append(score)
+
+    # 3. 선택 순서: 문서별 최고점 passage 먼저 (출처 유지), 나머지는 점수순
+    order = sorted(range(len(passages)), key=lambda i: -scores[i])
+    best_per_doc = {}
+    for i in order:
+        best_per_doc.setdefault(passages[i][0], i)
+    first = sorted(best_per_doc.values(), key=lambda i: -scores[i])
+    first_set = set(first)
+    order = first + [i for i in order if i not in first_set]
+
+    # 4. 예산까지 채우기 (중복 제외)
+    selected, selected_sets, selected_docs, used, dropped = [], [], set(), 0, 0
+    texts = {}             # 잘라서 넣은 passage -> 잘린 텍스트
+    first_left = len(first)
+    for i in order:
+        text, token_set = passages[i][2], set(passages[i][3])
+        is_first = i in first_set
+        if is_first:
+            first_left -= 1
+        if any(len(token_set & s) / max(len(token_set | s), 1) >= DEDUPE_JACCARD for s in selected_sets):
+            dropped += 1
+            continue
+        # 문서의 첫 passage면 "문서 i (파일명: ...)" 머리말, 아니면 구분자 비용 포함
+        doc_idx = passages[i][0]
+        if doc_idx in selected_docs:
+            tokens = estimate_tokens(_SEPARATOR + text)
+        else:
+            header_tokens = estimate_tokens(_header(doc_idx, docs[doc_idx])) + 1
+            tokens = estimate_tokens(_header(doc_idx, docs[doc_idx]) + text) + 1
+            # 문서별 최고점 passage: 아직 처리하지 않은 문서 몫을 남기고 넘치면 잘라서 포함
+            share = (budget - used) // (first_left + 1) if is_first else budget - used
+            if tokens > share:
+                room = share - header_tokens
+                if room < MIN_TRUNCATED_TOKENS:
+                    continue
+                texts[i] = truncate_to_tokens(text, room)
+                tokens = estimate_tokens(_header(doc_idx, docs[doc_idx]) + texts[i]) + 1
+        if used + tokens > budget:
+            continue
+        selected_docs.add(doc_idx)
+        selected.append(i)
+        selected_sets.append(token_set)
+        used += tokens
+
+    # 5. 문서별 원래 순서로 출력
+    by_doc = {}
+    for i in selected:
+        by_doc.setdefault(passages[i][0], []).append(i)
+    parts = []
+    for doc_idx in sorted(by_doc):
+        doc_texts = [texts.get(i, passages[i][2]) for i in sorted(by_doc[doc_idx], key=lambda i: passages[i][1])]
+        parts.append(_header(doc_idx, docs[doc_idx]) + _SEPARATOR.join(doc_texts))
+
+    context = "\n\n".join(parts)
+    return {
+        "context": context,
+        "original_tokens": original_tokens,
+        "packed_tokens": estimate_tokens(context),
+        "passages": len(selected),
+        "total_passages": len(passages),
+        "dropped_duplicates": dropped,
+        "truncated": len(texts),
+    }
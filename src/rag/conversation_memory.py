@@ -0,0 +1,138 @@
+# src/rag/conversation_memory.py
+'''
+세션별 대화 메모리 (최근 턴 원문 + 오래된 턴 요약)
+
+기존: session["history"]에 "User: ..." / "AI: ..." 원문을 계속 쌓고 마지막 6개를 그대로 프롬프트에 넣음
+      -> 긴 AI 답변 하나가 이후 모든 요청의 프롬프트를 키움, 6개 이전 대화는 완전히 잊어버림
+변경:
+    1. 최근 MEMORY_RECENT_TURNS 턴만 원문 유지 (AI 답변은 턴당 TURN_MAX_TOKENS로 자름)
+    2. 밀려난 오래된 턴은 "요약 대기"로 옮기고, 요청이 끝난 뒤 백그라운드에서 Gemini로 누적 요약 갱신
+       (요청 경로에서는 기다리지 않음, 요약이 끝나기 전까지는 대기 턴을 짧게 잘라서 사용)
+    3. 요약 + 대기 턴 + 최근 턴 전체를 세션당 MEMORY_TOKEN_BUDGET 안으로 유지
+    4. 요약 실패 시 대기 턴 앞부분을 이어 붙인 간단한 요약으로 대체
+'''
+import os
+import asyncio
+
+from src.rag.context_packer import estimate_tokens
+from src.rag.prompts import CONVERSATION_SUMMARY_PROMPT
+
+# 설정 (환경변수로 덮어쓰기 가능)
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "800"))   # 프롬프트에 넣는 대화 내역 전체 상한
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))     # 원문으로 유지할 최근 턴 수
+TURN_MAX_TOKENS = 200           # 최근 턴의 AI 답변 최대 길이
+PENDING_MAX_TOKENS = 60         # 요약 전 대기 턴은 더 짧게
+SUMMARY_MAX_TOKENS = 250
+SUMMARY_TIMEOUT = 20.0
+# 예산 중 최근 턴 원문이 쓸 수 있는 비율 (나머지는 요약 / 대기 턴)
+RECENT_BUDGET_RATIO = 0.6
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """추정 토큰 수가 max_tokens를 넘으면 앞부분만 남김"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:max(1, int(len(text) * max_tokens / tokens))].rstrip() + "…"
+
+
+class ConversationMemory:
+    """
+    Args:
+        token_budget: messages()가 반환하는 대화 내역 전체의 토큰 상한
+        recent_turns: 원문으로 유지할 최근 턴 수
+        llm: 요약용 AsyncGeminiClient (None이면 첫 요약 때 공유 클라이언트 사용)
+    """
+    def __init__(self, token_budget: int = MEMORY_TOKEN_BUDGET, recent_turns: int = MEMORY_RECENT_TURNS, llm=None):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.llm = llm
+        self.summary = ""
+        self.turns = []       # 최근 턴 [(user, ai)]
+        self.pending = []     # 요약 대기 중인 오래된 턴
+        self._task = None
+        self.stats = {"turns": 0, "summaries": 0, "summary_failures": 0}
+
+    # 1. 기록
+    def add_turn(self, user: str, ai: str):
+        self.turns.append((user, ai))
+        self.stats["turns"] += 1
+        # 최근 턴 수 / 토큰 예산을 넘으면 오래된 턴부터 요약 대기로 이동
+        while len(self.turns) > self.recent_turns or (
+                len(self.turns) > 1 and self._tokens(self._recent_lines()) > self.token_budget * RECENT_BUDGET_RATIO):
+            self.pending.append(self.turns.pop(0))
+
+    # 2. 프롬프트용 대화 내역 (기존 history 리스트 형식)
+    def _recent_lines(self) -> list:
+        lines = []
+        for user, ai in self.turns:
+            lines.append(f"User: {user}")
+            lines.append(f"AI: {clip_tokens(ai, TURN_MAX_TOKENS)}")
+        return lines
+
+    def _pending_lines(self) -> list:
+        lines = []
+        for user, ai in self.pending:
+            lines.append(f"User: {clip_tokens(user, PENDING_MAX_TOKENS)}")
+            lines.append(f"AI: {clip_tokens(ai, PENDING_MAX_TOKENS)}")
+        return lines
+
+    @staticmethod
+    def _tokens(lines: list) -> int:
+        return sum(estimate_tokens(line) for line in lines)
+
+    def messages(self) -> list:
+        """
+        ["[이전 대화 요약] ...", "User: ...", "AI: ...", ...]
+        예산을 넘으면 요약 대기 턴(오래된 것부터) -> 요약 순으로 줄임
+        """
+        summary = [f"[이전 대화 요약] {self.summary}"] if self.summary else []
+        pending = self._pending_lines()
+        recent = self._recent_lines()
+
+        while pending and self._tokens(summary + pending + recent) > self.token_budget:
+            pending = pending[2:]
+        if summary and self._tokens(summary + recent) > self.token_budget:
+            remaining = max(self.token_budget - self._tokens(recent), 0)
+            summary = [clip_tokens(summary[0], remaining)] if remaining > 20 else []
+        return summary + pending + recent
+
+    def __len__(self):
+        return len(self.turns) + len(self.pending)
+
+    def __bool__(self):
+        return bool(self.turns or self.pending or self.summary)
+
+    # 3. 백그라운드 요약
+    def schedule_summary(self):
+        """요약 대기 턴이 있으면 이벤트 루프에 요약 작업 등록 (이미 실행 중이면 생략)"""
+        if not self.pending or (self._task is not None and not self._task.done()):
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._summarize())
+        except RuntimeError:
+            # 이벤트 루프 밖(스크립트 등)에서는 요약 없이 대기 턴 유지
+            pass
+
+    async def _summarize(self):
+        batch = list(self.pending)
+        turns_text = "\n".join(f"User: {user}\nAI: {clip_tokens(ai, TURN_MAX_TOKENS * 2)}" for user, ai in batch)
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(summary=self.summary or "(없음)", turns=turns_text)
+        try:
+            if self.llm is None:
+                from src.core.llm import get_async_llm
+                self.llm = get_async_llm()
+            summary = (await self.llm.generate(prompt, timeout=SUMMARY_TIMEOUT)).strip()
+            self.stats["summaries"] += 1
+        except Exception as e:
+            print(f"⚠️ [Memory] 대화 요약 실패 (간단 요약 사용): {e}")
+            self.stats["summary_failures"] += 1
+            summary = " / ".join([self.summary] * bool(self.summary) +
+                                 [clip_tokens(user, PENDING_MAX_TOKENS // 2) for user, _ in batch])
+
+        self.summary = clip_tokens(summary, SUMMARY_MAX_TOKENS)
+        # 요약하는 동안 새로 밀려난 턴은 남겨두고 다음 요약에서 처리
+        del self.pending[:len(batch)]
+        self._task = None
+        if self.pending:
+            self.schedule_summary()
@@ -0,0 +1,462 @@
+# src/rag/lexical_index.py
+'''
+BM25 역색인 (In-process Inverted Index)
+
+Dense 검색(Gemini 임베딩)은 청구서 번호, 이름, 금액처럼 "정확히 일치해야 하는" 질의에 약함
+-> OCR full_text에 대한 BM25 어휘 검색을 함께 돌리고, RRF로 두 결과를 합침
+
+Postings 구조 (메모리 절약 + 벡터 연산용)
+    vocab:      term -> term_id
+    offsets:    int64[n_terms + 1]   term_id의 postings 구간 = [offsets[t], offsets[t+1])
+    doc_idx:    int32[n_postings]    문서 번호 (term 순으로 정렬)
+    tf:         uint16[n_postings]   term frequency
+    doc_len:    int32[n_docs]
+    impact:     float16[n_postings]  tf와 문서 길이로 미리 계산한 BM25 term 가중치 (idf 제외)
+
+
+- add()로 들어온 문서는 작은 버퍼에 쌓였다가 commit() 시 압축 배열에 병합 (증분 색인)
+- 같은 doc id를 다시 add()하면 이전 버전은 삭제 처리, 삭제 비율이 COMPACT_DELETED_RATIO를 넘으면
+  commit() 시 postings에서 완전히 제거 (idf / 평균 문서 길이는 삭제된 문서를 빼고 계산)
+- 질의 시 희귀 term부터 postings를 numpy로 누적하고, 남은 term들의 점수 상한으로는
+  top-k에 들 수 없는 시점부터는 이미 후보인 문서만 이진 탐색으로 갱신 (MaxScore, 결과는 정확함)
+- postings가 HEAVY_MIN_POSTINGS 이상인 흔한 term은 먼저 champion list(impact 상위 CHAMPION_SIZE개 문서)만
+  후보로 점수를 계산하고, champion list 밖 문서의 점수 상한이 k번째 점수 이하면 그대로 반환
+  아니면 상한 합이 k번째 점수 이하인 term은 건너뛰고 나머지 term의 postings만 누적 (MaxScore)
+  -> 모두 상한으로만 건너뛰므로 결과는 전체 계산과 같음 (동점 순서만 다를 수 있음)
+'''
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+# 기본 저장 위치 (ingest 시 생성, Retriever가 로드)
+LEXICAL_INDEX_PATH = "./chroma_db/bm25_index.npz"
+# 증분 색인 시 이 개수만큼 쌓일 때마다 postings 병합
+COMMIT_EVERY = 50000
+# 삭제된 문서 비율이 이 이상이면 commit 시 postings 압축 (문서 번호 재배치)
+COMPACT_DELETED_RATIO = 0.2
+# postings가 이 이상인 흔한 term은 champion list만 후보로 사용
+HEAVY_MIN_POSTINGS = 16384
+CHAMPION_SIZE = 4096
+
+_TOKEN_RE = re.compile(r"[0-9a-z가-힣]+(?:[-_./][0-9a-z가-힣]+)*")
+
+
+def tokenize(text: str) -> list:
+    """
+    소문자 + 영숫자/한글 토큰
+    'INV-2023-0042' 같은 식별자는 통째 토큰과 조각 토큰을 모두 만들어서
+    전체 번호로 검색해도, 일부만 검색해도 걸리도록 합니다.
+    """
+    tokens = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        tokens.append(match)
+        parts = re.split(r"[-_./]", match)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Args:
+        k1, b: BM25 파라미터
+        champion_size: 흔한 term별로 후보로 쓰는 impact 상위 문서 수
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75, champion_size: int = CHAMPION_SIZE):
+        self.k1 = k1
+        self.b = b
+        self.champion_size = champion_size
+
+        self.vocab = {}
+        self.doc_ids = []                 # 내부 번호 -> doc id
+        self.labels = []                  # 내부 번호 -> 라벨 (라벨 필터용)
+        self._doc_pos = {}                # doc id -> 내부 번호
+        self._label_masks = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_idx = np.zeros(0, dtype=np.int32)
+        self.tf = np.zeros(0, dtype=np.uint16)
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.impact = np.zeros(0, dtype=np.float16)
+        self.max_impact = np.zeros(0, dtype=np.float32)  # term별 impact 최대값 (점수 상한 계산용)
+        self.df = np.zeros(0, dtype=np.int64)            # term별 (삭제되지 않은) 문서 수
+        self.n_live = 0                                  # 삭제되지 않은 문서 수
+
+        # champion list (흔한 term만): term_id -> row, row별 impact 상위 문서(doc 번호순) / 목록 밖 최대 impact
+        self.champion_rows = {}
+        self.champion_docs = np.zeros((0, champion_size), dtype=np.int32)
+        self.champion_floor = np.zeros(0, dtype=np.float32)
+
+        self._pending = {}                # doc 번호 -> Counter (commit 전 버퍼)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_len) - int(self.deleted.sum()) + len(self._pending)
+
+    # 1. 색인
+    def add(self, doc_id: str, text: str, label: str = None):
+        """
+        문서를 추가합니다. 같은 doc id가 이미 있으면 기존 문서는 삭제 처리 후 새로 추가합니다.
+        검색에 반영하려면 commit()을 호출해야 합니다.
+        """
+        counts = Counter(tokenize(text or ""))
+        with self._lock:
+            old = self._doc_pos.get(doc_id)
+            if old is not None:
+                if old < len(self.deleted):
+                    self.deleted[old] = True
+                else:
+                    # 아직 commit 전인 이전 버전은 버퍼에서 제거 (같은 id가 두 번 색인되지 않도록)
+                    self._pending.pop(old, None)
+
+            pos = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.labels.append(label or "")
+            self._doc_pos[doc_id] = pos
+            self._pending[pos] = counts
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def commit(self):
+        """버퍼에 쌓인 문서를 압축 postings 배열에 병합합니다. (삭제가 많으면 압축까지)"""
+        with self._lock:
+            base = len(self.doc_len)
+            n_new = len(self.doc_ids) - base
+            if not n_new:
+                return
+
+            # 새 term 등록
+            for counts in self._pending.values():
+                for term in counts:
+                    if term not in self.vocab:
+                        self.vocab[term] = len(self.vocab)
+            n_terms = len(self.vocab)
+
+            # 버퍼 -> (term_id, doc, tf) 배열 (버퍼에서 빠진 번호는 삭제된 빈 문서로 남김)
+            new_terms, new_docs, new_tf = [], [], []
+            new_len = np.zeros(n_new, dtype=np.int32)
+            new_deleted = np.ones(n_new, dtype=bool)
+            for pos, counts in self._pending.items():
+                new_len[pos - base] = sum(counts.values())
+                new_deleted[pos - base] = False
+                for term, count in counts.items():
+                    new_terms.append(self.vocab[term])
+                    new_docs.append(pos)
+                    new_tf.append(min(count, 65535))
+
+            # 기존 postings를 (term_id, doc, tf)로 펼친 뒤 합쳐서 term 순으로 재정렬
+            old_counts = np.diff(self.offsets)
+            old_terms = np.repeat(np.arange(len(old_counts), dtype=np.int64), old_counts)
+            terms = np.concatenate([old_terms, np.asarray(new_terms, dtype=np.int64)])
+            docs = np.concatenate([self.doc_idx, np.asarray(new_docs, dtype=np.int32)])
+            tfs = np.concatenate([self.tf, np.asarray(new_tf, dtype=np.uint16)])
+
+            order = np.lexsort((docs, terms))
+            self.doc_idx = docs[order]
+            self.tf = tfs[order]
+            self.offsets = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=n_terms), out=self.offsets[1:])
+
+            self.doc_len = np.concatenate([self.doc_len, new_len])
+            self.deleted = np.concatenate([self.deleted, new_deleted])
+            self._pending = {}
+            if self.deleted.mean() >= COMPACT_DELETED_RATIO:
+                self._compact()
+            self._label_masks = {}
+            self._refresh_stats()
+
+    def _compact(self):
+        """삭제된 문서의 postings를 제거하고 문서 번호를 앞으로 당김 (term 안의 문서 순서는 유지)"""
+        keep = ~self.deleted
+        new_pos = (np.cumsum(keep) - 1).astype(np.int32)
+        posting_keep = keep[self.doc_idx]
+
+        counts = np.zeros(len(self.offsets) - 1, dtype=np.int64)
+        nonempty = np.flatnonzero(np.diff(self.offsets))
+        if len(nonempty):
+            counts[nonempty] = np.add.reduceat(posting_keep.astype(np.int64), self.offsets[nonempty])
+        self.offsets = np.zeros_like(self.offsets)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.doc_idx = new_pos[self.doc_idx[posting_keep]]
+        self.tf = self.tf[posting_keep]
+
+        kept = np.flatnonzero(keep)
+        self.doc_ids = [self.doc_ids[i] for i in kept]
+        self.labels = [self.labels[i] for i in kept]
+        self.doc_len = self.doc_len[keep]
+        self.deleted = np.zeros(len(kept), dtype=bool)
+        self._doc_pos = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+    def _refresh_stats(self):
+        # idf / 평균 문서 길이는 삭제되지 않은 문서 기준
+        live = ~self.deleted
+        self.n_live = int(live.sum())
+        avg_len = float(self.doc_len[live].mean()) if self.n_live else 1.0
+        counts = np.diff(self.offsets)
+        nonempty = np.flatnonzero(counts)
+        if live.all():
+            self.df = counts.astype(np.int64)
+        else:
+            self.df = np.zeros(len(counts), dtype=np.int64)
+            if len(nonempty):
+                self.df[nonempty] = np.add.reduceat(live[self.doc_idx].astype(np.int64), self.offsets[nonempty])
+
+        # impact = tf * (k1 + 1) / (tf + k1 * (1 - b + b * |d| / avgdl)) : 질의와 무관하므로 미리 계산
+        norm = self.k1 * (1.0 - self.b + self.b * self.doc_len / max(avg_len, 1.0))
+        tf = self.tf.astype(np.float32)
+        self.impact = (tf * (self.k1 + 1.0) / (tf + norm[self.doc_idx])).astype(np.float16)
+
+        self.max_impact = np.zeros(len(counts), dtype=np.float32)
+        if len(nonempty):
+            self.max_impact[nonempty] = np.maximum.reduceat(self.impact, self.offsets[nonempty]).astype(np.float32)
+        self._build_champions(counts)
+
+    def _build_champions(self, counts):
+        # 흔한 term만 impact 상위 champion_size개 문서와, 그 밖의 postings 중 최대 impact를 저장
+        heavy = np.flatnonzero(counts >= max(HEAVY_MIN_POSTINGS, self.champion_size + 1))
+        self.champion_rows = {int(t): row for row, t in enumerate(heavy)}
+        self.champion_docs = np.zeros((len(heavy), self.champion_size), dtype=np.int32)
+        self.champion_floor = np.zeros(len(heavy), dtype=np.float32)
+        for row, t in enumerate(heavy):
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            impact = self.impact[lo:hi]
+            top = np.argpartition(-impact, self.champion_size)
+            self.champion_docs[row] = np.sort(self.doc_idx[lo:hi][top[:self.champion_size]])
+            self.champion_floor[row] = impact[top[self.champion_size]]
+
+    # 2. 검색
+    def search(self, query: str, top_k: int = 10, allowed: np.ndarray = None) -> list:
+        """
+        Args:
+            allowed: (선택) 검색 대상 문서 마스크 bool[n_docs] (라벨 필터 등)
+        Returns:
+            [(doc_id, score), ...] 점수 내림차순
+        """
+        n_docs = len(self.doc_len)
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or self.n_live == 0 or top_k <= 0:
+            return []
+
+        # 희귀 term(짧은 postings)부터 처리 -> champion list 대상인 흔한 term은 항상 마지막
+        terms = sorted(term_ids, key=lambda t: self.offsets[t + 1] - self.offsets[t])
+        dfs = self.df[terms].astype(np.float64)
+        idfs = np.log(1.0 + (self.n_live - dfs + 0.5) / (dfs + 0.5)).astype(np.float32)
+        upper = idfs * self.max_impact[terms]
+        # remaining[i] = i번째 이후 term들로 얻을 수 있는 점수 상한
+        remaining = np.concatenate([np.cumsum(upper[::-1])[::-1], [0.0]])
+        n_light = sum(t not in self.champion_rows for t in terms)
+
+        cand = np.zeros(0, dtype=np.int32)
+        cand_scores = np.zeros(0, dtype=np.float32)
+        dense = None   # 후보가 많아지면 n_docs 크기 점수 배열로 전환
+
+        for i in range(n_light):
+            t = terms[i]
+            # MaxScore: 아직 안 나온 문서가 남은 term을 다 더해도 현재 k번째 점수를 못 넘으면 후보만 갱신
+            if i and remaining[i] < remaining[0] - remaining[i]:
+                if dense is not None:
+                    cand = np.flatnonzero(dense)
+                    cand_scores = dense[cand]
+                    dense = None
+                cand, cand_scores = self._valid(cand, cand_scores, allowed)
+
+                if len(cand) >= top_k:
+                    kth = len(cand) - top_k
+                    if remaining[i] < np.partition(cand_scores, kth)[kth]:
+                        for j in range(i, len(terms)):
+                            self._score_candidates(cand, cand_scores, terms[j], idfs[j])
+                        return self._top_k(cand, cand_scores, top_k)
+
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            docs, contrib = self.doc_idx[lo:hi], idfs[i] * self.impact[lo:hi].astype(np.float32)
+
+            # 첫 term은 postings 자체를 후보/점수로 사용
+            if i == 0:
+                cand, cand_scores = docs, contrib
+                continue
+
+            # 후보가 적으면 정렬 병합, 많으면 n_docs 크기 배열에 누적
+            if dense is None and (len(cand) + len(docs)) * 16 < n_docs:
+                merged, inverse = np.unique(np.concatenate([cand, docs]), return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, contrib]),
+                                          minlength=len(merged)).astype(np.float32)
+                cand = merged
+                continue
+
+            if dense is None:
+                dense = np.zeros(n_docs, dtype=np.float32)
+                dense[cand] = cand_scores
+            # 한 term 안에서 doc은 중복되지 않으므로 fancy-index 누적이 안전함
+            dense[docs] += contrib
+
+        if dense is not None:
+            # 매칭된 문서 = 점수가 0보다 큰 문서 (impact는 항상 양수)
+            cand = np.flatnonzero(dense)
+            cand_scores = dense[cand]
+        cand, cand_scores = self._valid(cand, cand_scores, allowed)
+        if n_light == len(terms):
+            return self._top_k(cand, cand_scores, top_k)
+
+
+        # 흔한 term만으로 나올 수 있는 점수가 현재 k번째 점수보다 작으면 후보만 갱신 (MaxScore)
+        if len(cand) >= top_k and remaining[n_light] < np.partition(cand_scores, len(cand) - top_k)[len(cand) - top_k]:
+            for j in range(n_light, len(terms)):
+                self._score_candidates(cand, cand_scores, terms[j], idfs[j])
+            return self._top_k(cand, cand_scores, top_k)
+        return self._search_common(cand, cand_scores, terms[n_light:], idfs[n_light:], top_k, allowed)
+
+    def _search_common(self, cand, cand_scores, terms, idfs, top_k, allowed):
+        """
+        흔한 term 처리
+        1. 기존 후보 + 각 term의 champion list 문서를 후보로 모으고, 흔한 term 점수는 이진 탐색으로 더함
+        2. 어느 champion list에도 없는 문서의 점수 상한 = Σ idf * champion_floor
+           -> k번째 점수가 상한 이상이면 그대로 반환
+        3. 아니면 champion list 밖 문서를 찾되, 상한이 작은 term부터 합이 k번째 점수 이하인 term들로만
+           매칭되는 문서는 top-k에 들 수 없으므로 나머지 term의 postings만 누적
+        """
+        rows = [self.champion_rows[t] for t in terms]
+        champions = np.unique(self.champion_docs[rows])
+        new = np.setdiff1d(champions, cand, assume_unique=True)
+        new, _ = self._valid(new, new, allowed)
+
+        # 이진 탐색은 문서 번호순으로 해야 캐시 효율이 좋음
+        docs = np.concatenate([cand, new])
+        order = np.argsort(docs, kind="stable")
+        docs = docs[order]
+        scores = np.concatenate([cand_scores, np.zeros(len(new), dtype=np.float32)])[order]
+        for t, idf in zip(terms, idfs):
+            self._score_candidates(docs, scores, t, idf)
+
+        limits = idfs * self.champion_floor[rows]
+        best = self._kth_pool(scores, top_k)
+        threshold = float(best.min()) if len(best) >= top_k else 0.0
+        if len(best) >= top_k and threshold >= limits.sum():
+            return self._top_k(docs, scores, top_k)
+
+        order = np.argsort(limits, kind="stable")
+        n_skip = int(np.searchsorted(np.cumsum(limits[order]), threshold, side="right"))
+        dense = np.zeros(len(self.doc_len), dtype=np.float32)
+        for j in order[n_skip:]:
+            lo, hi = self.offsets[terms[j]], self.offsets[terms[j] + 1]
+            dense[self.doc_idx[lo:hi]] += idfs[j] * self.impact[lo:hi].astype(np.float32)
+        dense[docs] = 0.0   # 이미 점수를 계산한 문서 제외
+
+        # 건너뛴 term 점수를 최대로 더해도 k번째 점수를 못 넘는 문서는 바로 제외
+        skipped_limit = float(limits[order[:n_skip]].sum())
+        found = np.flatnonzero(dense > threshold - skipped_limit)
+        found, _ = self._valid(found, found, allowed)
+
+        # 건너뛴 term 점수: 찾은 문서가 postings에 비해 많으면 이진 탐색보다 그대로 누적하는 편이 빠름
+        searched = []
+        for j in order[:n_skip]:
+            lo, hi = self.offsets[terms[j]], self.offsets[terms[j] + 1]
+            if len(found) * 16 > hi - lo:
+                dense[self.doc_idx[lo:hi]] += idfs[j] * self.impact[lo:hi].astype(np.float32)
+            else:
+                searched.append(j)
+        found_scores = dense[found]
+        for j in searched:
+            self._score_candidates(found, found_scores, terms[j], idfs[j])
+        return self._top_k(np.concatenate([docs, found]), np.concatenate([scores, found_scores]), top_k)
+
+    @staticmethod
+    def _kth_pool(scores, top_k):
+        # 점수 상위 top_k개 (순서 무관)
+        if len(scores) <= top_k:
+            return scores
+        return np.partition(scores, len(scores) - top_k)[-top_k:]
+
+    def _valid(self, cand, cand_scores, allowed):
+        keep = ~self.deleted[cand]
+        if allowed is not None:
+            keep &= allowed[cand]
+        if keep.all():
+            return cand, cand_scores
+        return cand[keep], cand_scores[keep]
+
+    def _score_candidates(self, cand, cand_scores, t, idf):
+        lo, hi = self.offsets[t], self.offsets[t + 1]
+        postings = self.doc_idx[lo:hi]   # term 안에서 doc 번호 오름차순
+        if not len(postings) or not len(cand):
+            return
+        # dtype이 다르면 numpy가 postings 전체를 변환하므로 질의 쪽을 맞춤
+        pos = np.searchsorted(postings, cand.astype(postings.dtype, copy=False))
+        pos[pos == len(postings)] = 0
+        hit = postings[pos] == cand
+        cand_scores[hit] += idf * self.impact[lo:hi][pos[hit]]
+
+    def _top_k(self, cand, cand_scores, top_k):
+        if len(cand) == 0:
+            return []
+        order = np.arange(len(cand))
+        if len(cand) > top_k:
+            order = np.argpartition(-cand_scores, top_k - 1)[:top_k]
+        order = order[np.argsort(-cand_scores[order], kind="stable")]
+        return [(self.doc_ids[cand[i]], float(cand_scores[i])) for i in order]
+
+    def label_mask(self, label: str) -> np.ndarray:
+        """라벨 -> 검색 허용 마스크 (라벨별로 캐시)"""
+        mask = self._label_masks.get(label)
+        if mask is None or len(mask) != len(self.doc_len):
+            mask = np.array(self.labels[:len(self.doc_len)], dtype=object) == label
+            self._label_masks[label] = mask
+        return mask
+
+    # 3. 저장 / 로드
+    def save(self, path: str):
+        self.commit()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            terms = sorted(self.vocab, key=self.vocab.get)
+            np.savez(
+                path,
+                terms=np.array(terms, dtype=str),
+                doc_ids=np.array(self.doc_ids, dtype=str),
+                labels=np.array(self.labels, dtype=str),
+                offsets=self.offsets,
+                doc_idx=self.doc_idx,
+                tf=self.tf,
+                doc_len=self.doc_len,
+                deleted=self.deleted,
+                params=np.array([self.k1, self.b], dtype=np.float64),
+            )
+
+    @classmethod
+    def load_or_create(cls, path: str = LEXICAL_INDEX_PATH):
+        return cls.load(path) if os.path.exists(path) else cls()
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        k1, b = data["params"].tolist()
+        index = cls(k1=k1, b=b)
+        index.vocab = {t: i for i, t in enumerate(data["terms"].tolist())}
+        index.doc_ids = data["doc_ids"].tolist()
+        index.labels = data["labels"].tolist()
+        index.offsets = data["offsets"]
+        index.doc_idx = data["doc_idx"]
+        index.tf = data["tf"]
+        index.doc_len = data["doc_len"]
+        index.deleted = data["deleted"]
+        # 삭제되지 않은(가장 최근) 위치만 매핑
+        index._doc_pos = {d: i for i, d in enumerate(index.doc_ids)}
+        index._refresh_stats()
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """
+    여러 검색 결과 순위를 RRF로 합칩니다.
+    rankings: [[doc_id, ...], [doc_id, ...]] (각각 순위 순)
+    Returns: [(doc_id, rrf_score), ...] 점수 내림차순
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
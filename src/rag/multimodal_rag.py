@@ -1,61 +1,236 @@
 #src/rag/multimodal_rag.py
 import os
 import re
+import time
+import asyncio
 from PIL import Image
+from google.genai import types
 
-from src.core.llm import GeminiClient
+from src.core.llm import GeminiClient, get_async_llm, LLM_ERROR_MESSAGE
 from src.rag.retriever import Retriever
 from src.rag.text_rag import TextRAG
 from src.rag.prompts import VISION_RAG_PROMPT
+from src.rag.reranker import RERANK_MODE, is_dominant, get_reranker
+from src.utils.path_index import get_path_index
+from src.utils.image_prep import IMAGE_PREP_ENABLED, IMAGE_CROP_TO_TEXT, get_image_cache, ocr_text_boxes
+from src.rag.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _history_text(history: list) -> str:
+    if not history:
+        return ""
+    return "이전 대화 내역:\n" + "\n".join(history) + "\n\n"
 
-# Docker / Local 데이터 경로
-DOCKER_DATA_DIR = "/app/data"
-LOCAL_DATA_DIR = "./data"
 
 class MultimodalRAG:
     def __init__(self):
         self.llm = GeminiClient()
+        # 비동기 경로(/chat)용: 공유 연결 풀 + deadline + 재시도 / hedging
+        self.async_llm = get_async_llm()
         self.retriever = Retriever()
+        # 파일명 -> 경로 인덱스 (/app/data, ./data), 시작 시 한 번 로드
+        self.path_index = get_path_index()
+        # (문서, 질문 임베딩) -> 답변 캐시
+        self.answer_cache = get_answer_cache()
 
     def answer(self, query: str, category: str = None, 
-               history: list = None, target_file_path: str = None):
+               history: list = None, target_file_path: str = None,
+               mmr: bool = False, mmr_lambda: float = 0.5,
+               candidates: list = None, timings: dict = None):
+        """
+        mmr: True면 검색 후보를 다양하게 뽑아서(같은 양식 문서 중복 방지) Rerank에 넘김 (기본 off)
+        candidates: 호출 측에서 미리 검색한 후보 (있으면 검색 생략, 빈 리스트면 결과 없음 처리)
+        timings: 넘기면 단계별 소요 시간(ms)을 기록 (select / resolve / vision)
+        """
+        timings = timings if timings is not None else {}
+
+        target_file_path, error = self.resolve_target(query, category, target_file_path,
+                                                      mmr, mmr_lambda, candidates, timings)
+        if error:
+            return error, None
+
+        cached, query_embedding = self._cache_lookup(query, target_file_path, history, timings)
+        if cached is not None:
+            return cached, target_file_path
+
+        print(f"🖼️ [Vision] 이미지 분석 시작: {os.path.basename(target_file_path)}")
+        start = time.perf_counter()
+        response = self._handle_image_query(query, target_file_path, _history_text(history))
+        timings["vision"] = _elapsed_ms(start)
+
+        # 오류 메시지는 캐시하지 않음
+        if response != LLM_ERROR_MESSAGE and not response.startswith("이미지 처리 오류"):
+            self._cache_put(query, target_file_path, history, query_embedding, response)
+        
+        return response, target_file_path
+
+    async def aanswer(self, query: str, category: str = None,
+                      history: list = None, target_file_path: str = None,
+                      mmr: bool = False, mmr_lambda: float = 0.5,
+                      candidates: list = None, timings: dict = None, timeout: float = None):
+        """
+        answer의 비동기 버전
+        - 검색 / Rerank / 이미지 경량화(로컬 CPU 작업)는 스레드에서 실행
+        - Vision 호출은 AsyncGeminiClient (실패 / deadline 초과 시 LLMError)
+        """
+        timings = timings if timings is not None else {}
 
-        history_text = ""
-        if history:
-            history_text = "이전 대화 내역:\n" + "\n".join(history) + "\n\n"
+        target_file_path, error = await asyncio.to_thread(
+            self.resolve_target, query, category, target_file_path, mmr, mmr_lambda, candidates, timings
+        )
+        if error:
+            return error, None
+
+        cached, query_embedding = await asyncio.to_thread(self._cache_lookup, query, target_file_path, history, timings)
+        if cached is not None:
+            return cached, target_file_path
+
+        print(f"🖼️ [Vision] 이미지 분석 시작: {os.path.basename(target_file_path)}")
+        start = time.perf_counter()
+        contents, payload_info = await asyncio.to_thread(
+            self._build_vision_contents, query, target_file_path, _history_text(history)
+        )
+        response = await self.async_llm.generate(contents, timeout=timeout)
+        timings["vision"] = _elapsed_ms(start)
+        print(f"🖼️ [Vision] payload {payload_info}, total {timings['vision'] / 1000:.2f}s")
+        await asyncio.to_thread(self._cache_put, query, target_file_path, history, query_embedding, response)
+        
+        return response, target_file_path
+
+    async def aanswer_stream(self, query: str, target_file_path: str, history: list = None, timings: dict = None):
+        """
+        resolve_target으로 정한 파일에 대해 Vision 답변을 청크 단위로 yield
+        (AsyncGeminiClient.generate_stream, 답변 캐시 hit이면 한 번에 yield)
+        """
+        timings = timings if timings is not None else {}
+        cached, query_embedding = await asyncio.to_thread(self._cache_lookup, query, target_file_path, history, timings)
+        if cached is not None:
+            yield cached
+            return
+
+        print(f"🖼️ [Vision] 이미지 분석 시작 (stream): {os.path.basename(target_file_path)}")
+        contents, payload_info = await asyncio.to_thread(
+            self._build_vision_contents, query, target_file_path, _history_text(history)
+        )
+        print(f"🖼️ [Vision] payload {payload_info}")
+        pieces = []
+        async for text in self.async_llm.generate_stream(contents):
+            pieces.append(text)
+            yield text
+        await asyncio.to_thread(self._cache_put, query, target_file_path, history, query_embedding, "".join(pieces))
+
+    # 답변 캐시
+    def _cache_lookup(self, query, target_file_path, history, timings):
+        """
+        Returns: (캐시된 답변 or None, 질문 임베딩 or None)
+        1. 캐시 대상이 아니면(이전 대화 있음 / 업로드 파일) 질문 임베딩 없이 바로 생략
+        2. 이 문서로 저장된 답변이 없으면 hit이 불가능 -> 임베딩은 답변 저장 시점(_cache_put)으로 미룸
+        """
+        if not ANSWER_CACHE_ENABLED:
+            return None, None
+        if not self.answer_cache.cacheable(target_file_path, history):
+            self.answer_cache.record_skip()
+            return None, None
+        if not self.answer_cache.has_entries(target_file_path):
+            self.answer_cache.record_miss()
+            return None, None
+
+        start = time.perf_counter()
+        try:
+            query_embedding = self.retriever.embed_query(query)
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] 질문 임베딩 실패 (캐시 생략): {e}")
+            return None, None
+        answer, similarity = self.answer_cache.get(target_file_path, query_embedding)
+        timings["answer_cache"] = _elapsed_ms(start)
+        if answer is not None:
+            print(f"♻️ [AnswerCache] hit (유사도 {similarity:.3f}): {os.path.basename(target_file_path)}")
+        return answer, query_embedding
+
+    def _cache_put(self, query, target_file_path, history, query_embedding, answer):
+        """답변 저장 (조회 때 임베딩을 미뤘으면 여기서 생성 -> hit이 불가능한 조회에는 임베딩 비용 없음)"""
+        if not ANSWER_CACHE_ENABLED or not answer or not self.answer_cache.cacheable(target_file_path, history):
+            return
+        if query_embedding is None:
+            try:
+                query_embedding = self.retriever.embed_query(query)
+            except Exception as e:
+                print(f"⚠️ [AnswerCache] 질문 임베딩 실패 (저장 생략): {e}")
+                return
+        self.answer_cache.put(target_file_path, query_embedding, query, answer)
+
+    def resolve_target(self, query: str, category: str = None, target_file_path: str = None,
+                       mmr: bool = False, mmr_lambda: float = 0.5,
+                       candidates: list = None, timings: dict = None):
+        """
+        답변에 사용할 이미지 파일 결정 (고정 파일 or 검색 -> Rerank -> 경로 보정)
+        Returns: (파일 경로, None) 또는 (None, 오류 메시지)
+        """
+        timings = timings if timings is not None else {}
 
         # 이미 고정된 파일이 들어온 경우 (업로드 or 이전 대화 고정)
         if target_file_path and os.path.exists(target_file_path):
             print(f"🔒 [Locked] 고정된 문서 분석: {os.path.basename(target_file_path)}")
+            return target_file_path, None
             
         # 파일이 없으면 -> DB 검색 수행
+        if candidates is not None:
+            retrieved_docs = candidates
         else:
             print(f"🔍 [Search] 파일 없음 -> DB 검색 수행: {query}")
-            retrieved_docs = self.retriever.retrieve(query, top_k=5, category=category)
-            
-            if not retrieved_docs:
-                return "검색 결과가 없어 답변할 수 없습니다.", None
+            start = time.perf_counter()
+            retrieved_docs = self.retriever.retrieve(query, top_k=5, category=category,
+                                                     mmr=mmr, mmr_lambda=mmr_lambda)
+            timings["retrieve"] = _elapsed_ms(start)
+        
+        if not retrieved_docs:
+            return None, "검색 결과가 없어 답변할 수 없습니다."
 
-            # Rerank로 가장 좋은 문서 하나 선정
-            target_doc = self._select_best_doc(query, retrieved_docs)
-            original_path = target_doc["metadata"].get("file_path", "")
-            filename = target_doc["metadata"].get("filename", os.path.basename(original_path))
+        # Rerank로 가장 좋은 문서 하나 선정
+        start = time.perf_counter()
+        target_doc = self._select_best_doc(query, retrieved_docs)
+        timings["select"] = _elapsed_ms(start)
+        original_path = target_doc["metadata"].get("file_path", "")
+        filename = target_doc["metadata"].get("filename", os.path.basename(original_path))
 
-            # 경로 보정
-            target_file_path = self._resolve_file_path(original_path, filename)
-            
-            if not target_file_path:
-                return "파일을 찾을 수 없습니다.", None
-            
-            print(f"🎯 [Found] 검색된 파일: {os.path.basename(target_file_path)}")
-
-        print(f"🖼️ [Vision] 이미지 분석 시작: {os.path.basename(target_file_path)}")
-        response = self._handle_image_query(query, target_file_path, history_text)
+        # 경로 보정
+        start = time.perf_counter()
+        target_file_path = self._resolve_file_path(original_path, filename)
+        timings["resolve"] = _elapsed_ms(start)
         
-        return response, target_file_path
+        if not target_file_path:
+            return None, "파일을 찾을 수 없습니다."
+        
+        print(f"🎯 [Found] 검색된 파일: {os.path.basename(target_file_path)}")
+        return target_file_path, None
     
     # Top-K 문서 Reranker
     def _select_best_doc(self, query, candidates):
+        """
+        Top-K 문서 중 가장 적합한 문서 하나를 선택 (RERANK_MODE에 따라)
+        - 1위가 확실하면(distance 차이가 큼) rerank 생략
+        - cross_encoder: 로컬 모델로 한 번에 점수화 / llm: Gemini가 선택 / none: 검색 1위
+        """
+        if RERANK_MODE == "none" or is_dominant(candidates):
+            return candidates[0]
+
+        if RERANK_MODE == "llm":
+            return self._select_best_doc_llm(query, candidates)
+
+        reranker = get_reranker()
+        if reranker is None:
+            return candidates[0]
+        try:
+            return reranker.rerank(query, candidates)[0]
+        except Exception as e:
+            print(f"⚠️ Rerank Error: {e}")
+            return candidates[0]
+
+    def _select_best_doc_llm(self, query, candidates):
         """
         Top-K 문서 중 '이 문서로 질문에 답할 수 있는가?' 기준으로 LLM이 최적의 문서를 선택
         """
@@ -116,36 +291,43 @@ class MultimodalRAG:
         if original_path and os.path.exists(original_path):
             return original_path
 
-        # 2. 도커 경로와 로컬 경로를 후보로 설정
-        search_roots = [DOCKER_DATA_DIR, LOCAL_DATA_DIR]
+        # 2. 경로 인덱스에서 파일명으로 조회 (없으면 바뀐 디렉토리만 다시 읽고 재조회)
+        found_path = self.path_index.resolve(filename)
+        if found_path:
+            print(f"파일 발견: {found_path}")
+            return found_path
 
-        print(f" [Path] '{filename}' 검색 시작...")
-
-        for root_dir in search_roots:
-            if not os.path.exists(root_dir):
-                continue
-            
-            # os.walk: 폴더를 계속 파고들면서 모든 파일을 훑는 함수
-            for current_root, dirs, files in os.walk(root_dir):
-                if filename in files:
-                    found_path = os.path.join(current_root, filename)
-                    print(f"파일 발견: {found_path}")
-                    return found_path
-
-        print(f"❌ [Path] 모든 폴더를 뒤졌지만 못찾음: {filename}")
+        print(f"❌ [Path] 경로 인덱스에 없음: {filename}")
         return None
 
     # Vision RAG 
+    def _build_vision_contents(self, query, image_path, history_text):
+        """Returns: ([프롬프트, 이미지], payload 로그 문자열)"""
+        prompt = VISION_RAG_PROMPT.format(
+            history=history_text, 
+            query=query,          
+            file_name=os.path.basename(image_path)
+        )
+
+        # 원본 대신 축소 / 흑백 / 재압축한 이미지 전달 (파일별 캐시)
+        # 글자 영역 자르기가 켜져 있으면 문서의 OCR 라인 bbox를 사용 (없으면 흰 여백 기준)
+        if IMAGE_PREP_ENABLED:
+            text_boxes = ocr_text_boxes(image_path) if IMAGE_CROP_TO_TEXT else None
+            prepared = get_image_cache().get(image_path, text_boxes=text_boxes)
+            image_part = types.Part.from_bytes(data=prepared["data"], mime_type=prepared["mime_type"])
+            payload_info = (f"{prepared['original_bytes'] / 1024:.0f}KB -> {prepared['bytes'] / 1024:.0f}KB"
+                            f"{' (cached)' if prepared['cached'] else ''}, prep {prepared['prep_ms']}ms")
+        else:
+            image_part = Image.open(image_path)
+            payload_info = f"{os.path.getsize(image_path) / 1024:.0f}KB (원본)"
+        return [prompt, image_part], payload_info
+
     def _handle_image_query(self, query, image_path, history_text):
         try:
-            img = Image.open(image_path)
-
-            prompt = VISION_RAG_PROMPT.format(
-                history=history_text, 
-                query=query,          
-                file_name=os.path.basename(image_path)
-            )
-            
-            return self.llm.generate([prompt, img])
+            start = time.perf_counter()
+            contents, payload_info = self._build_vision_contents(query, image_path, history_text)
+            response = self.llm.generate(contents)
+            print(f"🖼️ [Vision] payload {payload_info}, total {time.perf_counter() - start:.2f}s")
+            return response
         except Exception as e:
-            return f"이미지 처리 오류: {str(e)}"
\ No newline at end of file
+            return f"이미지 처리 오류: {str(e)}"
@@ -0,0 +1,117 @@
+# src/rag/partitions.py
+'''
+라벨별 파티션 컬렉션 (필터 검색용)
+
+기존: 하나의 "docs" 컬렉션에 where={"label": ...} 필터
+    -> 선택도가 높은 라벨일수록 HNSW가 후보를 많이 버리면서 탐색 (느리고 recall 손실)
+변경: 전체 인덱스("docs") + 라벨별 인덱스("docs__invoice", "docs__news_article", ...)
+    - 카테고리가 있으면 해당 파티션에서 필터 없이 검색
+    - 카테고리가 없거나 파티션이 없으면 전체 인덱스 + where 필터로 fallback
+    - 문서의 라벨이 바뀌어 다시 적재되면 이전 라벨 파티션에서 삭제 (delete_relabeled)
+'''
+import re
+import hashlib
+import threading
+
+PARTITION_SEP = "__"
+
+
+def partition_name(base: str, label: str) -> str:
+    # Chroma 컬렉션 이름은 [a-zA-Z0-9._-]만 허용 ("news article" -> "news_article")
+    # 치환 후 같아지는 라벨("news article" / "news_article")이 섞이지 않도록 원래 라벨의 hash를 붙임
+    safe = re.sub(r"[^a-zA-Z0-9_-]+", "_", label.strip()).strip("_-") or "unknown"
+    digest = hashlib.sha1(label.encode("utf-8")).hexdigest()[:8]
+    prefix = f"{base}{PARTITION_SEP}"
+    return f"{prefix}{safe[:max(1, 63 - len(prefix) - 9)]}_{digest}"
+
+
+class PartitionedCollections:
+    """
+    Args:
+        client: chromadb client
+        base: 전체 인덱스 컬렉션 이름 (예: "docs")
+        embedding_function: 파티션 컬렉션에도 같은 임베딩 함수 설정
+    """
+    def __init__(self, client, base: str, embedding_function=None):
+        self.client = client
+        self.base = base
+        self.embedding_function = embedding_function
+        self.partitions = {}          # label -> collection
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """DB에 있는 파티션 컬렉션 목록을 다시 읽습니다. (collection metadata의 label 기준)"""
+        partitions = {}
+        prefix = f"{self.base}{PARTITION_SEP}"
+        for item in self.client.list_collections():
+            name = item if isinstance(item, str) else item.name
+            if not name.startswith(prefix):
+                continue
+            collection = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+            label = (collection.metadata or {}).get("label")
+            if label:
+                partitions[label] = collection
+        with self._lock:
+            self.partitions = partitions
+        return self
+
+    def get_or_create(self, label: str):
+        with self._lock:
+            if label not in self.partitions:
+                self.partitions[label] = self.client.get_or_create_collection(
+                    name=partition_name(self.base, label),
+                    embedding_function=self.embedding_function,
+                    metadata={"hnsw:space": "cosine", "label": label, "partition_of": self.base}
+                )
+            return self.partitions[label]
+
+    def drop_all(self):
+        # 이름 규칙이 바뀌기 전에 만든 파티션도 지우도록 실제 컬렉션 이름으로 삭제
+        for collection in list(self.partitions.values()):
+            try:
+                self.client.delete_collection(collection.name)
+            except Exception:
+                pass
+        with self._lock:
+            self.partitions = {}
+
+    @staticmethod
+    def current_labels(collection, ids) -> dict:
+        """전체 인덱스에 이미 있는 문서의 현재 라벨 {id: label} (새 문서는 없음)"""
+        if not ids:
+            return {}
+        existing = collection.get(ids=list(ids), include=["metadatas"])
+        return {doc_id: (metadata or {}).get("label")
+                for doc_id, metadata in zip(existing["ids"], existing["metadatas"] or [])}
+
+    def delete_relabeled(self, old_labels: dict, new_labels: dict) -> int:
+        """
+        라벨이 바뀐 문서를 이전 라벨 파티션에서 삭제 (남아 있으면 필터 검색에서 이전 라벨로 검색됨)
+        old_labels: 다시 적재하기 전 라벨 {id: label} (current_labels), new_labels: 새 라벨 {id: label}
+        """
+        stale = {}
+        for doc_id, old in old_labels.items():
+            if old and old != new_labels.get(doc_id):
+                stale.setdefault(old, []).append(doc_id)
+        removed = 0
+        for label, ids in stale.items():
+            with self._lock:
+                partition = self.partitions.get(label)
+            if partition is not None:
+                partition.delete(ids=ids)
+                removed += len(ids)
+        return removed
+
+    def route(self, category: str, default):
+        """
+        Returns: (검색할 컬렉션, where 필터)
+            - 해당 라벨 파티션이 있으면 (파티션, None)
+            - 없으면 (전체 인덱스, {"label": category}) / 카테고리가 없으면 (전체 인덱스, None)
+        """
+        if category and category in self.partitions:
+            return self.partitions[category], None
+        return default, ({"label": category} if category else None)
+
+    def __len__(self):
+        return len(self.partitions)
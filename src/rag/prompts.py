@@ -37,4 +37,22 @@ VISION_RAG_PROMPT = """
 4. 이전 대화 내역이 있다면 문맥을 고려해서 답변하세요.
 5. 답변 끝에 분석한 파일명을 명시하세요.
    형식: (분석 대상: {file_name})
-"""
\ No newline at end of file
+"""
+
+CONVERSATION_SUMMARY_PROMPT = """
+아래는 문서 분석 AI와 사용자의 대화 중 오래된 부분입니다.
+[기존 요약]과 [추가 대화]를 합쳐서, 이후 질문에 답할 때 필요한 정보만 남긴 요약을 작성하세요.
+
+[기존 요약]
+{summary}
+
+[추가 대화]
+{turns}
+
+[요약 규칙]
+1. 사용자가 관심을 가진 문서, 확인된 수치 / 이름 / 날짜 등 사실 위주로 작성하세요.
+2. 인사말, 반복된 설명은 제외하세요.
+3. 한국어로 5문장 이내로 작성하세요.
+
+요약:
+"""
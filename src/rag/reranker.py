@@ -0,0 +1,100 @@
+# src/rag/reranker.py
+'''
+로컬 Cross-Encoder Reranker
+
+기존: Top-5 후보(각 800자)를 Gemini에 보내서 번호 하나를 받아옴 -> 매 채팅마다 LLM 왕복 1회 추가
+변경: (질문, 후보) 쌍을 로컬 cross-encoder로 한 번에 배치 forward 해서 점수화 (CPU 수십 ms)
+
+    1. 검색 1위가 2위보다 distance 차이가 RERANK_SKIP_MARGIN 이상 나면 rerank 자체를 생략
+    2. 아니면 후보 전체를 한 번의 forward로 점수화해서 최고점 후보 선택
+    3. 모델 로드 / 추론 실패 시 검색 순위 그대로 사용
+'''
+import os
+import threading
+
+import numpy as np
+
+# 설정 (환경변수로 덮어쓰기 가능)
+#   RERANK_MODE: "cross_encoder" (기본값) / "llm" (기존 Gemini 방식) / "none" (검색 1위 사용)
+RERANK_MODE = os.getenv("RERANK_MODE", "cross_encoder")
+# 한국어 질문도 처리할 수 있는 다국어 MiniLM cross-encoder (CPU에서도 가벼움)
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+# 1위와 2위의 cosine distance 차이가 이 값 이상이면 1위가 확실하다고 보고 rerank 생략
+RERANK_SKIP_MARGIN = float(os.getenv("RERANK_SKIP_MARGIN", "0.08"))
+RERANK_MAX_LENGTH = 512
+# 후보 본문은 앞부분만 사용 (max_length 토큰을 넘는 부분은 어차피 잘림)
+RERANK_MAX_CHARS = 2000
+
+
+def is_dominant(candidates: list, margin: float = RERANK_SKIP_MARGIN) -> bool:
+    """검색 1위가 2위보다 distance가 margin 이상 작으면 True"""
+    if len(candidates) < 2:
+        return True
+    first = candidates[0].get("distance")
+    second = candidates[1].get("distance")
+    if first is None or second is None:
+        return False
+    return second - first >= margin
+
+
+class CrossEncoderReranker:
+    """
+    Args:
+        model_name: HuggingFace cross-encoder 모델 (출력 logit 1개 = 관련도)
+    """
+    def __init__(self, model_name: str = RERANKER_MODEL, max_length: int = RERANK_MAX_LENGTH):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.max_length = max_length
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        print(f"🔄 Reranker 로딩: {model_name} (Device: {self.device})")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def score(self, query: str, texts: list) -> np.ndarray:
+        """(질문, 후보) 쌍들을 한 번의 forward로 점수화합니다. (높을수록 관련)"""
+        encoding = self.tokenizer(
+            [query] * len(texts),
+            [text[:RERANK_MAX_CHARS] for text in texts],
+            padding=True,
+            truncation="only_second",
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+        inputs = {k: v.to(self.device) for k, v in encoding.items()}
+        with self.torch.no_grad():
+            logits = self.model(**inputs).logits
+        # 출력이 2개(0/1 분류)인 모델은 "관련 있음" logit 사용
+        logits = logits[:, -1] if logits.shape[-1] > 1 else logits[:, 0]
+        return logits.float().cpu().numpy()
+
+    def rerank(self, query: str, candidates: list) -> list:
+        """후보를 점수 내림차순으로 정렬해서 반환 (각 후보에 rerank_score 추가)"""
+        scores = self.score(query, [doc.get("text", "") for doc in candidates])
+        for doc, score in zip(candidates, scores):
+            doc["rerank_score"] = float(score)
+        order = np.argsort(-scores, kind="stable")
+        return [candidates[i] for i in order]
+
+
+# 싱글톤 (모델은 프로세스당 한 번만 로드)
+_RERANKER = None
+_RERANKER_LOCK = threading.Lock()
+
+
+def get_reranker():
+    """로드 실패 시 None (호출 측에서 검색 순위 그대로 사용)"""
+    global _RERANKER
+    with _RERANKER_LOCK:
+        if _RERANKER is None:
+            try:
+                _RERANKER = CrossEncoderReranker()
+            except Exception as e:
+                print(f"⚠️ Reranker 로드 실패 (검색 순위 사용): {e}")
+                _RERANKER = False
+        return _RERANKER or None
@@ -1,12 +1,86 @@
 # src/rag/retriever.py
 
 import os
+import numpy as np
 import chromadb
 import chromadb.utils.embedding_functions as embedding_functions
 from dotenv import load_dotenv
 
+from src.ingest.chunker import aggregate_chunk_hits
+from src.ingest.dedup import DuplicateLinks, DEDUP_PATH
+from src.core.query_cache import get_query_cache, normalize_query
+from src.core.embedding import get_query_embeddings
+from src.core.gemini_config import configure_generativeai
+from src.rag.lexical_index import BM25Index, reciprocal_rank_fusion, LEXICAL_INDEX_PATH
+from src.rag.partitions import PartitionedCollections
+from src.rag.vector_index import MmapVectorIndex
+
 load_dotenv()
 
+# 청크 단위 색인일 때 문서 top_k를 채우기 위해 청크를 몇 배 더 가져올지
+CHUNK_OVERFETCH = 3
+
+# Hybrid 검색 시 Dense / Lexical 각각 후보를 top_k의 몇 배까지 가져와서 RRF로 합칠지
+HYBRID_CANDIDATES = 4
+RRF_K = 60
+
+# 질문 임베딩 캐시 namespace (모델 / task_type이 바뀌면 캐시가 섞이지 않도록)
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+QUERY_CACHE_NAMESPACE = f"gemini:{EMBEDDING_MODEL}:RETRIEVAL_QUERY"
+
+# MMR(다양성) 검색 시 후보를 top_k의 몇 배까지 가져와서 고를지 / 기본 lambda (1.0 = 관련도만)
+MMR_CANDIDATES = 4
+MMR_LAMBDA = 0.5
+
+# 벡터 검색 backend
+#   "chroma": ChromaDB PersistentClient (기본값)
+#   "mmap":   scripts/build_vector_index.py로 만든 메모리 맵 인덱스 (worker 간 page cache 공유)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "./chroma_db/vector_index")
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+
+def mmr_select(query_embedding, doc_embeddings, k: int, lambda_mult: float = MMR_LAMBDA,
+               relevance_scores=None) -> list:
+    """
+    Maximal Marginal Relevance: 질문과 관련 있으면서 이미 고른 문서와는 덜 비슷한 문서를 차례로 선택
+        score = lambda * rel(q, d) - (1 - lambda) * max(sim(d, 이미 고른 문서))
+    rel(q, d)는 기본적으로 dense cosine. relevance_scores(예: Hybrid RRF 점수)가 있으면 그 순서를 따르도록
+    후보들의 cosine 범위로 선형 변환해서 사용 (BM25로 찾은 정확한 번호 매칭 등이 순위를 잃지 않도록)
+    유사도 행렬은 한 번에 계산하고, 선택할 때마다 max 유사도 벡터만 갱신합니다.
+    Returns: 선택된 문서 인덱스 (선택 순서)
+    """
+    docs = np.asarray(doc_embeddings, dtype=np.float32)
+    if len(docs) == 0:
+        return []
+    docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_embedding, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+    relevance = docs @ q                       # (N,)
+    if relevance_scores is not None:
+        scores = np.asarray(relevance_scores, dtype=np.float32)
+        span = float(scores.max() - scores.min())
+        low, high = float(relevance.min()), float(relevance.max())
+        if span > 0:
+            relevance = low + (scores - scores.min()) / span * (high - low)
+        else:
+            relevance = np.full(len(docs), high, dtype=np.float32)
+    similarity = docs @ docs.T                 # (N, N)
+    max_sim = np.full(len(docs), -np.inf, dtype=np.float32)
+    available = np.ones(len(docs), dtype=bool)
+
+    selected = []
+    for _ in range(min(k, len(docs))):
+        penalty = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, similarity[best])
+    return selected
+
+
 class Retriever:
     def __init__(self):
         # 1. DB 경로 설정
@@ -20,14 +94,40 @@ class Retriever:
 
         self.embedding_function = embedding_functions.GoogleGenerativeAiEmbeddingFunction(
             api_key=api_key,
-            model_name="models/gemini-embedding-001",  # 모델 명시
+            model_name=EMBEDDING_MODEL,  # 모델 명시
             task_type="RETRIEVAL_QUERY" # 질문할 때는 QUERY 타입 사용
         )
+        # 임베딩 함수가 genai.configure를 덮어쓰므로 base URL override 다시 적용
+        configure_generativeai()
+
+        # 질문 임베딩 캐시 (SearchEngine과 공유)
+        self.query_cache = get_query_cache()
+
+        # 3. 벡터 인덱스 연결
+        self.vector_index = None
+        self.collection = None
+        self.partitions = None
+        if VECTOR_BACKEND == "mmap":
+            self.vector_index = MmapVectorIndex.load(VECTOR_INDEX_PATH, nprobe=VECTOR_INDEX_NPROBE)
+            self.has_chunks = self.vector_index.has_chunks
+            print(f"✅ Retriever Loaded mmap Vector Index at '{VECTOR_INDEX_PATH}' ({len(self.vector_index)} vectors)")
+        else:
+            self._connect_chroma()
+
+        # 4. BM25 역색인 로드 (있으면 hybrid 검색 사용)
+        self.lexical_index = None
+        if os.path.exists(LEXICAL_INDEX_PATH):
+            self.lexical_index = BM25Index.load(LEXICAL_INDEX_PATH)
+            print(f"✅ BM25 Index Loaded ({len(self.lexical_index)} docs)")
 
-        # 3. DB 연결
+        # 5. ingest 때 "link" 모드로 기록된 중복 문서 연결 (중복 id -> canonical id)
+        self.duplicate_links = DuplicateLinks.load(DEDUP_PATH)
+
+    def _connect_chroma(self):
+        # DB 연결
         self.client = chromadb.PersistentClient(path=self.db_path)
         
-        # 4. 컬렉션 가져오기
+        # 컬렉션 가져오기
         try:
             self.collection = self.client.get_collection(
                 name=self.collection_name,
@@ -38,36 +138,214 @@ class Retriever:
             print(f"❌ DB 연결 실패: {e}")
             raise e
 
-    def retrieve(self, query: str, top_k: int = 5, category: str = None):
+        # 청크 단위 색인 여부 확인 (한 번만)
+        self.has_chunks = self._detect_chunks()
+
+        # 라벨별 파티션 컬렉션 (있으면 카테고리 검색은 파티션으로, 없으면 전체 + where 필터)
+        self.partitions = PartitionedCollections(self.client, self.collection_name, self.embedding_function)
+        if len(self.partitions):
+            print(f"✅ Label Partitions Loaded ({len(self.partitions)} labels)")
+
+    def _detect_chunks(self) -> bool:
+        try:
+            sample = self.collection.get(where={"chunk_index": {"$gte": 0}}, limit=1, include=[])
+            return bool(sample["ids"])
+        except Exception:
+            return False
+
+    def retrieve(self, query: str, top_k: int = 5, category: str = None, hybrid: bool = True,
+                 mmr: bool = False, mmr_lambda: float = MMR_LAMBDA):
         """
         질문을 받아서 관련된 문서를 찾아옵니다.
+        BM25 역색인이 있으면 Dense(Gemini) + Lexical(BM25) 결과를 RRF로 합칩니다.
+        mmr=True면 후보를 넉넉히 가져온 뒤 서로 비슷한 문서(같은 양식 등)를 피해서 top_k를 고릅니다.
         """
         try:
-            # 검색 필터 (Router가 카테고리를 줬으면 그걸로 필터링)
-            where_filter = None
-            if category:
-                where_filter = {"label": category}
-
-            # 검색 실행
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=top_k,
-                where=where_filter 
-            )
-            
-            # 보기 좋게 정리해서 반환
-            docs = []
-            if results['documents']:
-                for i in range(len(results['documents'][0])):
-                    docs.append({
-                        "id": results['ids'][0][i],
-                        "text": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i] if results['distances'] else 0
-                    })
-            
-            return docs
-
+            return self._search([query], top_k, [category], hybrid, mmr, mmr_lambda)[0]
         except Exception as e:
             print(f"⚠️ 검색 중 오류 발생: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def resolve_doc_id(self, doc_id: str) -> dict:
+        """
+        색인하지 않은 중복 문서 id -> 실제 색인된 canonical id
+        Returns: {"doc_id", "canonical_id", "is_duplicate", "aliases"}
+        """
+        canonical = self.duplicate_links.canonical(doc_id)
+        return {
+            "doc_id": doc_id,
+            "canonical_id": canonical,
+            "is_duplicate": canonical != doc_id,
+            "aliases": self.duplicate_links.aliases(canonical),
+        }
+
+    def embed_query(self, query: str):
+        """질문 임베딩 (캐시 사용). 라우터 등 다른 단계와 같은 벡터를 공유할 때 사용"""
+        return self._embed_queries([query])[0]
+
+    def retrieve_many(self, queries: list, top_k: int = 5, categories=None, hybrid: bool = True,
+                      mmr: bool = False, mmr_lambda: float = MMR_LAMBDA):
+        """
+        여러 질문을 한 번에 검색합니다. (평가 / 내부 도구용)
+        - 캐시에 없는 질문만 모아서 임베딩 API 1회(100개 단위) 호출
+        - 같은 카테고리끼리 묶어서 벡터 검색 1회 (multi-query)
+        categories: None / 카테고리 하나(str) / 질문별 카테고리 리스트
+        Returns: 질문 순서대로 [[doc, ...], ...]
+        """
+        if not queries:
+            return []
+        if categories is None or isinstance(categories, str):
+            categories = [categories] * len(queries)
+        try:
+            return self._search(list(queries), top_k, list(categories), hybrid, mmr, mmr_lambda)
+        except Exception as e:
+            print(f"⚠️ 배치 검색 중 오류 발생: {e}")
+            return [[] for _ in queries]
+
+    def _search(self, queries, top_k, categories, hybrid, mmr=False, mmr_lambda=MMR_LAMBDA):
+        # 청크가 섞여 있으면 같은 문서의 청크가 여러 개 걸리므로 넉넉히 가져옴
+        n_select = top_k * CHUNK_OVERFETCH if self.has_chunks else top_k
+        n_results = n_select
+        use_hybrid = hybrid and self.lexical_index is not None
+        if use_hybrid:
+            n_results *= HYBRID_CANDIDATES
+        if mmr:
+            n_results *= MMR_CANDIDATES
+
+        # 1. 질문 임베딩 (lexical로만 찾은 문서의 distance 계산에도 사용)
+        query_embeddings = self._embed_queries(queries)
+
+        # 2. 같은 필터끼리 묶어서 multi-query 검색
+        groups = {}
+        for i, category in enumerate(categories):
+            groups.setdefault(category, []).append(i)
+
+        outputs = [None] * len(queries)
+        for category, indices in groups.items():
+            batch_results = self._dense_search([query_embeddings[i] for i in indices], n_results, category,
+                                               include_embeddings=mmr)
+
+            for docs, i in zip(batch_results, indices):
+                if use_hybrid:
+                    docs = self._fuse_lexical(queries[i], query_embeddings[i], docs, n_results, category)
+
+                # 다양성 선택 (MMR) 후 임베딩은 응답에서 제거
+                if mmr and docs:
+                    # Hybrid면 RRF 점수를 관련도로 사용 (dense cosine만 쓰면 lexical 순위가 사라짐)
+                    fused = [d["rrf_score"] for d in docs] if use_hybrid else None
+                    picked = mmr_select(query_embeddings[i], [d["embedding"] for d in docs], n_select, mmr_lambda,
+                                        relevance_scores=fused)
+                    docs = [docs[j] for j in picked]
+                for doc in docs:
+                    doc.pop("embedding", None)
+
+                # 청크 결과 -> 부모 문서 단위로 묶기
+                if self.has_chunks:
+                    docs = aggregate_chunk_hits(docs, top_k)
+                # 같은 내용으로 색인에서 빠진 중복 문서 id 표시
+                outputs[i] = self.duplicate_links.annotate(docs[:top_k])
+        return outputs
+
+    def _dense_search(self, embeddings, n_results, category=None, include_embeddings=False):
+        """질문 벡터 여러 개 -> 질문별 문서 리스트 (backend별 처리)"""
+        if self.vector_index is not None:
+            return self.vector_index.search(np.stack(embeddings), top_k=n_results, label=category,
+                                            include_embeddings=include_embeddings)
+
+        # 카테고리 파티션이 있으면 필터 없이 파티션에서, 없으면 전체 인덱스 + 라벨 필터
+        collection, where_filter = self.partitions.route(category, self.collection)
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=where_filter,
+            include=include
+        )
+        return [self._format_results(results, row) for row in range(len(embeddings))]
+
+    @staticmethod
+    def _format_results(results, row):
+        # 보기 좋게 정리해서 반환
+        docs = []
+        if results['documents']:
+            for i in range(len(results['documents'][row])):
+                docs.append({
+                    "id": results['ids'][row][i],
+                    "text": results['documents'][row][i],
+                    "metadata": results['metadatas'][row][i],
+                    "distance": results['distances'][row][i] if results['distances'] else 0
+                })
+                if results.get('embeddings') is not None:
+                    docs[-1]["embedding"] = results['embeddings'][row][i]
+        return docs
+
+    def _embed_queries(self, queries):
+        # 캐시에 없는 질문만 모아서 한 번에 Gemini API 호출
+        embeddings = [self.query_cache.get(QUERY_CACHE_NAMESPACE, q) for q in queries]
+        missing = {}
+        for i, emb in enumerate(embeddings):
+            if emb is None:
+                missing.setdefault(normalize_query(queries[i]), []).append(i)
+
+        if missing:
+            texts = list(missing)
+            for text, vector in zip(texts, get_query_embeddings(texts)):
+                self.query_cache.put(QUERY_CACHE_NAMESPACE, text, vector)
+                for i in missing[text]:
+                    embeddings[i] = np.asarray(vector, dtype=np.float32)
+        return embeddings
+
+    def _fuse_lexical(self, query, query_embedding, dense_docs, n_results, category=None):
+        """
+        BM25 결과와 Dense 결과를 RRF로 합칩니다.
+        BM25에서만 나온 문서는 벡터 저장소에서 본문/메타데이터/임베딩을 가져와 distance를 계산합니다.
+        """
+        allowed = self.lexical_index.label_mask(category) if category else None
+        lexical_hits = self.lexical_index.search(query, top_k=n_results, allowed=allowed)
+
+        dense_ids = [d["id"] for d in dense_docs]
+        lexical_ids = [doc_id for doc_id, _ in lexical_hits]
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids], k=RRF_K)
+
+        by_id = {d["id"]: d for d in dense_docs}
+        missing = [doc_id for doc_id in lexical_ids if doc_id not in by_id]
+        if missing:
+            for doc in self._fetch_docs(missing, query_embedding):
+                by_id[doc["id"]] = doc
+
+        dense_set, lexical_set = set(dense_ids), set(lexical_ids)
+        docs = []
+        for doc_id, score in fused:
+            if doc_id not in by_id:
+                continue
+            doc = by_id[doc_id]
+            doc["rrf_score"] = score
+            doc["match"] = "both" if doc_id in dense_set and doc_id in lexical_set else (
+                "dense" if doc_id in dense_set else "lexical")
+            docs.append(doc)
+        return docs
+
+    def _fetch_docs(self, ids, query_embedding):
+        """id로 문서를 가져오고 질문과의 cosine distance를 계산합니다."""
+        if self.vector_index is not None:
+            return self.vector_index.get(ids, query_embedding)
+
+        fetched = self.collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        if not len(fetched["ids"]):
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        embs = np.asarray(fetched["embeddings"], dtype=np.float32)
+        # cosine distance (컬렉션 설정 hnsw:space=cosine 과 동일한 기준)
+        sims = embs @ q / (np.linalg.norm(embs, axis=1) * np.linalg.norm(q) + 1e-12)
+        return [
+            {
+                "id": doc_id,
+                "text": fetched["documents"][i],
+                "metadata": fetched["metadatas"][i],
+                "distance": float(1.0 - sims[i]),
+                "embedding": embs[i],
+            }
+            for i, doc_id in enumerate(fetched["ids"])
+        ]
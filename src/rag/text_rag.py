@@ -1,10 +1,16 @@
 # src/rag/text_rag.py
-from src.core.llm import GeminiClient
+from src.core.llm import GeminiClient, get_async_llm
 from src.rag.prompts import TEXT_RAG_PROMPT
+from src.rag.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+
+NO_RESULT_MESSAGE = "검색 결과가 없어 답변할 수 없습니다."
 
 class TextRAG:
-    def __init__(self):
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET):
         self.llm = GeminiClient()
+        self.async_llm = get_async_llm()
+        # Context 토큰 예산 (None이면 기존처럼 문서 전체를 넣음)
+        self.token_budget = token_budget
 
     def answer(self, query: str, retrieved_docs: list) -> str:
         """
@@ -13,23 +19,39 @@ class TextRAG:
         
         # 1. 검색 결과가 아예 없는 경우 (Graceful Fallback)
         if not retrieved_docs:
-            return "검색 결과가 없어 답변할 수 없습니다."
+            return NO_RESULT_MESSAGE
 
-        # 2. Context 구성 (문서 내용 + 출처 정보를 하나의 문자열로 합침)
-        context_parts = []
-        for i, doc in enumerate(retrieved_docs):
-            content = doc.get('content', '')
-            source = doc.get('metadata', {}).get('source', 'Unknown')
-            context_parts.append(f"문서 {i+1} (파일명: {source}):\n{content}")
-        
-        context_str = "\n\n".join(context_parts)
+        # 2. LLM 답변 생성
+        response = self.llm.generate(self._build_prompt(query, retrieved_docs))
+        return response
+
+    async def aanswer(self, query: str, retrieved_docs: list, timeout: float = None) -> str:
+        """
+        answer의 비동기 버전 (AsyncGeminiClient, 실패 / deadline 초과 시 LLMError)
+        """
+        if not retrieved_docs:
+            return NO_RESULT_MESSAGE
+        return await self.async_llm.generate(self._build_prompt(query, retrieved_docs), timeout=timeout)
 
-        # 3. 프롬프트 완성
-        final_prompt = TEXT_RAG_PROMPT.format(
+    def _build_prompt(self, query: str, retrieved_docs: list) -> str:
+        # 1. Context 구성
+        if self.token_budget:
+            # 질문과 관련 있는 passage만 예산 안에서 골라 출처와 함께 묶음
+            packed = pack_context(query, retrieved_docs, self.token_budget)
+            context_str = packed["context"]
+            print(f"📦 [Context] {packed['original_tokens']} -> {packed['packed_tokens']} tokens "
+                  f"(passage {packed['passages']}/{packed['total_passages']}, 중복 제외 {packed['dropped_duplicates']})")
+        else:
+            # 문서 내용 + 출처 정보를 하나의 문자열로 합침
+            context_parts = []
+            for i, doc in enumerate(retrieved_docs):
+                content = doc.get('content', '')
+                source = doc.get('metadata', {}).get('source', 'Unknown')
+                context_parts.append(f"문서 {i+1} (파일명: {source}):\n{content}")
+            context_str = "\n\n".join(context_parts)
+
+        # 2. 프롬프트 완성
+        return TEXT_RAG_PROMPT.format(
             context_str=context_str,
             query=query
         )
-
-        # 4. LLM 답변 생성
-        response = self.llm.generate(final_prompt)
-        return response
\ No newline at end of file
@@ -0,0 +1,340 @@
+# src/rag/vector_index.py
+'''
+메모리 맵 기반 벡터 인덱스 (검색 서빙용, Chroma 대체 backend)
+
+Chroma PersistentClient는 질문마다 SQLite 조회 + 직렬화 비용이 있고 프로세스마다 따로 로드됨
+-> 정규화된 벡터를 .npy 파일로 저장하고 np.load(mmap_mode="r")로 열어서
+   여러 uvicorn worker가 같은 page cache를 읽기 전용으로 공유
+
+디렉토리 구조 (build_vector_index로 생성):
+    meta.json           dim / dtype / count / nlist / labels
+    vectors.npy         (N, dim) float16 or float32, L2 정규화 (IVF list 순서로 정렬)
+    ids.npy             (N,) 문서 id
+    labels.npy          (N,) int16 라벨 코드 (-1 = 없음)
+    spans.npy           (N, 2) int64 - payload.bin 안의 [start, end) (본문 + metadata JSON)
+    payload.bin         행별 JSON {"text": ..., "metadata": {...}}
+    centroids.npy       (nlist, dim) float32 - IVF 모드일 때만
+    list_offsets.npy    (nlist + 1,) int64 - list i의 행 범위 = [off[i], off[i+1])
+
+검색:
+    - exact: 블록 단위 행렬곱 (BLAS) + argpartition
+    - IVF:   질문과 가까운 centroid nprobe개의 list만 검색 (list별로 연속 구간에 저장)
+             후보가 top_k보다 적으면 다음으로 가까운 list를 top_k가 찰 때까지 추가
+'''
+import os
+import json
+import shutil
+
+import numpy as np
+
+from src.utils.parquet_io import iter_record_batches, embeddings_to_numpy, count_rows, column_names
+
+# 블록 단위 행렬곱 크기 (float16 -> float32 변환 시 임시 메모리 = BLOCK_ROWS x dim x 4 bytes)
+BLOCK_ROWS = 65536
+# centroid 배정 시 블록 크기 (임시 메모리 = ASSIGN_BLOCK_ROWS x nlist x 4 bytes)
+ASSIGN_BLOCK_ROWS = 8192
+DEFAULT_NPROBE = 8
+METADATA_COLUMNS = ["label", "file_path", "parent_id", "chunk_index", "bbox"]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[part], rows[part]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+class MmapVectorIndex:
+    """
+    읽기 전용 벡터 인덱스. load()로 열고 search()로 검색합니다.
+    """
+    def __init__(self, path: str, nprobe: int = DEFAULT_NPROBE):
+        self.path = path
+        self.nprobe = nprobe
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        # 모두 mmap (worker 간 공유, 필요한 page만 읽음)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(path, "labels.npy"), mmap_mode="r")
+        self.spans = np.load(os.path.join(path, "spans.npy"), mmap_mode="r")
+        self.payload = np.memmap(os.path.join(path, "payload.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(path, "payload.bin")) else np.zeros(0, dtype=np.uint8)
+
+        self.label_codes = {label: i for i, label in enumerate(self.meta["labels"])}
+        self.centroids = None
+        if self.meta.get("nlist"):
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+
+        self._row_of = None          # id -> 행 번호 (get()을 처음 쓸 때 생성)
+        self._list_counts = {}       # 라벨 코드 -> list별 행 수 (라벨 필터 IVF 검색용)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = DEFAULT_NPROBE):
+        return cls(path, nprobe=nprobe)
+
+    def __len__(self):
+        return int(self.meta["count"])
+
+    @property
+    def has_chunks(self) -> bool:
+        return bool(self.meta.get("has_chunks"))
+
+    # 1. 검색
+    def search(self, queries, top_k: int = 10, label: str = None, nprobe: int = None, exact: bool = False,
+               include_embeddings: bool = False) -> list:
+        """
+        queries: (B, dim) 또는 (dim,) 질문 벡터
+        label: 있으면 해당 라벨 문서만
+        exact: True면 IVF 인덱스가 있어도 전체 검색
+        include_embeddings: True면 각 결과에 "embedding"(정규화된 벡터)도 포함
+        Returns: 질문별 [{"id", "text", "metadata", "distance"}, ...] (cosine distance 오름차순)
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        code = None
+        if label:
+            code = self.label_codes.get(label)
+            if code is None:
+                return [[] for _ in range(len(queries))]
+
+        if self.centroids is None or exact:
+            hits = self._search_exact(queries, top_k, code)
+        else:
+            hits = self._search_ivf(queries, top_k, code, nprobe or self.nprobe)
+        return [[self._doc(row, score, include_embeddings) for row, score in zip(rows, scores)] for rows, scores in hits]
+
+    def _scan(self, queries, start, end, code, best, top_k):
+        # [start, end) 구간을 블록 단위로 행렬곱하고 질문별 Top-K를 갱신
+        for lo in range(start, end, BLOCK_ROWS):
+            hi = min(lo + BLOCK_ROWS, end)
+            block = np.asarray(self.vectors[lo:hi], dtype=np.float32)
+            scores = queries @ block.T                         # (B, rows)
+            rows = np.arange(lo, hi)
+            if code is not None:
+                keep = self.labels[lo:hi] == code
+                if not keep.any():
+                    continue
+                scores, rows = scores[:, keep], rows[keep]
+            for b in range(len(queries)):
+                cand_rows, cand_scores = _top_k(scores[b], rows, top_k)
+                prev_rows, prev_scores = best[b]
+                best[b] = _top_k(np.concatenate([prev_scores, cand_scores]),
+                                 np.concatenate([prev_rows, cand_rows]), top_k)
+
+    def _empty(self, n):
+        return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in range(n)]
+
+    def _search_exact(self, queries, top_k, code):
+        best = self._empty(len(queries))
+        self._scan(queries, 0, len(self), code, best, top_k)
+        return best
+
+    def _counts_per_list(self, code):
+        """list별 (라벨 필터 적용) 행 수"""
+        counts = self._list_counts.get(code)
+        if counts is None:
+            if code is None:
+                counts = np.diff(self.list_offsets)
+            else:
+                rows = np.flatnonzero(np.asarray(self.labels) == code)
+                lists = np.searchsorted(self.list_offsets, rows, side="right") - 1
+                counts = np.bincount(lists, minlength=len(self.centroids))
+            self._list_counts[code] = counts
+        return counts
+
+    def _search_ivf(self, queries, top_k, code, nprobe):
+        nprobe = min(nprobe, len(self.centroids))
+        probe_order = np.argsort(-(queries @ self.centroids.T), axis=1)
+        counts = self._counts_per_list(code)
+        best = self._empty(len(queries))
+        for b in range(len(queries)):
+            # 가까운 list nprobe개, 후보가 top_k보다 적으면 다음으로 가까운 list를 top_k가 찰 때까지 추가
+            available = np.cumsum(counts[probe_order[b]])
+            needed = int(np.searchsorted(available, top_k)) + 1
+            probes = probe_order[b, :max(nprobe, needed)]
+
+            # 가까운 list들의 행 번호를 모아서 한 번에 행렬곱
+            rows = np.concatenate([
+                np.arange(self.list_offsets[lst], self.list_offsets[lst + 1]) for lst in probes
+            ])
+            if code is not None:
+                rows = rows[self.labels[rows] == code]
+            if len(rows):
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ queries[b]
+                best[b] = _top_k(scores, rows, top_k)
+        return best
+
+    # 2. 조회
+    def _payload(self, row: int) -> dict:
+        start, end = self.spans[row]
+        return json.loads(self.payload[start:end].tobytes().decode("utf-8"))
+
+    def _doc(self, row, score, include_embedding: bool = False) -> dict:
+        payload = self._payload(int(row))
+        doc = {
+            "id": str(self.ids[row]),
+            "text": payload["text"],
+            "metadata": payload["metadata"],
+            "distance": float(1.0 - score),
+        }
+        if include_embedding:
+            doc["embedding"] = np.asarray(self.vectors[row], dtype=np.float32)
+        return doc
+
+    def get(self, ids: list, query=None) -> list:
+        """
+        id 목록으로 문서 조회 (embedding 포함, query가 있으면 cosine distance도 계산, 없으면 distance=None)
+        """
+        if self._row_of is None:
+            self._row_of = {str(doc_id): i for i, doc_id in enumerate(self.ids)}
+        rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+        if not rows:
+            return []
+        scores = None
+        if query is not None:
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ _normalize(query)
+        docs = []
+        for i, row in enumerate(rows):
+            doc = self._doc(row, scores[i] if scores is not None else 1.0, include_embedding=True)
+            if scores is None:
+                doc["distance"] = None
+            docs.append(doc)
+        return docs
+
+
+# 3. 빌드
+def _nearest(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # 블록 단위로 가장 가까운 centroid (N x nlist 전체 행렬을 만들지 않음)
+    assign = np.empty(len(matrix), dtype=np.int32)
+    for lo in range(0, len(matrix), ASSIGN_BLOCK_ROWS):
+        hi = min(lo + ASSIGN_BLOCK_ROWS, len(matrix))
+        assign[lo:hi] = np.argmax(np.asarray(matrix[lo:hi], dtype=np.float32) @ centroids.T, axis=1)
+    return assign
+
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(sample, centroids)
+        # list 번호순으로 정렬한 뒤 구간 합 (list마다 전체 mask를 만들지 않음)
+        order = np.argsort(assign, kind="stable")
+        sizes = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        filled = np.flatnonzero(sizes)
+        centroids[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+        # 빈 list는 임의의 점으로 다시 초기화
+        empty = np.flatnonzero(sizes == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.integers(len(sample), size=len(empty))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _assign(path: str, centroids: np.ndarray, count: int) -> np.ndarray:
+    return _nearest(np.load(path, mmap_mode="r")[:count], centroids)
+
+
+def build_vector_index(parquet_path: str, out_dir: str, dtype: str = "float16",
+                       nlist: int = None, sample_size: int = 100000, read_batch_size: int = 2048) -> dict:
+    """
+    임베딩 Parquet -> MmapVectorIndex 디렉토리
+    nlist: IVF list 개수 (None이면 4 * sqrt(N), 0이면 exact 전용)
+    임시 디렉토리에 만든 뒤 교체하므로, 서빙 중인 인덱스는 재시작 전까지 이전 파일을 그대로 사용합니다.
+    """
+    count = count_rows(parquet_path)
+    available = column_names(parquet_path)
+    metadata_columns = [c for c in METADATA_COLUMNS if c in available]
+    dim = None
+
+    tmp_dir = out_dir.rstrip("/") + ".building"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # 1. Parquet 스트리밍 -> 정규화 벡터(원래 순서) / id / 라벨 / payload
+    raw_path = os.path.join(tmp_dir, "vectors_unsorted.npy")
+    raw = None
+    ids, label_codes, labels = [], np.full(count, -1, dtype=np.int16), {}
+    spans = np.zeros((count, 2), dtype=np.int64)
+    has_chunks = False
+    row, offset = 0, 0
+    with open(os.path.join(tmp_dir, "payload.bin"), "wb") as payload_file:
+        for batch in iter_record_batches(parquet_path, columns=["doc_id", "text", "embedding"] + metadata_columns,
+                                         batch_size=read_batch_size):
+            embeddings = _normalize(embeddings_to_numpy(batch))
+            if raw is None:
+                dim = embeddings.shape[1]
+                raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=dtype, shape=(count, dim))
+            n = len(embeddings)
+            raw[row:row + n] = embeddings.astype(dtype)
+
+            texts = batch.column("text").to_pylist()
+            meta_values = {c: batch.column(c).to_pylist() for c in metadata_columns}
+            for i, doc_id in enumerate(batch.column("doc_id").to_pylist()):
+                metadata = {c: meta_values[c][i] for c in metadata_columns if meta_values[c][i] is not None}
+                label = metadata.get("label")
+                if label:
+                    label_codes[row + i] = labels.setdefault(label, len(labels))
+                has_chunks = has_chunks or "chunk_index" in metadata
+                data = json.dumps({"text": texts[i] or "", "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+                payload_file.write(data)
+                spans[row + i] = (offset, offset + len(data))
+                offset += len(data)
+                ids.append(str(doc_id))
+            row += n
+    if raw is None:
+        raise ValueError(f"빈 Parquet 파일입니다: {parquet_path}")
+    raw.flush()
+    del raw
+
+    # 2. IVF 학습 (표본으로 spherical k-means) -> list 순서로 행 정렬
+    if nlist is None:
+        nlist = int(4 * np.sqrt(count))
+    nlist = min(nlist, count)
+    order = np.arange(count)
+    meta = {"dim": dim, "dtype": dtype, "count": count, "nlist": 0,
+            "labels": sorted(labels, key=labels.get), "has_chunks": has_chunks}
+
+    if nlist > 1:
+        vectors = np.load(raw_path, mmap_mode="r")
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        centroids = _spherical_kmeans(np.asarray(vectors[sample_rows], dtype=np.float32), nlist)
+        assign = _assign(raw_path, centroids, count)
+        order = np.argsort(assign, kind="stable")
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=list_offsets[1:])
+        np.save(os.path.join(tmp_dir, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp_dir, "list_offsets.npy"), list_offsets)
+        meta["nlist"] = nlist
+        del vectors
+
+    # 3. 정렬 순서로 최종 파일 기록
+    vectors = np.load(raw_path, mmap_mode="r")
+    final = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+", dtype=dtype, shape=(count, dim))
+    for lo in range(0, count, BLOCK_ROWS):
+        final[lo:lo + BLOCK_ROWS] = vectors[order[lo:lo + BLOCK_ROWS]]
+    final.flush()
+    del final, vectors
+    os.remove(raw_path)
+
+    np.save(os.path.join(tmp_dir, "ids.npy"), np.array(ids, dtype=str)[order])
+    np.save(os.path.join(tmp_dir, "labels.npy"), label_codes[order])
+    np.save(os.path.join(tmp_dir, "spans.npy"), spans[order])
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    # 4. 교체
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return meta
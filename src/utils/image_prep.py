@@ -0,0 +1,318 @@
+# src/utils/image_prep.py
+'''
+Vision LLM 호출 전 이미지 경량화
+
+기존: 원본 해상도 스캔 이미지(PIL)를 그대로 Gemini에 전달 -> 업로드 크기 / 모델 처리 시간이 픽셀 수에 비례
+변경:
+    1. (선택) 글자가 있는 영역만 잘라내기 (OCR bbox가 있으면 사용, 없으면 흰 여백 제거)
+    2. 긴 변을 IMAGE_MAX_SIDE 이하로 축소
+    3. 흑백(bitonal) 스캔이면 grayscale로 변환
+    4. JPEG / WebP로 재압축
+    5. 결과 bytes를 파일별로 캐시 (경로 + mtime + 설정이 같으면 재사용)
+       디스크 캐시는 용량 / 개수 상한을 넘으면 오래 안 쓴 파일(mtime 기준)부터 삭제
+'''
+import io
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageChops, ImageOps
+
+# 설정 (환경변수로 덮어쓰기 가능)
+IMAGE_PREP_ENABLED = os.getenv("IMAGE_PREP", "on") != "off"
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")          # "JPEG" / "WEBP"
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_CROP_TO_TEXT = os.getenv("IMAGE_CROP_TO_TEXT", "off") == "on"
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./chroma_db/image_cache")   # ""이면 메모리 캐시만
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_MAX_FILES = int(os.getenv("IMAGE_CACHE_MAX_FILES", "20000"))
+MEMORY_CACHE_ITEMS = 256
+# 상한 초과 시 이 비율까지 줄임 (매번 삭제가 일어나지 않도록 여유를 둠)
+EVICT_TARGET_RATIO = 0.9
+# OCR JSON 루트 (<OCR_DIR>/<폴더 라벨>/<파일명>.json, ingest 스크립트와 같은 구조)
+OCR_DIR = os.getenv("OCR_DIR", "./data/processed/ocr")
+
+# 채도 평균이 이 값 이하면 흑백 스캔으로 판단 (0~255)
+GRAYSCALE_CHROMA_THRESHOLD = 6
+# 잘라낼 때 남길 여백 (긴 변 대비 비율)
+CROP_MARGIN_RATIO = 0.02
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def is_bitonal(img: Image.Image) -> bool:
+    """작게 줄인 이미지의 채도(RGB 채널 간 차이)로 흑백 스캔 여부 판단"""
+    if img.mode in ("1", "L", "LA", "I", "I;16"):
+        return True
+    small = img.convert("RGB").resize((64, 64))
+    r, g, b = small.split()
+    chroma = ImageChops.lighter(ImageChops.difference(r, g), ImageChops.difference(g, b))
+    histogram = chroma.histogram()
+    mean = sum(i * count for i, count in enumerate(histogram)) / (64 * 64)
+    return mean <= GRAYSCALE_CHROMA_THRESHOLD
+
+
+def text_bbox(img: Image.Image, text_boxes=None):
+    """
+    글자 영역 bbox (x1, y1, x2, y2)
+    text_boxes(OCR 라인 bbox 목록)가 있으면 그 합집합, 없으면 흰 배경이 아닌 픽셀 영역
+    """
+    if text_boxes:
+        boxes = [b for b in text_boxes if b and len(b) == 4]
+        if boxes:
+            return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes))
+    gray = img.convert("L")
+    # 밝은 배경(>= 230)을 0으로 만든 뒤 내용이 있는 영역
+    mask = gray.point(lambda v: 255 if v < 230 else 0)
+    return mask.getbbox()
+
+
+def ocr_json_path(image_path: str):
+    """
+    이미지에 해당하는 OCR JSON 경로 (없으면 None)
+    data/raw/<라벨>/x.png -> data/processed/ocr/<라벨>/x.json 또는 <OCR_DIR>/<라벨>/x.json
+    """
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    candidates = [
+        os.path.splitext(image_path.replace("raw", "processed/ocr"))[0] + ".json",
+        os.path.join(OCR_DIR, os.path.basename(os.path.dirname(image_path)), stem + ".json"),
+    ]
+    for json_path in candidates:
+        if os.path.exists(json_path):
+            return json_path
+    return None
+
+
+def ocr_text_boxes(image_path: str):
+    """이미지에 해당하는 OCR JSON의 라인 bbox 목록 (원본 픽셀 좌표), 없으면 None"""
+    json_path = ocr_json_path(image_path)
+    if json_path is None:
+        return None
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        boxes = [line.get("bbox") for line in data.get("lines", [])
+                 if line.get("text", "").strip() and len(line.get("bbox") or []) == 4]
+        return boxes or None
+    except Exception as e:
+        print(f"⚠️ OCR JSON 읽기 실패: {e}")
+        return None
+
+
+def _crop(img: Image.Image, bbox) -> Image.Image:
+    if not bbox:
+        return img
+    margin = int(max(img.size) * CROP_MARGIN_RATIO)
+    x1, y1, x2, y2 = bbox
+    box = (max(0, x1 - margin), max(0, y1 - margin), min(img.width, x2 + margin), min(img.height, y2 + margin))
+    if box[2] - box[0] < 32 or box[3] - box[1] < 32:
+        return img
+    return img.crop(box)
+
+
+def prepare_image(image_path: str, max_side: int = IMAGE_MAX_SIDE, fmt: str = IMAGE_FORMAT,
+                  quality: int = IMAGE_QUALITY, crop_to_text: bool = IMAGE_CROP_TO_TEXT, text_boxes=None) -> dict:
+    """
+    Returns: {"data": bytes, "mime_type", "size": (w, h), "original_bytes", "original_size", "bytes", "prep_ms"}
+    """
+    start = time.perf_counter()
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)
+        original_size = img.size
+
+        if crop_to_text:
+            img = _crop(img, text_bbox(img, text_boxes))
+
+        if max(img.size) > max_side:
+            img = img.copy()
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        img = img.convert("L") if is_bitonal(img) else img.convert("RGB")
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt, quality=quality, optimize=True)
+        size = img.size
+
+    data = buffer.getvalue()
+    return {
+        "data": data,
+        "mime_type": _MIME_TYPES.get(fmt.upper(), "image/jpeg"),
+        "size": size,
+        "bytes": len(data),
+        "original_size": original_size,
+        "original_bytes": os.path.getsize(image_path),
+        "prep_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+class PreparedImageCache:
+    """
+    파일별 경량화 결과 캐시 (메모리 LRU + 디스크)
+    키 = 절대 경로 + mtime + 파일 크기 + 설정 + OCR bbox -> 원본 / OCR이 바뀌면 자동으로 새로 생성
+    디스크: max_bytes / max_files를 넘으면 mtime이 오래된 파일부터 삭제 (hit마다 mtime 갱신 = LRU)
+    """
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_items: int = MEMORY_CACHE_ITEMS,
+                 max_bytes: int = IMAGE_CACHE_MAX_BYTES, max_files: int = IMAGE_CACHE_MAX_FILES):
+        self.cache_dir = cache_dir or None
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "original_bytes": 0, "sent_bytes": 0, "evicted": 0}
+        self._disk_bytes, self._disk_files = 0, 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = self._disk_entries()
+            self._disk_bytes, self._disk_files = sum(size for _, size, _ in entries), len(entries)
+            self._evict()
+
+    def _key(self, image_path, **options) -> str:
+        stat = os.stat(image_path)
+        raw = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{sorted(options.items())}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, image_path: str, text_boxes=None, **options) -> dict:
+        options = {"max_side": IMAGE_MAX_SIDE, "fmt": IMAGE_FORMAT, "quality": IMAGE_QUALITY,
+                   "crop_to_text": IMAGE_CROP_TO_TEXT, **options}
+        boxes = hashlib.sha1(repr(text_boxes).encode("utf-8")).hexdigest() if text_boxes else None
+        key = self._key(image_path, **options, boxes=boxes)
+
+        with self._lock:
+            prepared = self._memory.get(key)
+            if prepared is not None:
+                self._memory.move_to_end(key)
+        if prepared is None:
+            prepared = self._disk_get(key, image_path, options)
+        cached = prepared is not None
+
+        if prepared is None:
+            prepared = prepare_image(image_path, text_boxes=text_boxes, **options)
+            self._disk_put(key, prepared)
+
+        with self._lock:
+            self._memory[key] = prepared
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+            self.stats["requests"] += 1
+            self.stats["hits"] += int(cached)
+            self.stats["original_bytes"] += prepared["original_bytes"]
+            self.stats["sent_bytes"] += prepared["bytes"]
+        return {**prepared, "cached": cached}
+
+    def _disk_path(self, key, options):
+        ext = ".webp" if options["fmt"].upper() == "WEBP" else ".jpg"
+        return os.path.join(self.cache_dir, key + ext)
+
+    def _disk_get(self, key, image_path, options):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key, options)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)   # LRU: 최근 사용 시각 갱신
+            with Image.open(io.BytesIO(data)) as img:
+                size = img.size
+            return {
+                "data": data,
+                "mime_type": _MIME_TYPES.get(options["fmt"].upper(), "image/jpeg"),
+                "size": size,
+                "bytes": len(data),
+                "original_size": None,
+                "original_bytes": os.path.getsize(image_path),
+                "prep_ms": 0.0,
+            }
+        except Exception as e:
+            print(f"⚠️ 이미지 캐시 읽기 실패: {e}")
+            return None
+
+    def _disk_put(self, key, prepared):
+        if not self.cache_dir:
+            return
+        try:
+            ext = ".webp" if prepared["mime_type"] == "image/webp" else ".jpg"
+            tmp_path = os.path.join(self.cache_dir, key + ext + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(prepared["data"])
+            os.replace(tmp_path, os.path.join(self.cache_dir, key + ext))
+        except Exception as e:
+            print(f"⚠️ 이미지 캐시 저장 실패: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += prepared["bytes"]
+            self._disk_files += 1
+            over = self._disk_bytes > self.max_bytes or self._disk_files > self.max_files
+        if over:
+            self._evict()
+
+    def _disk_entries(self):
+        """[(경로, 크기, mtime), ...] (작성 중인 .tmp 제외)"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue   # 다른 worker가 먼저 삭제
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """
+        상한을 넘으면 오래된 파일부터 삭제해서 상한의 EVICT_TARGET_RATIO까지 줄임
+        여러 worker가 같은 디렉토리를 쓰므로 합계는 매번 디렉토리를 다시 읽어서 계산
+        """
+        try:
+            entries = self._disk_entries()
+        except Exception as e:
+            print(f"⚠️ 이미지 캐시 정리 실패: {e}")
+            return
+        total, files = sum(size for _, size, _ in entries), len(entries)
+        evicted = 0
+        if total > self.max_bytes or files > self.max_files:
+            target_bytes = self.max_bytes * EVICT_TARGET_RATIO
+            target_files = self.max_files * EVICT_TARGET_RATIO
+            for path, size, _ in sorted(entries, key=lambda e: e[2]):
+                if total <= target_bytes and files <= target_files:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                files -= 1
+                evicted += 1
+        with self._lock:
+            self._disk_bytes, self._disk_files = total, files
+            self.stats["evicted"] += evicted
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = round(stats["hits"] / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["compression_ratio"] = round(stats["original_bytes"] / stats["sent_bytes"], 2) if stats["sent_bytes"] else 0.0
+        stats["disk_bytes"], stats["disk_files"] = self._disk_bytes, self._disk_files
+        return stats
+
+
+# 싱글톤
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_image_cache() -> PreparedImageCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = PreparedImageCache()
+        return _CACHE
@@ -0,0 +1,55 @@
+# src/utils/latency.py
+'''
+단계별 지연 시간 집계 (최근 N건 rolling window)
+
+    /chat, /chat/stream 의 총 시간 / TTFT(첫 토큰까지 시간) 등을 기록하고 /health에서 p50 / p95로 확인
+'''
+import threading
+from collections import deque
+
+import numpy as np
+
+WINDOW_SIZE = 1000
+
+
+class LatencyTracker:
+    def __init__(self, window: int = WINDOW_SIZE):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.window)
+            self._samples[name].append(float(ms))
+
+    def summary(self) -> dict:
+        """{"ttft_ms": {"count", "p50", "p95", "max"}, ...}"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        report = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            arr = np.asarray(values)
+            report[name] = {
+                "count": len(values),
+                "p50": round(float(np.percentile(arr, 50)), 1),
+                "p95": round(float(np.percentile(arr, 95)), 1),
+                "max": round(float(arr.max()), 1),
+            }
+        return report
+
+
+# 싱글톤 (API 프로세스 전체에서 공유)
+_TRACKER = None
+_TRACKER_LOCK = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    global _TRACKER
+    with _TRACKER_LOCK:
+        if _TRACKER is None:
+            _TRACKER = LatencyTracker()
+        return _TRACKER
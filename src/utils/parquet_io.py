@@ -0,0 +1,108 @@
+# src/utils/parquet_io.py
+'''
+임베딩 Parquet 스트리밍 입출력
+- 쓰기: 배치 단위로 row group을 바로 기록 (전체 DataFrame을 메모리에 쌓지 않음)
+- 읽기: row group(배치) 단위로 순회
+- embedding 컬럼은 float32 고정 길이 리스트(fixed_size_list<float32>[3072])
+'''
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EMBEDDING_DIM = 3072
+DEFAULT_BATCH_SIZE = 256
+
+EMBEDDING_SCHEMA = pa.schema([
+    pa.field("doc_id", pa.string()),
+    pa.field("text", pa.string()),
+    pa.field("embedding", pa.list_(pa.float32(), EMBEDDING_DIM)),
+    pa.field("label", pa.string()),
+    pa.field("file_path", pa.string()),
+    pa.field("metadata", pa.struct([pa.field("json_path", pa.string())])),
+    # 청크 단위 색인일 때만 채워짐 (문서 단위 행은 null)
+    pa.field("parent_id", pa.string()),
+    pa.field("chunk_index", pa.int32()),
+    pa.field("bbox", pa.string()),
+])
+
+
+class EmbeddingParquetWriter:
+    """
+    레코드를 batch_size개씩 모아서 row group 하나로 기록합니다.
+    메모리에는 항상 최대 1개 배치만 유지됩니다.
+
+    사용 예:
+        with EmbeddingParquetWriter(path) as writer:
+            writer.write(record)
+    """
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE, schema: pa.Schema = EMBEDDING_SCHEMA):
+        self.path = path
+        self.batch_size = batch_size
+        self.schema = schema
+        self.dim = schema.field("embedding").type.list_size
+        self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        self._buffer = []
+        self.num_rows = 0
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        columns = {}
+        for field in self.schema:
+            if field.name == "embedding":
+                # (N, dim) float32 행렬 -> 고정 길이 리스트 컬럼 (복사 1회)
+                matrix = np.asarray([r["embedding"] for r in self._buffer], dtype=np.float32)
+                if matrix.ndim != 2 or matrix.shape[1] != self.dim:
+                    raise ValueError(f"임베딩 차원 불일치: {matrix.shape} (기대값: {self.dim})")
+                columns[field.name] = pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel()), self.dim)
+            else:
+                columns[field.name] = pa.array([r.get(field.name) for r in self._buffer], type=field.type)
+
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+        self.num_rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_record_batches(path: str, columns: list = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Parquet 파일을 RecordBatch 단위로 순회합니다. (peak 메모리 = 배치 1개)
+    """
+    parquet_file = pq.ParquetFile(path)
+    yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+
+def embeddings_to_numpy(batch: pa.RecordBatch, column: str = "embedding") -> np.ndarray:
+    """
+    fixed_size_list<float32> 컬럼을 (N, dim) float32 배열로 변환합니다. (zero-copy 가능 시 복사 없음)
+    예전 파일(list<double>)도 읽을 수 있도록 가변 길이 리스트도 처리합니다.
+    """
+    array = batch.column(column)
+    if pa.types.is_fixed_size_list(array.type):
+        dim = array.type.list_size
+        values = array.flatten().to_numpy(zero_copy_only=False)
+        return values.reshape(-1, dim).astype(np.float32, copy=False)
+    return np.asarray(array.to_pylist(), dtype=np.float32)
+
+
+def count_rows(path: str) -> int:
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def column_names(path: str) -> list:
+    return pq.ParquetFile(path).schema_arrow.names
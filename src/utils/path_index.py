@@ -0,0 +1,192 @@
+# src/utils/path_index.py
+'''
+파일명 / 문서 id -> 실제 이미지 경로 인덱스
+
+기존: DB의 file_path가 없으면 매 채팅마다 /app/data, ./data 전체를 os.walk (수십만 장이면 수 초)
+변경:
+    1. ingest 시 이미지 경로 인덱스를 만들어 JSON으로 저장
+    2. 서버 시작 시 로드 -> 조회는 dict lookup (O(1))
+    3. 갱신은 디렉토리 mtime 비교로 바뀐 디렉토리만 다시 읽음 (파일 추가/삭제 시 부모 디렉토리 mtime이 바뀜)
+    4. 조회 실패 / 경로가 사라진 경우에만 증분 갱신 후 한 번 더 조회
+    5. 조회용 dict는 새로 만들어 한 번에 교체 (락 없는 조회가 빈/반쯤 찬 dict를 보지 않음),
+       갱신 후 저장은 백그라운드 스레드에서 (요청 경로에서 JSON 쓰기 X)
+'''
+import os
+import json
+import time
+import threading
+
+PATH_INDEX_PATH = "./chroma_db/path_index.json"
+# Docker / Local 데이터 경로
+PATH_INDEX_ROOTS = ["/app/data", "./data"]
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+# 조회 실패 시 증분 갱신을 너무 자주 하지 않도록 (초)
+MIN_REFRESH_INTERVAL = 10.0
+
+
+class PathIndex:
+    """
+    Args:
+        roots: 인덱싱할 최상위 디렉토리들 (없는 디렉토리는 무시)
+        index_path: 저장 위치 (JSON)
+    """
+    def __init__(self, roots=None, index_path: str = PATH_INDEX_PATH):
+        # "./data"와 "/app/data"가 같은 경로일 수 있으므로 중복 제거
+        self.roots = list(dict.fromkeys(os.path.abspath(r) for r in (roots or PATH_INDEX_ROOTS)))
+        self.index_path = index_path
+        self.dirs = {}        # 디렉토리 -> {"mtime": ns, "files": [이미지 파일명], "subdirs": [하위 디렉토리]}
+        self.by_name = {}     # "doc_0001.png" -> 경로
+        self.by_stem = {}     # "doc_0001" -> 경로
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        # 백그라운드 저장 상태
+        self._save_lock = threading.Lock()
+        self._save_dirty = False
+        self._saver = None
+
+    # 1. 저장 / 로드
+    @classmethod
+    def load_or_build(cls, roots=None, index_path: str = PATH_INDEX_PATH):
+        """저장된 인덱스가 있으면 로드 후 증분 갱신, 없으면 새로 생성"""
+        index = cls(roots, index_path)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                index.dirs = {d: e for d, e in data.get("dirs", {}).items()
+                              if any(d == r or d.startswith(r + os.sep) for r in index.roots)}
+                index._rebuild_maps()
+            except Exception as e:
+                print(f"⚠️ 경로 인덱스 로드 실패 (새로 생성): {e}")
+                index.dirs = {}
+        changed = index.refresh(force=True)
+        if changed:
+            index.save()
+        return index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"roots": self.roots, "dirs": self.dirs}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def save_later(self):
+        """백그라운드 스레드에서 저장 (저장 중에 또 요청되면 끝난 뒤 한 번 더 저장)"""
+        with self._save_lock:
+            self._save_dirty = True
+            if self._saver is not None and self._saver.is_alive():
+                return
+            self._saver = threading.Thread(target=self._save_worker, daemon=True)
+            self._saver.start()
+
+    def _save_worker(self):
+        while True:
+            with self._save_lock:
+                if not self._save_dirty:
+                    self._saver = None
+                    return
+                self._save_dirty = False
+            try:
+                self.save()
+            except Exception as e:
+                print(f"⚠️ 경로 인덱스 저장 실패: {e}")
+
+    def _rebuild_maps(self):
+        # 지역 dict에 다 채운 뒤 한 번에 교체 (_lookup은 락 없이 읽음)
+        by_name, by_stem = {}, {}
+        for d, entry in self.dirs.items():
+            for name in entry["files"]:
+                path = os.path.join(d, name)
+                by_name.setdefault(name, path)
+                by_stem.setdefault(os.path.splitext(name)[0], path)
+        self.by_name, self.by_stem = by_name, by_stem
+
+    # 2. 증분 갱신
+    def refresh(self, force: bool = False) -> int:
+        """
+        mtime이 바뀐 디렉토리만 다시 읽습니다.
+        Returns: 다시 읽은 디렉토리 수
+        """
+        now = time.time()
+        if not force and now - self._last_refresh < MIN_REFRESH_INTERVAL:
+            return 0
+        with self._lock:
+            self._last_refresh = now
+            changed = 0
+            stack = [r for r in self.roots]
+            seen = set()
+            while stack:
+                d = stack.pop()
+                seen.add(d)
+                try:
+                    mtime = os.stat(d).st_mtime_ns
+                except OSError:
+                    continue
+                entry = self.dirs.get(d)
+                if entry is None or entry["mtime"] != mtime:
+                    entry = self._scan_dir(d, mtime)
+                    changed += 1
+                stack.extend(entry["subdirs"])
+
+            # 사라진 디렉토리 정리
+            for d in [d for d in self.dirs if d not in seen]:
+                del self.dirs[d]
+                changed += 1
+
+            if changed:
+                # 조회용 dict는 디렉토리 목록에서 다시 생성 (삭제/이동된 파일 반영)
+                self._rebuild_maps()
+            return changed
+
+    def _scan_dir(self, d, mtime):
+        files, subdirs = [], []
+        try:
+            with os.scandir(d) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        subdirs.append(item.path)
+                    elif item.name.lower().endswith(IMAGE_EXTS):
+                        files.append(item.name)
+        except OSError as e:
+            print(f"⚠️ 디렉토리 읽기 실패: {d} / {e}")
+        entry = {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+        self.dirs[d] = entry
+        return entry
+
+    # 3. 조회
+    def _lookup(self, name: str):
+        by_name, by_stem = self.by_name, self.by_stem
+        path = by_name.get(name) or by_stem.get(name) or by_stem.get(os.path.splitext(name)[0])
+        return path if path and os.path.exists(path) else None
+
+    def resolve(self, name: str):
+        """
+        파일명("doc_0001.png") 또는 문서 id("doc_0001")로 경로를 찾습니다.
+        없거나 경로가 사라졌으면 증분 갱신 후 한 번 더 조회합니다. (저장은 백그라운드)
+        """
+        if not name:
+            return None
+        path = self._lookup(name)
+        if path is None and self.refresh():
+            self.save_later()
+            path = self._lookup(name)
+        return path
+
+    def __len__(self):
+        return len(self.by_name)
+
+
+# 싱글톤 (서버 프로세스당 한 번 로드)
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_path_index() -> PathIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = PathIndex.load_or_build()
+            print(f"✅ Path Index Loaded ({len(_INDEX)} files)")
+        return _INDEX